@@ -0,0 +1,5 @@
+"""
+sensAI backend - FastAPI server and inference services for the AI Coding Sensei.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,3 @@
+"""
+HTTP API layer: routes, dependencies and Server-Sent Events helpers.
+"""
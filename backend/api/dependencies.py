@@ -0,0 +1,27 @@
+"""
+Shared FastAPI dependencies.
+Services are created once in the application lifespan and stored on ``app.state``.
+"""
+
+from typing import cast
+
+from fastapi import Request
+
+from backend.services.history import HistoryService
+from backend.services.llm_service import LLMEngine
+from backend.services.review_service import ReviewService
+
+
+def get_engine(request: Request) -> LLMEngine:
+    """Returns the shared inference engine."""
+    return cast(LLMEngine, request.app.state.engine)
+
+
+def get_review_service(request: Request) -> ReviewService:
+    """Returns the shared review service."""
+    return cast(ReviewService, request.app.state.review_service)
+
+
+def get_history_service(request: Request) -> HistoryService:
+    """Returns the shared review history service."""
+    return cast(HistoryService, request.app.state.history_service)
@@ -0,0 +1,24 @@
+"""
+Conversation endpoints.
+"""
+
+from fastapi import APIRouter, Depends
+
+from backend.api.dependencies import get_review_service
+from backend.services.review_service import ReviewService
+
+router = APIRouter(tags=["conversations"])
+
+
+@router.post("/conversations/{conversation_id}/cancel")
+async def cancel_conversation(
+    conversation_id: str,
+    service: ReviewService = Depends(get_review_service),
+) -> dict[str, int]:
+    """
+    Stops every answer still streaming for a conversation.
+
+    Their engine generations are aborted, which frees GPU capacity for other
+    students. Cancelling a conversation with nothing in flight is a no-op.
+    """
+    return {"cancelled": service.cancellations.cancel(conversation_id)}
@@ -0,0 +1,24 @@
+"""
+Health check endpoint.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from backend.api.dependencies import get_engine
+from backend.services.llm_service import LLMEngine
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/health")
+async def health(engine: LLMEngine = Depends(get_engine)) -> JSONResponse:
+    """Reports whether the API and the inference engine are ready."""
+    engine_ok = await engine.health()
+    return JSONResponse(
+        status_code=200 if engine_ok else 503,
+        content={
+            "status": "ok" if engine_ok else "unavailable",
+            "engine": engine.name,
+        },
+    )
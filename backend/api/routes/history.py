@@ -0,0 +1,112 @@
+"""
+Review history endpoints.
+"""
+
+from fastapi import APIRouter, Depends, Query
+
+from backend.api.dependencies import get_history_service
+from backend.db.reviews import ReviewSummary
+from backend.schemas.history import (
+    HistoryPage,
+    ReviewItem,
+    ReviewSummaryItem,
+    SearchResults,
+)
+from backend.services.history import HistoryService
+
+router = APIRouter(tags=["history"])
+
+
+def _summary(summary: ReviewSummary) -> ReviewSummaryItem:
+    return ReviewSummaryItem(
+        id=summary.id,
+        conversation_id=summary.conversation_id,
+        timestamp=summary.timestamp,
+        kind=summary.kind,
+        language=summary.language,
+        question=summary.question,
+        code_preview=summary.code_preview,
+        code_length=summary.code_length,
+    )
+
+
+@router.get("/history", response_model=HistoryPage)
+async def list_history(
+    session_id: str | None = Query(default=None, max_length=64),
+    conversation_id: str | None = Query(default=None, max_length=64),
+    language: list[str] = Query(default=[]),
+    since: float | None = None,
+    until: float | None = None,
+    cursor: int | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    service: HistoryService = Depends(get_history_service),
+) -> HistoryPage:
+    """
+    Lists answered reviews, newest first, one page at a time.
+
+    Items are summaries (question and the beginning of the code); fetch
+    ``GET /api/history/{id}`` for the full code and answer. Pass the
+    ``next_cursor`` of a page as ``cursor`` to get the following one; it is
+    null on the last page. ``language`` may be repeated to match any of several
+    languages; ``since`` and ``until`` are Unix times.
+    """
+    page = await service.list_reviews(
+        session_id=session_id,
+        conversation_id=conversation_id,
+        languages=language,
+        since=since,
+        until=until,
+        cursor=cursor,
+        limit=limit,
+    )
+    return HistoryPage(
+        items=[_summary(summary) for summary in page.items],
+        next_cursor=page.next_cursor,
+    )
+
+
+@router.get("/history/search", response_model=SearchResults)
+async def search_history(
+    q: str = Query(..., min_length=1, max_length=500),
+    session_id: str | None = Query(default=None, max_length=64),
+    language: list[str] = Query(default=[]),
+    offset: int = Query(default=0, ge=0, le=10_000),
+    limit: int = Query(default=20, ge=1, le=100),
+    service: HistoryService = Depends(get_history_service),
+) -> SearchResults:
+    """
+    Searches the code, questions and answers of the history, most relevant first.
+
+    Search is code-aware: ``user`` finds ``getUserName`` and ``user_id``, and the
+    last term also matches as a prefix. Every term must match. Pass the
+    ``next_offset`` of a page as ``offset`` to get the following one. Items are
+    summaries, like those of ``GET /api/history``.
+    """
+    page = await service.search(
+        q, session_id=session_id, languages=language, offset=offset, limit=limit
+    )
+    return SearchResults(
+        items=[_summary(summary) for summary in page.items],
+        next_offset=page.next_offset,
+    )
+
+
+@router.get("/history/{item_id}", response_model=ReviewItem)
+async def get_review(
+    item_id: int,
+    service: HistoryService = Depends(get_history_service),
+) -> ReviewItem:
+    """Returns one review of the history in full, by the ``id`` of its summary."""
+    record = await service.get_review(item_id)
+    return ReviewItem(
+        id=record.id,
+        review_id=record.review_id,
+        conversation_id=record.conversation_id,
+        timestamp=record.timestamp,
+        kind=record.kind,
+        language=record.language,
+        mode=record.mode,
+        question=record.question,
+        code=record.code,
+        response=record.response,
+    )
@@ -0,0 +1,119 @@
+"""
+Code review endpoint.
+"""
+
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from backend.api.dependencies import get_review_service
+from backend.api.sse import sse_stream
+from backend.core.exceptions import QueueFullError
+from backend.schemas.review import ReviewRequest
+from backend.services.admission import Ticket
+from backend.services.cancellation import CancelScope, close_iterator, until_cancelled
+from backend.services.quota import Charge
+from backend.services.review_service import PreparedReview, ReviewService
+
+router = APIRouter(tags=["review"])
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+}
+
+
+@dataclass
+class _ReviewStream:
+    """Resources held by one review stream, released when it ends."""
+
+    prepared: PreparedReview
+    charge: Charge
+    ticket: Ticket | None = None
+    scope: CancelScope | None = None
+
+
+def _finish(service: ReviewService, stream: _ReviewStream) -> None:
+    # Idempotent: runs when the stream ends and again as a background task
+    if stream.ticket is not None:
+        service.admission.release(stream.ticket)
+    if stream.scope is not None:
+        service.cancellations.unregister(stream.scope)
+    service.quota.settle(stream.charge, stream.prepared.generation.usage)
+
+
+async def _events(service: ReviewService, stream: _ReviewStream) -> AsyncIterator[str]:
+    async for event in sse_stream(service.stream(stream.prepared, stream.ticket)):
+        yield event
+
+
+async def _review_stream(
+    service: ReviewService, stream: _ReviewStream
+) -> AsyncIterator[str]:
+    events = _events(service, stream)
+    if stream.scope is not None:
+        events = until_cancelled(events, stream.scope.cancelled)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        # Closing the events first aborts an unfinished generation, so that a
+        # client disconnect (which cancels this stream) frees the engine slot
+        await close_iterator(events)
+        _finish(service, stream)
+
+
+@router.post("/review")
+async def review(
+    payload: ReviewRequest,
+    request: Request,
+    service: ReviewService = Depends(get_review_service),
+) -> StreamingResponse:
+    """
+    Reviews a code snippet and streams the answer as Server-Sent Events.
+
+    Each generated token is sent as soon as the engine produces it; the stream
+    ends with a ``data: [DONE]`` event. Requests that cannot fit in the context
+    window are rejected before streaming starts. Cached answers are replayed
+    through the same stream.
+
+    When every generation slot is taken, the request waits in a priority queue
+    and ``event: queue`` events carry its position; when the queue is full too,
+    it is rejected with a 503 and a ``Retry-After`` header.
+
+    Requests are charged in tokens against per-session and per-IP budgets; an
+    exhausted budget is rejected with a 429 and a ``Retry-After`` header.
+
+    The generation is aborted as soon as the client disconnects, or when
+    ``POST /api/conversations/{conversation_id}/cancel`` is called for the
+    request's conversation.
+    """
+    prepared = service.prepare(payload)
+    charge = service.quota.charge(
+        payload.session_id or "",
+        request.client.host if request.client else "",
+        request.url.path,
+        prepared.estimated_tokens,
+    )
+    stream = _ReviewStream(prepared, charge)
+    try:
+        stream.ticket = service.admit(prepared)
+    except QueueFullError:
+        service.quota.refund(charge)
+        raise
+    if payload.conversation_id:
+        stream.scope = service.cancellations.register(payload.conversation_id)
+
+    return StreamingResponse(
+        _review_stream(service, stream),
+        media_type="text/event-stream",
+        headers={
+            **SSE_HEADERS,
+            "X-Prompt-Prefix": prepared.generation.prefix_fingerprint,
+        },
+        # Also runs if the client left before the stream started
+        background=BackgroundTask(_finish, service, stream),
+    )
@@ -0,0 +1,66 @@
+"""
+Review statistics endpoint.
+"""
+
+from typing import TypedDict
+
+from fastapi import APIRouter, Depends, Query
+
+from backend.api.dependencies import get_history_service
+from backend.db.stats import Counters
+from backend.schemas.history import (
+    CountersItem,
+    DailyCounters,
+    LanguageCounters,
+    StatsResponse,
+)
+from backend.services.history import HistoryService
+
+router = APIRouter(tags=["stats"])
+
+
+class _CounterFields(TypedDict):
+    total: int
+    reviews: int
+    followups: int
+    avg_code_length: float
+
+
+def _counters(counters: Counters) -> _CounterFields:
+    return {
+        "total": counters.total,
+        "reviews": counters.reviews,
+        "followups": counters.followups,
+        "avg_code_length": counters.avg_code_length,
+    }
+
+
+@router.get("/stats", response_model=StatsResponse)
+async def get_stats(
+    session_id: str | None = Query(default=None, max_length=64),
+    days: int | None = Query(default=None, ge=1, le=3660),
+    service: HistoryService = Depends(get_history_service),
+) -> StatsResponse:
+    """
+    Returns review counts, language distribution and mean code length.
+
+    Statistics cover the whole class, or one session with ``session_id``, over
+    the last ``days`` days (today included) or all time. They are read from
+    daily counters updated as reviews are stored, so the cost does not grow
+    with the number of reviews.
+    """
+    stats = await service.stats(session_id=session_id, days=days)
+    languages = sorted(stats.languages.items(), key=lambda item: -item[1].total)
+    return StatsResponse(
+        since_day=stats.since_day,
+        totals=CountersItem(**_counters(stats.totals)),
+        languages=[
+            LanguageCounters(language=language, **_counters(counters))
+            for language, counters in languages
+        ],
+        daily=[
+            DailyCounters(day=day, **_counters(counters))
+            for day, counters in stats.daily.items()
+        ],
+        active_sessions=stats.active_sessions,
+    )
@@ -0,0 +1,57 @@
+"""
+Server-Sent Events encoding for streamed answers.
+"""
+
+import logging
+from collections.abc import AsyncIterator
+
+from backend.services.admission import QueuePosition
+
+logger = logging.getLogger(__name__)
+
+DONE_EVENT = "data: [DONE]\n\n"
+
+
+def format_sse(data: str, event: str | None = None) -> str:
+    """
+    Encodes one SSE event.
+
+    Multi-line payloads are split into several ``data:`` lines, as required by
+    the SSE format; the client joins them back with newlines.
+
+    Args:
+        data: Event payload
+        event: Optional event type (defaults to "message" on the client)
+
+    Returns:
+        The encoded event, terminated by a blank line
+    """
+    lines = [f"event: {event}\n"] if event else []
+    lines.extend(f"data: {line}\n" for line in data.split("\n"))
+    lines.append("\n")
+    return "".join(lines)
+
+
+async def sse_stream(tokens: AsyncIterator[str | QueuePosition]) -> AsyncIterator[str]:
+    """
+    Forwards each token as its own SSE event, then a final ``[DONE]`` marker.
+
+    Queue positions, sent while the request waits for a generation slot, become
+    ``event: queue`` events.
+
+    Args:
+        tokens: Async iterator over queue positions and text deltas
+
+    Returns:
+        Async iterator over encoded SSE events
+    """
+    try:
+        async for token in tokens:
+            if isinstance(token, QueuePosition):
+                yield format_sse(str(token.position), event="queue")
+            elif token:
+                yield format_sse(token)
+    except Exception as e:
+        logger.exception("Generation failed")
+        yield format_sse(str(e) or type(e).__name__, event="error")
+    yield DONE_EVENT
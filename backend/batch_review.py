@@ -0,0 +1,637 @@
+"""
+Offline bulk review.
+Reviews every submission of a directory or zip archive (e.g. a class's homework)
+and writes one JSON line per file, without the API server:
+    sensai review-batch homework.zip -o reviews.jsonl
+Language detection, static analysis and prompt assembly run in a process pool;
+generations go through the micro-batching scheduler with many in flight, for
+throughput. The output file is the checkpoint: a rerun skips the files already
+reviewed (same path and content), so an interrupted run resumes where it stopped.
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+import zipfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TextIO
+
+from backend.core.config import Settings
+from backend.core.exceptions import ContextTooLargeError, SensAIError
+from backend.prompts.registry import UNKNOWN_LANGUAGE
+from backend.schemas.review import ReviewRequest
+from backend.services.cancellation import close_iterator
+from backend.services.chunker import AnswerMerger, language_for_path, split_submission
+from backend.services.code_analyzer import analyze_code
+from backend.services.context_builder import ContextBuilder
+from backend.services.language_detector import detect_language
+from backend.services.llm_service import (
+    GenerationRequest,
+    LLMEngine,
+    Message,
+    Usage,
+    create_engine,
+)
+from backend.services.review_service import (
+    CHUNK_CONTEXT,
+    CHUNK_HEADING,
+    CHUNKED_INTRO,
+)
+from backend.services.scheduler import MicroBatchScheduler
+from backend.services.tokenizer import estimate_tokens, model_token_counter
+
+# Longest file reviewed, as for the review endpoint
+MAX_CHARS = 200_000
+# Directories never read
+_SKIPPED_DIRS = frozenset({"__pycache__", "node_modules", "__MACOSX", "venv", ".venv"})
+
+# Statuses of the output records; "ok" and "skipped" records are not redone,
+# "failed" ones (including files too large to review) are
+DONE_STATUSES = frozenset({"ok", "skipped"})
+
+
+@dataclass
+class BatchOptions:
+    """
+    What to ask about every submission.
+
+    Attributes:
+        question: Question asked about every file, if any
+        mode: Specialized review focus ("performance", "security", ...)
+        level: Student level ("beginner" or "advanced")
+    """
+
+    question: str | None = None
+    mode: str | None = None
+    level: str | None = None
+
+
+@dataclass
+class PreparedChunk:
+    """
+    A part of a large file, reviewed on its own as by the review endpoint.
+
+    Attributes:
+        location: Where the part is in the file (lines)
+        messages: Prompt of the review of the part
+        max_tokens: Completion budget
+        prefix_fingerprint: Fingerprint of the static system prefix
+    """
+
+    location: str
+    messages: list[Message]
+    max_tokens: int
+    prefix_fingerprint: str
+
+
+@dataclass
+class PreparedItem:
+    """
+    A submission ready to be generated, built in a worker process.
+
+    Attributes:
+        item_id: Path of the file in the source
+        sha256: Hash of the file content
+        language: Language of the file (from its extension, or detected)
+        messages: Prompt of the review (empty if the file is skipped or chunked)
+        max_tokens: Completion budget
+        prefix_fingerprint: Fingerprint of the static system prefix
+        chunks: Parts reviewed one after the other, for a large file
+        skipped: Why the file is not reviewed ("" if it is)
+        error: Why the file cannot be reviewed with the current settings (it
+            is written as failed, and retried by the next run)
+    """
+
+    item_id: str
+    sha256: str
+    language: str
+    messages: list[Message] = field(default_factory=list)
+    max_tokens: int = 0
+    prefix_fingerprint: str = ""
+    chunks: list[PreparedChunk] = field(default_factory=list)
+    skipped: str = ""
+    error: str = ""
+
+
+@dataclass
+class BatchSummary:
+    """
+    Outcome of a bulk review.
+
+    Attributes:
+        total: Files found in the source
+        resumed: Files already reviewed by an earlier run
+        reviewed: Files reviewed by this run
+        skipped: Files not reviewed (not code, or too large)
+        failed: Files whose review failed, or too large to review even in parts
+            (retried by the next run)
+        prompt_tokens: Prompt tokens processed by the engine
+        completion_tokens: Tokens generated
+    """
+
+    total: int = 0
+    resumed: int = 0
+    reviewed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class SubmissionSource:
+    """
+    Files of a directory or zip archive, read one at a time.
+
+    Hidden files and dependency directories are left out.
+
+    Args:
+        path: Directory or ``.zip`` archive
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self._zip is None and not path.is_dir():
+            raise ValueError(f"{path} is neither a directory nor a zip archive")
+        self.names = sorted(name for name in self._list() if _visible(name))
+
+    def _list(self) -> Iterator[str]:
+        if self._zip is not None:
+            for info in self._zip.infolist():
+                if not info.is_dir() and info.file_size <= 4 * MAX_CHARS:
+                    yield info.filename
+            return
+        for root, dirs, files in os.walk(self.path):
+            dirs[:] = [name for name in dirs if name not in _SKIPPED_DIRS]
+            for name in files:
+                path = Path(root, name)
+                if path.stat().st_size <= 4 * MAX_CHARS:
+                    yield path.relative_to(self.path).as_posix()
+
+    def read(self, name: str) -> str | None:
+        """
+        Reads a file.
+
+        Args:
+            name: Path of the file in the source
+
+        Returns:
+            The text of the file, or None if it is binary or too long
+        """
+        if self._zip is not None:
+            data = self._zip.read(name)
+        else:
+            data = (self.path / name).read_bytes()
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        if "\x00" in text or len(text) > MAX_CHARS:
+            return None
+        return text
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+
+def _visible(name: str) -> bool:
+    parts = name.split("/")
+    return not any(part.startswith(".") or part in _SKIPPED_DIRS for part in parts)
+
+
+def content_hash(code: str) -> str:
+    """Identifies the content of a file, so that edited files are reviewed again."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def load_checkpoint(output: Path) -> set[tuple[str, str]]:
+    """
+    Reads the files already reviewed from an earlier run's output.
+
+    A line cut by an interrupted run is removed, so that the run can append.
+
+    Args:
+        output: JSONL output file
+
+    Returns:
+        The (path, content hash) pairs of the files done
+    """
+    if not output.exists():
+        return set()
+    done = set()
+    with output.open("r+b") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") in DONE_STATUSES:
+            done.add((record["id"], record["sha256"]))
+    return done
+
+
+# --- Worker processes ------------------------------------------------------------
+
+_settings: Settings | None = None
+_count_tokens: Callable[[str], int] = estimate_tokens
+_builder: ContextBuilder | None = None
+
+
+def _init_worker(settings: Settings) -> None:
+    # The prompt prefixes are compiled once per worker. Tokens are counted with
+    # the model's tokenizer when the engine has one, so that no prompt built
+    # here overflows the engine's context window
+    global _settings, _count_tokens, _builder
+    _settings = settings
+    if settings.engine == "vllm":
+        _count_tokens = model_token_counter(settings.model)
+    _builder = ContextBuilder(
+        max_model_len=settings.max_model_len,
+        max_tokens=settings.max_tokens,
+        count_tokens=_count_tokens,
+    )
+
+
+def prepare_item(item_id: str, code: str, options: BatchOptions) -> PreparedItem:
+    """
+    Detects the language of a file, analyzes it and builds its review prompt.
+
+    A file above the chunking threshold is split into parts reviewed on their
+    own, as by the review endpoint. Runs in a worker process.
+
+    Args:
+        item_id: Path of the file in the source
+        code: Text of the file
+        options: What to ask about the file
+
+    Returns:
+        The prepared item
+    """
+    settings = _settings or Settings()
+    builder = _builder or ContextBuilder()
+    sha256 = content_hash(code)
+    # The extension wins; other files (.txt, no extension) must look like code
+    language = language_for_path(item_id)
+    if language is None:
+        detection = detect_language(code)
+        if not detection.is_code:
+            return PreparedItem(item_id, sha256, detection.language, skipped="not code")
+        language = detection.language
+    if not code.strip():
+        return PreparedItem(item_id, sha256, language, skipped="empty")
+    request = ReviewRequest(
+        code=code,
+        language=language,
+        question=options.question,
+        mode=options.mode,
+        level=options.level,
+    )
+    try:
+        if (
+            settings.chunking_enabled
+            and _count_tokens(code) > settings.chunk_threshold_tokens
+        ):
+            chunks = _prepare_chunks(request, builder, settings)
+            return PreparedItem(item_id, sha256, language, chunks=chunks)
+        analysis = analyze_code(code, language)
+        context = builder.build(request, analysis=analysis.facts() if analysis else "")
+    except ContextTooLargeError as e:
+        return PreparedItem(item_id, sha256, language, error=e.message)
+    except SensAIError as e:
+        return PreparedItem(item_id, sha256, language, skipped=e.message)
+    return PreparedItem(
+        item_id,
+        sha256,
+        language,
+        messages=context.messages,
+        max_tokens=context.max_tokens,
+        prefix_fingerprint=context.prefix_fingerprint,
+    )
+
+
+def _prepare_chunks(
+    request: ReviewRequest, builder: ContextBuilder, settings: Settings
+) -> list[PreparedChunk]:
+    """
+    Builds the prompts of the parts of a large file.
+
+    Args:
+        request: The review of the whole file
+        builder: Prompt builder of the worker
+        settings: Chunking settings
+
+    Returns:
+        The parts, in order
+
+    Raises:
+        ContextTooLargeError: If the file has too many parts
+    """
+    pieces = split_submission(
+        request.code, request.language, settings.chunk_max_tokens, _count_tokens
+    )
+    if len(pieces) > settings.chunk_max_chunks:
+        raise ContextTooLargeError(
+            "The submission is too large to be reviewed, even in parts."
+        )
+    chunks = []
+    for index, piece in enumerate(pieces, start=1):
+        part = request.model_copy(
+            update={"code": piece.code, "language": piece.language}
+        )
+        note = CHUNK_CONTEXT.format(
+            index=index, count=len(pieces), location=piece.location
+        )
+        context = builder.build(part, note)
+        chunks.append(
+            PreparedChunk(
+                piece.location,
+                context.messages,
+                min(context.max_tokens, settings.chunk_answer_tokens),
+                context.prefix_fingerprint,
+            )
+        )
+    return chunks
+
+
+# --- Main process -----------------------------------------------------------------
+
+
+class Progress:
+    """
+    Progress line on stderr: files done, failures, throughput and time left.
+
+    Redrawn in place on a terminal, printed every few percent otherwise.
+
+    Args:
+        summary: Counters of the run
+        stream: Where to write
+    """
+
+    def __init__(self, summary: BatchSummary, stream: TextIO = sys.stderr) -> None:
+        self.summary = summary
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self.started = time.monotonic()
+        self._last_step = -1
+        self._last_done = -1
+
+    def update(self, final: bool = False) -> None:
+        s = self.summary
+        done = s.resumed + s.reviewed + s.skipped + s.failed
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        processed = s.reviewed + s.skipped + s.failed
+        remaining = s.total - done
+        eta = remaining * elapsed / processed if processed else 0.0
+        line = (
+            f"[{done}/{s.total}] {100 * done / max(s.total, 1):.0f}% | "
+            f"{s.reviewed} reviewed, "
+            f"{s.resumed} resumed, {s.skipped} skipped, {s.failed} failed | "
+            f"{s.completion_tokens / elapsed:,.0f} tok/s | ETA {_duration(eta)}"
+        )
+        if self.interactive:
+            self.stream.write(f"\r{line}\x1b[K" + ("\n" if final else ""))
+            self.stream.flush()
+            return
+        step = 20 * done // max(s.total, 1)
+        if step != self._last_step or final and done != self._last_done:
+            self._last_step = step
+            self._last_done = done
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+async def _complete(
+    engine: LLMEngine,
+    messages: list[Message],
+    max_tokens: int,
+    prefix_fingerprint: str,
+    settings: Settings,
+    usage: Usage,
+) -> str:
+    generation = GenerationRequest(
+        request_id=f"batch-{uuid.uuid4().hex}",
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=settings.temperature,
+        top_p=settings.top_p,
+        prefix_fingerprint=prefix_fingerprint,
+    )
+    chunks = []
+    completed = False
+    tokens = engine.stream(generation)
+    try:
+        async for token in tokens:
+            chunks.append(token)
+        completed = True
+    finally:
+        await close_iterator(tokens)
+        if not completed:
+            await engine.abort(generation.request_id)
+        usage.prompt_tokens += generation.usage.prompt_tokens
+        usage.completion_tokens += generation.usage.completion_tokens
+    return "".join(chunks)
+
+
+async def _generate(
+    engine: LLMEngine, item: PreparedItem, settings: Settings
+) -> dict[str, Any]:
+    started = time.monotonic()
+    usage = Usage()
+    if not item.chunks:
+        review = await _complete(
+            engine,
+            item.messages,
+            item.max_tokens,
+            item.prefix_fingerprint,
+            settings,
+            usage,
+        )
+    else:
+        # The parts of a file are generated one after the other: the batch
+        # already keeps the engine busy with other files
+        merger = AnswerMerger()
+        parts = [CHUNKED_INTRO.format(count=len(item.chunks))]
+        for chunk in item.chunks:
+            answer = await _complete(
+                engine,
+                chunk.messages,
+                chunk.max_tokens,
+                chunk.prefix_fingerprint,
+                settings,
+                usage,
+            )
+            text = merger.feed(answer) + merger.flush()
+            if text:
+                parts.append(CHUNK_HEADING.format(location=chunk.location) + text)
+        review = "".join(parts)
+    return {
+        "review": review,
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+async def review_batch(
+    source: Path,
+    output: Path,
+    settings: Settings,
+    options: BatchOptions | None = None,
+    workers: int | None = None,
+    concurrency: int | None = None,
+    progress: bool = True,
+) -> BatchSummary:
+    """
+    Reviews every file of a directory or zip archive into a JSONL file.
+
+    Each output line holds the file's ``id`` (its path in the source),
+    ``sha256``, ``language``, ``status`` ("ok", "skipped" or "failed") and the
+    ``review`` or ``error``, with token counts. Lines are appended and flushed
+    as reviews complete, in completion order; a file edited since an earlier
+    run is reviewed again, and its last line is the current one.
+
+    Args:
+        source: Directory or ``.zip`` archive of submissions
+        output: JSONL output file, also the checkpoint of reruns
+        settings: Backend settings (engine, sampling, batching)
+        options: What to ask about every submission
+        workers: Processes preparing the prompts (CPU count if omitted)
+        concurrency: Generations in flight (``max_in_flight`` if omitted)
+        progress: Whether to show a progress line on stderr
+
+    Returns:
+        The counters of the run
+    """
+    options = options or BatchOptions()
+    # Fail on an unknown mode or level before starting anything
+    ContextBuilder().resolve_prefix(
+        ReviewRequest(
+            code="-", language=UNKNOWN_LANGUAGE, mode=options.mode, level=options.level
+        )
+    )
+    submissions = SubmissionSource(source)
+    done = load_checkpoint(output)
+    summary = BatchSummary(total=len(submissions.names))
+    display = Progress(summary) if progress else None
+
+    engine = create_engine(settings)
+    if settings.batch_window_ms > 0:
+        engine = MicroBatchScheduler(
+            engine,
+            window_ms=settings.batch_window_ms,
+            max_batch_size=settings.max_batch_size,
+            max_batch_tokens=settings.max_batch_tokens,
+        )
+    await engine.start()
+    loop = asyncio.get_running_loop()
+    # Spawned, not forked: the engine may already hold a GPU context
+    pool = ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(settings,),
+    )
+    # Bounds both the generations in flight and the files held in memory
+    slots = asyncio.Semaphore(concurrency or settings.max_in_flight)
+
+    with output.open("a", encoding="utf-8") as out:
+
+        def write(record: dict[str, Any]) -> None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        def fail(record: dict[str, Any], error: Exception) -> None:
+            write(
+                {
+                    **record,
+                    "status": "failed",
+                    "error": str(error) or type(error).__name__,
+                }
+            )
+            summary.failed += 1
+
+        async def review(name: str, code: str) -> None:
+            record: dict[str, Any] = {
+                "id": name,
+                "sha256": content_hash(code),
+                "language": language_for_path(name) or UNKNOWN_LANGUAGE,
+            }
+            try:
+                try:
+                    item = await loop.run_in_executor(
+                        pool, prepare_item, name, code, options
+                    )
+                except Exception as e:
+                    # A file the worker cannot prepare (or a crashed worker)
+                    # fails on its own, and is retried by the next run
+                    fail(record, e)
+                    return
+                record["language"] = item.language
+                if item.error:
+                    write({**record, "status": "failed", "error": item.error})
+                    summary.failed += 1
+                    return
+                if item.skipped:
+                    write({**record, "status": "skipped", "error": item.skipped})
+                    summary.skipped += 1
+                    return
+                try:
+                    result = await _generate(engine, item, settings)
+                except Exception as e:
+                    fail(record, e)
+                    return
+                write({**record, "status": "ok", **result})
+                summary.reviewed += 1
+                summary.prompt_tokens += result["prompt_tokens"]
+                summary.completion_tokens += result["completion_tokens"]
+            finally:
+                slots.release()
+                if display is not None:
+                    display.update()
+
+        tasks = set()
+        try:
+            for name in submissions.names:
+                await slots.acquire()
+                code = submissions.read(name)
+                if code is None or (name, content_hash(code)) in done:
+                    # Binary and oversize files are skipped without a record
+                    if code is None:
+                        summary.skipped += 1
+                    else:
+                        summary.resumed += 1
+                    slots.release()
+                    continue
+                task = asyncio.create_task(review(name, code))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            pool.shutdown(cancel_futures=True)
+            await engine.close()
+            submissions.close()
+            if display is not None:
+                display.update(final=True)
+    return summary
@@ -0,0 +1,3 @@
+"""
+Core configuration and shared infrastructure for the sensAI backend.
+"""
@@ -0,0 +1,316 @@
+"""
+Backend configuration.
+Every setting can be overridden with a ``SENSAI_*`` environment variable.
+"""
+
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(f"SENSAI_{name}", default)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(f"SENSAI_{name}")
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(f"SENSAI_{name}")
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(f"SENSAI_{name}")
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Runtime settings for the API server and the inference engine.
+
+    Attributes:
+        host: Interface the API server binds to
+        port: Port the API server listens on
+        engine: Inference backend to use ("vllm", "openai" or "fake")
+        model: Model name or path loaded by the engine
+        max_model_len: Context window of the model, in tokens
+        max_tokens: Maximum number of tokens generated per answer
+        temperature: Sampling temperature
+        top_p: Nucleus sampling threshold
+        gpu_memory_utilization: Fraction of GPU memory vLLM may claim
+        upstream_url: Base URL of the OpenAI-compatible server ("openai" engine);
+            several comma-separated URLs are load-balanced by the upstream router
+        upstream_api_key: Bearer token sent to the OpenAI-compatible server
+        router_affinity_slack_tokens: Extra outstanding tokens a replica may have
+            over the least loaded one and still receive its pinned conversations
+        router_health_interval_s: Period of the replica health checks
+        router_max_failures: Consecutive failures after which a replica is ejected
+        router_hedge_enabled: Hedge generations whose first token is late
+        router_hedge_percentile: Percentile of recent TTFT after which to hedge
+        router_hedge_min_delay_ms: Lower bound of the hedge delay
+        router_ttft_slo_ms: TTFT objective, upper bound of the hedge delay
+        router_hedge_max_ratio: Maximum fraction of generations that may be hedged
+        batch_window_ms: How long the scheduler collects requests before
+            submitting them together (0 disables micro-batching)
+        max_batch_size: Maximum number of requests submitted together
+        max_batch_tokens: Maximum prompt tokens submitted together
+        max_in_flight: Maximum number of generations running at once
+        max_queue: Maximum number of requests waiting for a generation slot;
+            further requests are rejected with 503 and a Retry-After header
+        retry_after_s: Retry-After value sent with those rejections
+        rate_limit_enabled: Charge requests against per-session and per-IP token budgets
+        session_tokens_per_minute: Token budget refill rate of a session
+        session_token_burst: Token budget size of a session
+        ip_tokens_per_minute: Token budget refill rate of a client address
+        ip_token_burst: Token budget size of a client address
+        completion_token_estimate: Completion length charged upfront, before the
+            actual usage is known
+        database_url: Database URL (``sqlite:///path``, or ``postgresql://...``
+            with the ``postgres`` extra installed)
+        database_pool_size: Connections kept open to the database
+        usage_log_batch_size: Usage records written per batch
+        usage_log_flush_ms: Maximum time a usage record waits before being written
+        review_log_batch_size: Answered reviews written per batch
+        review_log_flush_ms: Maximum time an answered review waits before being written
+        fake_ttft_ms: Simulated time to first token of the fake engine
+        fake_token_latency_ms: Simulated per-token latency of the fake engine
+        fake_response_tokens: Number of tokens the fake engine produces
+        response_cache_enabled: Answer identical first-turn submissions from memory
+        response_cache_max_bytes: Size cap of the response cache
+        response_cache_ttl_s: Lifetime of a cached answer, in seconds
+        near_duplicate_policy: On a near-duplicate submission: "reuse" the previous
+            review, give it to the model as "context", only count it ("metric"),
+            or "off"
+        near_duplicate_max_distance: Largest SimHash distance counted as a match (0-3)
+        near_duplicate_capacity: Number of submissions kept in the index
+        analyzer_enabled: Add static analysis facts to the review prompts
+        analyzer_quick_answers: Answer code that does not parse without the engine
+        analyzer_cache_size: Number of analyses kept, by content hash
+        analyzer_max_chars: Longest submission analyzed
+        memory_enabled: Fold older conversation turns into a rolling summary
+        memory_recent_turns: Messages of a conversation kept verbatim
+        memory_summary_max_tokens: Length limit of a conversation summary
+        memory_max_conversations: Conversations kept in memory
+        memory_max_concurrent_summaries: Summaries generated at once
+        chunking_enabled: Review large submissions in chunks, concurrently
+        chunk_threshold_tokens: Code size above which a submission is chunked
+        chunk_max_tokens: Code tokens per chunk
+        chunk_answer_tokens: Completion limit of the review of one chunk
+        chunk_max_chunks: Most chunks per submission (larger ones are rejected)
+        chunk_max_concurrency: Chunks of one submission generated at once (the
+            ones beyond the first only on free admission slots)
+        resubmission_enabled: Review code submitted again in a conversation from
+            its changes only (needs the conversation memory)
+        resubmission_max_changed_ratio: Largest share of changed lines reviewed as
+            changes (more is reviewed as new code)
+        resubmission_context_lines: Unchanged lines sent around each change
+        resubmission_review_chars: Length limit of the previous review's digest
+    """
+
+    host: str = field(default_factory=lambda: _env_str("HOST", "0.0.0.0"))
+    port: int = field(default_factory=lambda: _env_int("PORT", 8000))
+
+    engine: str = field(default_factory=lambda: _env_str("ENGINE", "vllm"))
+    model: str = field(
+        default_factory=lambda: _env_str("MODEL", "mistralai/Mistral-7B-Instruct-v0.3")
+    )
+    max_model_len: int = field(default_factory=lambda: _env_int("MAX_MODEL_LEN", 8192))
+    max_tokens: int = field(default_factory=lambda: _env_int("MAX_TOKENS", 2048))
+    temperature: float = field(default_factory=lambda: _env_float("TEMPERATURE", 0.7))
+    top_p: float = field(default_factory=lambda: _env_float("TOP_P", 0.9))
+    gpu_memory_utilization: float = field(
+        default_factory=lambda: _env_float("GPU_MEMORY_UTILIZATION", 0.9)
+    )
+    upstream_url: str = field(
+        default_factory=lambda: _env_str("UPSTREAM_URL", "http://localhost:8001")
+    )
+    upstream_api_key: str = field(
+        default_factory=lambda: _env_str("UPSTREAM_API_KEY", "")
+    )
+    router_affinity_slack_tokens: int = field(
+        default_factory=lambda: _env_int("ROUTER_AFFINITY_SLACK_TOKENS", 8192)
+    )
+    router_health_interval_s: float = field(
+        default_factory=lambda: _env_float("ROUTER_HEALTH_INTERVAL_S", 5.0)
+    )
+    router_max_failures: int = field(
+        default_factory=lambda: _env_int("ROUTER_MAX_FAILURES", 3)
+    )
+    router_hedge_enabled: bool = field(
+        default_factory=lambda: _env_bool("ROUTER_HEDGE_ENABLED", False)
+    )
+    router_hedge_percentile: float = field(
+        default_factory=lambda: _env_float("ROUTER_HEDGE_PERCENTILE", 95.0)
+    )
+    router_hedge_min_delay_ms: float = field(
+        default_factory=lambda: _env_float("ROUTER_HEDGE_MIN_DELAY_MS", 100.0)
+    )
+    router_ttft_slo_ms: float = field(
+        default_factory=lambda: _env_float("ROUTER_TTFT_SLO_MS", 2000.0)
+    )
+    router_hedge_max_ratio: float = field(
+        default_factory=lambda: _env_float("ROUTER_HEDGE_MAX_RATIO", 0.05)
+    )
+
+    batch_window_ms: float = field(
+        default_factory=lambda: _env_float("BATCH_WINDOW_MS", 5.0)
+    )
+    max_batch_size: int = field(default_factory=lambda: _env_int("MAX_BATCH_SIZE", 32))
+    max_batch_tokens: int = field(
+        default_factory=lambda: _env_int("MAX_BATCH_TOKENS", 32768)
+    )
+
+    max_in_flight: int = field(default_factory=lambda: _env_int("MAX_IN_FLIGHT", 128))
+    max_queue: int = field(default_factory=lambda: _env_int("MAX_QUEUE", 256))
+    retry_after_s: int = field(default_factory=lambda: _env_int("RETRY_AFTER_S", 5))
+
+    rate_limit_enabled: bool = field(
+        default_factory=lambda: _env_bool("RATE_LIMIT_ENABLED", True)
+    )
+    session_tokens_per_minute: int = field(
+        default_factory=lambda: _env_int("SESSION_TOKENS_PER_MINUTE", 20_000)
+    )
+    session_token_burst: int = field(
+        default_factory=lambda: _env_int("SESSION_TOKEN_BURST", 40_000)
+    )
+    ip_tokens_per_minute: int = field(
+        default_factory=lambda: _env_int("IP_TOKENS_PER_MINUTE", 100_000)
+    )
+    ip_token_burst: int = field(
+        default_factory=lambda: _env_int("IP_TOKEN_BURST", 200_000)
+    )
+    completion_token_estimate: int = field(
+        default_factory=lambda: _env_int("COMPLETION_TOKEN_ESTIMATE", 512)
+    )
+
+    database_url: str = field(
+        default_factory=lambda: _env_str("DATABASE_URL", "sqlite:///sensai.db")
+    )
+    database_pool_size: int = field(
+        default_factory=lambda: _env_int("DATABASE_POOL_SIZE", 4)
+    )
+    usage_log_batch_size: int = field(
+        default_factory=lambda: _env_int("USAGE_LOG_BATCH_SIZE", 100)
+    )
+    usage_log_flush_ms: float = field(
+        default_factory=lambda: _env_float("USAGE_LOG_FLUSH_MS", 500.0)
+    )
+    review_log_batch_size: int = field(
+        default_factory=lambda: _env_int("REVIEW_LOG_BATCH_SIZE", 100)
+    )
+    review_log_flush_ms: float = field(
+        default_factory=lambda: _env_float("REVIEW_LOG_FLUSH_MS", 500.0)
+    )
+
+    fake_ttft_ms: float = field(
+        default_factory=lambda: _env_float("FAKE_TTFT_MS", 200.0)
+    )
+    fake_token_latency_ms: float = field(
+        default_factory=lambda: _env_float("FAKE_TOKEN_LATENCY_MS", 20.0)
+    )
+    fake_response_tokens: int = field(
+        default_factory=lambda: _env_int("FAKE_RESPONSE_TOKENS", 200)
+    )
+
+    response_cache_enabled: bool = field(
+        default_factory=lambda: _env_bool("RESPONSE_CACHE_ENABLED", True)
+    )
+    response_cache_max_bytes: int = field(
+        default_factory=lambda: _env_int("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+    )
+    response_cache_ttl_s: float = field(
+        default_factory=lambda: _env_float("RESPONSE_CACHE_TTL_S", 24 * 3600.0)
+    )
+
+    near_duplicate_policy: str = field(
+        default_factory=lambda: _env_str("NEAR_DUPLICATE_POLICY", "metric")
+    )
+    near_duplicate_max_distance: int = field(
+        default_factory=lambda: _env_int("NEAR_DUPLICATE_MAX_DISTANCE", 3)
+    )
+    near_duplicate_capacity: int = field(
+        default_factory=lambda: _env_int("NEAR_DUPLICATE_CAPACITY", 500_000)
+    )
+
+    analyzer_enabled: bool = field(
+        default_factory=lambda: _env_bool("ANALYZER_ENABLED", True)
+    )
+    analyzer_quick_answers: bool = field(
+        default_factory=lambda: _env_bool("ANALYZER_QUICK_ANSWERS", True)
+    )
+    analyzer_cache_size: int = field(
+        default_factory=lambda: _env_int("ANALYZER_CACHE_SIZE", 4096)
+    )
+    analyzer_max_chars: int = field(
+        default_factory=lambda: _env_int("ANALYZER_MAX_CHARS", 20_000)
+    )
+
+    memory_enabled: bool = field(
+        default_factory=lambda: _env_bool("MEMORY_ENABLED", True)
+    )
+    memory_recent_turns: int = field(
+        default_factory=lambda: _env_int("MEMORY_RECENT_TURNS", 6)
+    )
+    memory_summary_max_tokens: int = field(
+        default_factory=lambda: _env_int("MEMORY_SUMMARY_MAX_TOKENS", 256)
+    )
+    memory_max_conversations: int = field(
+        default_factory=lambda: _env_int("MEMORY_MAX_CONVERSATIONS", 10_000)
+    )
+    memory_max_concurrent_summaries: int = field(
+        default_factory=lambda: _env_int("MEMORY_MAX_CONCURRENT_SUMMARIES", 2)
+    )
+
+    chunking_enabled: bool = field(
+        default_factory=lambda: _env_bool("CHUNKING_ENABLED", True)
+    )
+    chunk_threshold_tokens: int = field(
+        default_factory=lambda: _env_int("CHUNK_THRESHOLD_TOKENS", 3072)
+    )
+    chunk_max_tokens: int = field(
+        default_factory=lambda: _env_int("CHUNK_MAX_TOKENS", 1536)
+    )
+    chunk_answer_tokens: int = field(
+        default_factory=lambda: _env_int("CHUNK_ANSWER_TOKENS", 512)
+    )
+    chunk_max_chunks: int = field(
+        default_factory=lambda: _env_int("CHUNK_MAX_CHUNKS", 16)
+    )
+    chunk_max_concurrency: int = field(
+        default_factory=lambda: _env_int("CHUNK_MAX_CONCURRENCY", 4)
+    )
+
+    resubmission_enabled: bool = field(
+        default_factory=lambda: _env_bool("RESUBMISSION_ENABLED", True)
+    )
+    resubmission_max_changed_ratio: float = field(
+        default_factory=lambda: _env_float("RESUBMISSION_MAX_CHANGED_RATIO", 0.5)
+    )
+    resubmission_context_lines: int = field(
+        default_factory=lambda: _env_int("RESUBMISSION_CONTEXT_LINES", 3)
+    )
+    resubmission_review_chars: int = field(
+        default_factory=lambda: _env_int("RESUBMISSION_REVIEW_CHARS", 1500)
+    )
+
+    @property
+    def upstream_urls(self) -> list[str]:
+        """URLs of the OpenAI-compatible upstreams, from ``upstream_url``."""
+        return [url.strip() for url in self.upstream_url.split(",") if url.strip()]
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Returns the process-wide settings, read once from the environment.
+
+    Returns:
+        Cached Settings instance
+    """
+    return Settings()
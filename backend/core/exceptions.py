@@ -0,0 +1,97 @@
+"""
+Custom exceptions of the sensAI backend.
+Each one maps to a standardized JSON error response:
+    {"error": "<code>", "message": "<human readable>", "details": {...}}
+"""
+
+from typing import Any
+
+
+class SensAIError(Exception):
+    """
+    Base class of errors reported to API clients.
+
+    Args:
+        message: Human-readable description
+        details: Optional structured details
+    """
+
+    status_code: int = 500
+    error_code: str = "internal_error"
+
+    def __init__(self, message: str, details: dict[str, Any] | None = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.details = details or {}
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serializes the error for the JSON response body."""
+        return {
+            "error": self.error_code,
+            "message": self.message,
+            "details": self.details,
+        }
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """Extra HTTP headers of the error response."""
+        return {}
+
+
+class InvalidRequestError(SensAIError):
+    """The request is well-formed but cannot be served as asked."""
+
+    status_code = 422
+    error_code = "validation_error"
+
+
+class NotFoundError(SensAIError):
+    """The requested resource does not exist."""
+
+    status_code = 404
+    error_code = "not_found"
+
+
+class ContextTooLargeError(SensAIError):
+    """The prompt does not fit in the model's context window."""
+
+    status_code = 413
+    error_code = "context_too_large"
+
+
+class RetryLaterError(SensAIError):
+    """
+    Base class of errors the client should retry after a delay.
+
+    Args:
+        message: Human-readable description
+        retry_after_s: Seconds the client should wait before retrying
+        details: Optional structured details
+    """
+
+    status_code = 503
+    error_code = "unavailable"
+
+    def __init__(
+        self, message: str, retry_after_s: int, details: dict[str, Any] | None = None
+    ) -> None:
+        super().__init__(message, {**(details or {}), "retry_after": retry_after_s})
+        self.retry_after_s = retry_after_s
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Retry-After": str(self.retry_after_s)}
+
+
+class QueueFullError(RetryLaterError):
+    """Every generation slot is taken and the wait queue is full."""
+
+    status_code = 503
+    error_code = "queue_full"
+
+
+class RateLimitError(RetryLaterError):
+    """The session or client address used up its token budget."""
+
+    status_code = 429
+    error_code = "rate_limited"
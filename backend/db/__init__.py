@@ -0,0 +1,3 @@
+"""
+Persistence layer: database access and background writers.
+"""
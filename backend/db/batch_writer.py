@@ -0,0 +1,129 @@
+"""
+Asynchronous batched writes.
+Request handlers hand records to a writer, which inserts them in batches from
+a background task, so the hot path never waits on the database.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+from backend.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BATCH_WRITER_RECORDS = REGISTRY.counter(
+    "sensai_batch_writer_records_total",
+    "Records handled by the background writers, by writer and outcome",
+    ["writer", "outcome"],
+)
+BATCH_WRITER_FLUSH = REGISTRY.histogram(
+    "sensai_batch_writer_flush_seconds",
+    "Time spent writing one batch, by writer",
+    ["writer"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class BatchWriter(Generic[T]):
+    """
+    Buffers records and writes them in batches.
+
+    A batch is written as soon as ``max_batch`` records are pending, or
+    ``flush_interval_ms`` after its first record, whichever comes first. The
+    write function is blocking and runs in a worker thread.
+
+    Args:
+        write: Writes a batch of records (e.g. one ``executemany``)
+        name: Writer name, used in metrics and logs
+        max_batch: Number of records that triggers a write
+        flush_interval_ms: Maximum time a record waits before being written
+        max_pending: Records buffered before new ones are dropped
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[T]], None],
+        name: str,
+        max_batch: int = 100,
+        flush_interval_ms: float = 500.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        self.write = write
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=max_pending)
+        self._task: asyncio.Task[None] | None = None
+        self._batch: list[T] = []
+
+    async def start(self) -> None:
+        """Starts the background flush task."""
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stops the flush task and writes every pending record."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for start in range(0, len(pending), self.max_batch):
+            await self._flush(pending[start : start + self.max_batch])
+
+    def submit(self, record: T) -> None:
+        """
+        Queues a record without blocking.
+
+        Args:
+            record: Record to write; dropped (and counted) if the buffer is full
+        """
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            BATCH_WRITER_RECORDS.inc(writer=self.name, outcome="dropped")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collected on the writer so that close() flushes it if cancelled here
+            self._batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.max_batch:
+                if not self._queue.empty():
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[T]) -> None:
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.write, batch)
+        except Exception:
+            logger.exception(
+                "%s writer failed to write %d records", self.name, len(batch)
+            )
+            BATCH_WRITER_RECORDS.inc(len(batch), writer=self.name, outcome="failed")
+            return
+        BATCH_WRITER_FLUSH.observe(time.perf_counter() - started, writer=self.name)
+        BATCH_WRITER_RECORDS.inc(len(batch), writer=self.name, outcome="written")
@@ -0,0 +1,259 @@
+"""
+Review history: one row per answered request, first reviews and follow-ups alike.
+"""
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from backend.db.database import Database, Transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id {id},
+    review_id TEXT NOT NULL UNIQUE,
+    conversation_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp {float} NOT NULL,
+    kind TEXT NOT NULL,
+    language TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    question TEXT NOT NULL,
+    code TEXT NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_reviews_session ON reviews (session_id, id);
+CREATE INDEX IF NOT EXISTS ix_reviews_conversation ON reviews (conversation_id, id);
+CREATE INDEX IF NOT EXISTS ix_reviews_language ON reviews (language, id);
+CREATE INDEX IF NOT EXISTS ix_reviews_timestamp ON reviews (timestamp);
+"""
+
+COLUMNS = (
+    "review_id",
+    "conversation_id",
+    "session_id",
+    "timestamp",
+    "kind",
+    "language",
+    "mode",
+    "question",
+    "code",
+    "response",
+)
+
+# Columns of a ReviewSummary, of the table (or alias) ``t``; the first
+# placeholder is the length of the code preview
+SUMMARY_COLUMNS = (
+    "{t}.id, {t}.conversation_id, {t}.timestamp, {t}.kind, {t}.language, {t}.question,"
+    " substr({t}.code, 1, ?), length({t}.code)"
+)
+
+
+@dataclass(frozen=True)
+class ReviewRecord:
+    """
+    One answered request.
+
+    Attributes:
+        review_id: Identifier of the request (its generation request id)
+        conversation_id: Conversation the request belongs to (empty if unknown)
+        session_id: Session that sent the request (empty if anonymous)
+        timestamp: Unix time at which the answer completed
+        kind: "review" for a first review, "followup" for a later turn
+        language: Programming language of the submission
+        mode: Review focus ("" for a general review)
+        question: Question of the student ("" if none)
+        code: Submitted code, or message for follow-ups
+        response: Full answer of the sensei
+        id: Row id, assigned when the record is stored (0 before)
+    """
+
+    review_id: str
+    conversation_id: str
+    session_id: str
+    timestamp: float
+    kind: str
+    language: str
+    mode: str
+    question: str
+    code: str
+    response: str
+    id: int = field(default=0, compare=False)
+
+
+def _record(row: tuple[Any, ...]) -> ReviewRecord:
+    """Builds a review from a row holding its ``id``, then its ``COLUMNS``."""
+    return ReviewRecord(**dict(zip(COLUMNS, row[1:])), id=row[0])
+
+
+def scan_reviews(database: Database, after_id: int, limit: int) -> list[ReviewRecord]:
+    """
+    Reads stored reviews in insertion order, e.g. to rebuild a derived table.
+
+    Args:
+        database: Database holding the ``reviews`` table
+        after_id: Only reviews with a larger row id
+        limit: Maximum number of reviews returned
+
+    Returns:
+        The reviews, by increasing row id
+    """
+    rows = database.fetchall(
+        f"SELECT id, {', '.join(COLUMNS)} FROM reviews"
+        " WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, limit),
+    )
+    return [_record(row) for row in rows]
+
+
+@dataclass(frozen=True)
+class ReviewSummary:
+    """
+    What a history list shows of a review, without its full code and answer.
+
+    Attributes:
+        id: Row id
+        conversation_id: Conversation the review belongs to
+        timestamp: Unix time at which the answer completed
+        kind: "review" for a first review, "followup" for a later turn
+        language: Programming language of the submission
+        question: Question of the student ("" if none)
+        code_preview: Beginning of the submitted code
+        code_length: Length of the whole submitted code, in characters
+    """
+
+    id: int
+    conversation_id: str
+    timestamp: float
+    kind: str
+    language: str
+    question: str
+    code_preview: str
+    code_length: int
+
+
+@dataclass
+class ReviewPage:
+    """
+    One page of the review history, newest first.
+
+    Attributes:
+        items: Summaries of the page's reviews
+        next_cursor: Cursor of the following page (None on the last page)
+    """
+
+    items: list[ReviewSummary]
+    next_cursor: int | None = None
+
+
+class ReviewStore:
+    """
+    Reads and writes the ``reviews`` table.
+
+    Pages are read with keyset pagination: the cursor is the row id of the
+    last review returned, so that deep pages cost as little as the first one
+    and do not shift while new reviews are written.
+
+    Args:
+        database: Database holding the table
+        indexers: Functions run in the transaction that inserts reviews, to
+            keep derived tables in sync (e.g. ``ReviewSearchIndex.index``)
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        indexers: Sequence[Callable[[Transaction, list[ReviewRecord]], None]] = (),
+    ) -> None:
+        self.database = database
+        self.indexers = list(indexers)
+
+    def create_tables(self) -> None:
+        """Creates the table and its indexes if they do not exist."""
+        self.database.executescript(self.database.schema(SCHEMA))
+
+    def insert_many(self, records: list[ReviewRecord]) -> None:
+        """
+        Inserts records, and runs the indexers, in one transaction.
+
+        Args:
+            records: Answered reviews to insert
+        """
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.database.transaction() as transaction:
+            transaction.executemany(
+                f"INSERT INTO reviews ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                [
+                    tuple(getattr(record, column) for column in COLUMNS)
+                    for record in records
+                ],
+            )
+            for indexer in self.indexers:
+                indexer(transaction, records)
+
+    def list_page(
+        self,
+        session_id: str | None = None,
+        conversation_id: str | None = None,
+        languages: Sequence[str] = (),
+        since: float | None = None,
+        until: float | None = None,
+        cursor: int | None = None,
+        limit: int = 20,
+        preview_chars: int = 300,
+    ) -> ReviewPage:
+        """
+        Reads one page of review summaries, newest first.
+
+        Args:
+            session_id: Only reviews of this session
+            conversation_id: Only reviews of this conversation
+            languages: Only reviews in these languages (any language if empty)
+            since: Only reviews answered at or after this Unix time
+            until: Only reviews answered before this Unix time
+            cursor: ``next_cursor`` of the previous page (None for the first page)
+            limit: Maximum number of reviews returned
+            preview_chars: Length of the code previews
+
+        Returns:
+            The page
+        """
+        conditions: list[str] = []
+        parameters: list[Any] = []
+        for condition, value in (
+            ("session_id = ?", session_id),
+            ("conversation_id = ?", conversation_id),
+            ("timestamp >= ?", since),
+            ("timestamp < ?", until),
+            ("id < ?", cursor),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if languages:
+            conditions.append(f"language IN ({', '.join('?' for _ in languages)})")
+            parameters.extend(languages)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.database.fetchall(
+            f"SELECT {SUMMARY_COLUMNS.format(t='reviews')} FROM reviews {where}"
+            " ORDER BY id DESC LIMIT ?",
+            [preview_chars, *parameters, limit + 1],
+        )
+        items = [ReviewSummary(*row) for row in rows[:limit]]
+        return ReviewPage(items, items[-1].id if len(rows) > limit else None)
+
+    def get(self, row_id: int) -> ReviewRecord | None:
+        """
+        Reads one review in full.
+
+        Args:
+            row_id: Row id of the review
+
+        Returns:
+            The review, or None if there is none with this id
+        """
+        rows = self.database.fetchall(
+            f"SELECT id, {', '.join(COLUMNS)} FROM reviews WHERE id = ?", (row_id,)
+        )
+        return _record(rows[0]) if rows else None
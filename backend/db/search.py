@@ -0,0 +1,268 @@
+"""
+Full-text search over the review history.
+SQLite uses an FTS5 index; PostgreSQL a ``tsvector`` column with a GIN index.
+Both index the same code-aware terms: identifiers are kept whole and also
+split into their words. A query identifier matches its whole form or all of
+its words, so that ``getUserName`` is found by ``getusername``, ``user``,
+``user_name``, ``getUser`` or ``get_user``.
+"""
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from backend.db.database import Database, Transaction
+from backend.db.reviews import (
+    SUMMARY_COLUMNS,
+    ReviewRecord,
+    ReviewSummary,
+    scan_reviews,
+)
+
+SQLITE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+    code, question, response,
+    content='',
+    tokenize="unicode61 tokenchars '_'"
+);
+"""
+
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_search (
+    review_id BIGINT PRIMARY KEY REFERENCES reviews (id),
+    document TSVECTOR NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_review_search_document
+    ON review_search USING GIN (document);
+"""
+
+# Inserted with the review's row id, looked up by its (unique) review id
+INDEX_SQL = {
+    "sqlite": (
+        "INSERT INTO reviews_fts (rowid, code, question, response)"
+        " SELECT id, ?, ?, ? FROM reviews WHERE review_id = ?"
+    ),
+    "postgresql": (
+        "INSERT INTO review_search (review_id, document)"
+        " SELECT id, setweight(to_tsvector('simple', ?), 'B')"
+        " || setweight(to_tsvector('simple', ?), 'A')"
+        " || setweight(to_tsvector('simple', ?), 'C')"
+        " FROM reviews WHERE review_id = ?"
+    ),
+}
+
+LAST_INDEXED_SQL = {
+    "sqlite": "SELECT COALESCE(MAX(rowid), 0) FROM reviews_fts",
+    "postgresql": "SELECT COALESCE(MAX(review_id), 0) FROM review_search",
+}
+
+# Most relevant first (BM25 and ts_rank), with matches in the question weighted
+# above matches in the code, themselves above matches in the answer
+SEARCH_SQL = {
+    "sqlite": (
+        "SELECT {columns} FROM reviews_fts JOIN reviews r ON r.id = reviews_fts.rowid"
+        " WHERE reviews_fts MATCH ?{filters}"
+        " ORDER BY bm25(reviews_fts, 1.0, 2.0, 0.5), r.id DESC LIMIT ? OFFSET ?"
+    ),
+    "postgresql": (
+        "SELECT {columns} FROM review_search s JOIN reviews r ON r.id = s.review_id"
+        " WHERE s.document @@ to_tsquery('simple', ?){filters}"
+        " ORDER BY ts_rank(s.document, to_tsquery('simple', ?)) DESC, r.id DESC"
+        " LIMIT ? OFFSET ?"
+    ),
+}
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+# Word boundaries inside an identifier: snake_case, camelCase, HTTPServer, utf8
+WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+BACKFILL_BATCH = 500
+
+
+def code_terms(text: str) -> list[str]:
+    """
+    Splits text into lowercase search terms, code-aware.
+
+    Every identifier is kept whole and, when it is made of several words
+    (``snake_case``, ``camelCase``...), followed by each of them.
+
+    Args:
+        text: Code or prose
+
+    Returns:
+        The terms, in order of appearance
+    """
+    terms = []
+    for match in IDENTIFIER.finditer(text):
+        identifier = match.group()
+        terms.append(identifier.lower())
+        words = WORD.findall(identifier)
+        if len(words) > 1:
+            terms.extend(word.lower() for word in words)
+    return terms
+
+
+def query_terms(text: str) -> list[list[str]]:
+    """
+    Splits a search query into groups of alternative terms.
+
+    An identifier made of several words matches either its whole form or all
+    of its words, whatever their case or separators in the indexed text.
+
+    Args:
+        text: Search query
+
+    Returns:
+        One group per distinct identifier: its whole form, then its words (if
+        it has more than one)
+    """
+    groups: list[list[str]] = []
+    for match in IDENTIFIER.finditer(text):
+        identifier = match.group()
+        group = [identifier.lower()]
+        words = WORD.findall(identifier)
+        if len(words) > 1:
+            group.extend(word.lower() for word in words)
+        if group not in groups:
+            groups.append(group)
+    return groups
+
+
+@dataclass
+class SearchPage:
+    """
+    One page of search results, most relevant first.
+
+    Attributes:
+        items: Summaries of the matching reviews
+        next_offset: Offset of the following page (None on the last page)
+    """
+
+    items: list[ReviewSummary]
+    next_offset: int | None = None
+
+
+class ReviewSearchIndex:
+    """
+    Full-text index of the ``reviews`` table.
+
+    Reviews are indexed in the transaction that stores them, so the index is
+    always in sync with the table; reviews stored before the index existed
+    are indexed by ``create_tables``.
+
+    Args:
+        database: Database holding the ``reviews`` table
+    """
+
+    def __init__(self, database: Database) -> None:
+        self.database = database
+
+    def create_tables(self) -> None:
+        """Creates the index if it does not exist and indexes missing reviews."""
+        schema = SQLITE_SCHEMA if self.database.dialect == "sqlite" else POSTGRES_SCHEMA
+        self.database.executescript(schema)
+        self._backfill()
+
+    def _backfill(self) -> None:
+        last = self.database.fetchall(LAST_INDEXED_SQL[self.database.dialect])[0][0]
+        while True:
+            records = scan_reviews(self.database, last, BACKFILL_BATCH)
+            if not records:
+                return
+            with self.database.transaction() as transaction:
+                self.index(transaction, records)
+            last = records[-1].id
+
+    def index(self, transaction: Transaction, records: list[ReviewRecord]) -> None:
+        """
+        Indexes reviews inserted in the same transaction.
+
+        Args:
+            transaction: Transaction that inserted the reviews
+            records: Reviews to index
+        """
+        transaction.executemany(
+            INDEX_SQL[self.database.dialect],
+            [
+                (
+                    " ".join(code_terms(record.code)),
+                    " ".join(code_terms(record.question)),
+                    " ".join(code_terms(record.response)),
+                    record.review_id,
+                )
+                for record in records
+            ],
+        )
+
+    def _match(self, groups: list[list[str]]) -> str:
+        # Every group must match, by its whole identifier or all of its words;
+        # the last term as a prefix, for search-as-you-type
+        sqlite = self.database.dialect == "sqlite"
+        both, either = (" AND ", " OR ") if sqlite else (" & ", " | ")
+
+        def term(text: str, prefix: bool) -> str:
+            if sqlite:
+                return f'"{text}"*' if prefix else f'"{text}"'
+            return f"{text}:*" if prefix else text
+
+        clauses = []
+        for index, group in enumerate(groups):
+            last = index == len(groups) - 1
+            whole, words = term(group[0], last), group[1:]
+            if not words:
+                clauses.append(whole)
+                continue
+            parts = [
+                term(word, last and i == len(words) - 1) for i, word in enumerate(words)
+            ]
+            clauses.append(f"({whole}{either}({both.join(parts)}))")
+        return both.join(clauses)
+
+    def search(
+        self,
+        query: str,
+        session_id: str | None = None,
+        languages: Sequence[str] = (),
+        offset: int = 0,
+        limit: int = 20,
+        preview_chars: int = 300,
+    ) -> SearchPage:
+        """
+        Finds the reviews whose code, question or answer match a query.
+
+        Args:
+            query: Search terms; all of them must match, the last one as a prefix
+                (an identifier by its whole form or all of its words)
+            session_id: Only reviews of this session
+            languages: Only reviews in these languages (any language if empty)
+            offset: ``next_offset`` of the previous page (0 for the first page)
+            limit: Maximum number of reviews returned
+            preview_chars: Length of the code previews
+
+        Returns:
+            The page (empty if the query has no searchable term)
+        """
+        groups = query_terms(query)
+        if not groups:
+            return SearchPage([])
+
+        dialect = self.database.dialect
+        match = self._match(groups)
+        filters = ""
+        parameters: list[Any] = [preview_chars, match]
+        if session_id is not None:
+            filters += " AND r.session_id = ?"
+            parameters.append(session_id)
+        if languages:
+            filters += f" AND r.language IN ({', '.join('?' for _ in languages)})"
+            parameters.extend(languages)
+        if dialect == "postgresql":
+            parameters.append(match)
+
+        sql = SEARCH_SQL[dialect].format(
+            columns=SUMMARY_COLUMNS.format(t="r"), filters=filters
+        )
+        rows = self.database.fetchall(sql, [*parameters, limit + 1, offset])
+        items = [ReviewSummary(*row) for row in rows[:limit]]
+        return SearchPage(items, offset + limit if len(rows) > limit else None)
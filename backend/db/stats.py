@@ -0,0 +1,213 @@
+"""
+Review statistics, maintained at write time.
+Every stored review increments daily counters, per language, for the whole
+class and for its session, so that dashboards read a few hundred rows
+whatever the size of the history.
+"""
+
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from backend.db.database import Database, Transaction
+from backend.db.reviews import ReviewRecord, scan_reviews
+
+# Scope of the class-wide counters (session scopes are session ids)
+ALL_SESSIONS = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_stats_daily (
+    scope TEXT NOT NULL,
+    day TEXT NOT NULL,
+    language TEXT NOT NULL,
+    reviews INTEGER NOT NULL,
+    followups INTEGER NOT NULL,
+    code_chars INTEGER NOT NULL,
+    PRIMARY KEY (scope, day, language)
+);
+CREATE TABLE IF NOT EXISTS review_sessions_daily (
+    day TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (day, session_id)
+);
+"""
+
+UPSERT_COUNTERS = (
+    "INSERT INTO review_stats_daily"
+    " (scope, day, language, reviews, followups, code_chars)"
+    " VALUES (?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT (scope, day, language) DO UPDATE SET"
+    " reviews = review_stats_daily.reviews + excluded.reviews,"
+    " followups = review_stats_daily.followups + excluded.followups,"
+    " code_chars = review_stats_daily.code_chars + excluded.code_chars"
+)
+UPSERT_SESSION = (
+    "INSERT INTO review_sessions_daily (day, session_id) VALUES (?, ?)"
+    " ON CONFLICT (day, session_id) DO NOTHING"
+)
+
+BACKFILL_BATCH = 500
+
+
+def day_of(timestamp: float) -> str:
+    """Returns the UTC day of a Unix time, as ``YYYY-MM-DD``."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+@dataclass
+class Counters:
+    """
+    Counters of a group of reviews.
+
+    Attributes:
+        reviews: First reviews (one per conversation)
+        followups: Follow-up turns
+        code_chars: Total length of the submitted code
+    """
+
+    reviews: int = 0
+    followups: int = 0
+    code_chars: int = 0
+
+    @property
+    def total(self) -> int:
+        """Reviews and follow-ups."""
+        return self.reviews + self.followups
+
+    @property
+    def avg_code_length(self) -> float:
+        """Mean length of the submitted code, in characters."""
+        return self.code_chars / self.total if self.total else 0.0
+
+    def add(self, reviews: int, followups: int, code_chars: int) -> None:
+        """Adds the counters of more reviews."""
+        self.reviews += reviews
+        self.followups += followups
+        self.code_chars += code_chars
+
+
+@dataclass
+class ReviewStats:
+    """
+    Statistics of the reviews of a time window.
+
+    Attributes:
+        since_day: First day of the window (None for all time)
+        totals: Counters of every review of the window
+        languages: Counters per language
+        daily: Counters per day, oldest first (days without reviews omitted)
+        active_sessions: Sessions that sent a review, for the whole class
+            (None for the statistics of one session)
+    """
+
+    since_day: str | None
+    totals: Counters = field(default_factory=Counters)
+    languages: dict[str, Counters] = field(default_factory=dict)
+    daily: dict[str, Counters] = field(default_factory=dict)
+    active_sessions: int | None = None
+
+
+class ReviewStatsStore:
+    """
+    Daily review counters, per scope (class or session) and language.
+
+    ``record`` is a ``ReviewStore`` indexer: the counters are incremented in
+    the transaction that stores the reviews. Reviews stored before the
+    counters existed are counted by ``create_tables``.
+
+    Args:
+        database: Database holding the ``reviews`` table
+    """
+
+    def __init__(self, database: Database) -> None:
+        self.database = database
+
+    def create_tables(self) -> None:
+        """Creates the tables if they do not exist, and fills them if empty."""
+        self.database.executescript(SCHEMA)
+        if self.database.fetchall("SELECT 1 FROM review_stats_daily LIMIT 1"):
+            return
+        last = 0
+        while True:
+            records = scan_reviews(self.database, last, BACKFILL_BATCH)
+            if not records:
+                return
+            with self.database.transaction() as transaction:
+                self.record(transaction, records)
+            last = records[-1].id
+
+    def record(self, transaction: Transaction, records: Iterable[ReviewRecord]) -> None:
+        """
+        Counts reviews inserted in the same transaction.
+
+        Args:
+            transaction: Transaction that inserted the reviews
+            records: Reviews to count
+        """
+        counters: dict[tuple[str, str, str], Counters] = defaultdict(Counters)
+        sessions: set[tuple[str, str]] = set()
+        for record in records:
+            day = day_of(record.timestamp)
+            followup = record.kind == "followup"
+            scopes = [ALL_SESSIONS]
+            if record.session_id and record.session_id != ALL_SESSIONS:
+                scopes.append(record.session_id)
+                sessions.add((day, record.session_id))
+            for scope in scopes:
+                counters[scope, day, record.language].add(
+                    0 if followup else 1, 1 if followup else 0, len(record.code)
+                )
+        transaction.executemany(
+            UPSERT_COUNTERS,
+            [
+                (*key, value.reviews, value.followups, value.code_chars)
+                for key, value in counters.items()
+            ],
+        )
+        transaction.executemany(UPSERT_SESSION, sorted(sessions))
+
+    def stats(
+        self, session_id: str | None = None, days: int | None = None
+    ) -> ReviewStats:
+        """
+        Adds up the counters of a time window.
+
+        Args:
+            session_id: Statistics of this session (of the whole class if None)
+            days: Number of days in the window, today included (all time if None)
+
+        Returns:
+            The statistics
+        """
+        since = None
+        if days is not None:
+            since = day_of(time.time() - (days - 1) * 86400)
+
+        condition = "scope = ?"
+        parameters: list[Any] = [session_id or ALL_SESSIONS]
+        if since is not None:
+            condition += " AND day >= ?"
+            parameters.append(since)
+        rows = self.database.fetchall(
+            "SELECT day, language, reviews, followups, code_chars"
+            f" FROM review_stats_daily WHERE {condition} ORDER BY day",
+            parameters,
+        )
+
+        stats = ReviewStats(since)
+        for day, language, *values in rows:
+            stats.totals.add(*values)
+            stats.languages.setdefault(language, Counters()).add(*values)
+            stats.daily.setdefault(day, Counters()).add(*values)
+
+        if session_id is None:
+            window = "WHERE day >= ?" if since is not None else ""
+            stats.active_sessions = self.database.fetchall(
+                "SELECT COUNT(DISTINCT session_id) FROM review_sessions_daily"
+                f" {window}",
+                [since] if since is not None else [],
+            )[0][0]
+        return stats
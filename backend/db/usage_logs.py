@@ -0,0 +1,88 @@
+"""
+Usage logs: one row per served request, with the tokens it consumed.
+"""
+
+from dataclasses import dataclass
+
+from backend.db.database import Database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_logs (
+    id {id},
+    session_id TEXT NOT NULL,
+    client_ip TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    timestamp {float} NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    tokens_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_usage_logs_session ON usage_logs (session_id, timestamp);
+"""
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    """
+    Tokens consumed by one request.
+
+    Attributes:
+        session_id: Session that sent the request (empty if anonymous)
+        client_ip: Address of the client
+        endpoint: API endpoint, e.g. "/api/review"
+        timestamp: Unix time at which the request ended
+        prompt_tokens: Prompt tokens processed by the engine
+        completion_tokens: Tokens generated by the engine
+    """
+
+    session_id: str
+    client_ip: str
+    endpoint: str
+    timestamp: float
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def tokens_used(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class UsageLogStore:
+    """
+    Writes usage records to the ``usage_logs`` table.
+
+    Args:
+        database: Database holding the table
+    """
+
+    def __init__(self, database: Database) -> None:
+        self.database = database
+
+    def create_tables(self) -> None:
+        """Creates the table and its indexes if they do not exist."""
+        self.database.executescript(self.database.schema(SCHEMA))
+
+    def insert_many(self, records: list[UsageRecord]) -> None:
+        """
+        Inserts records in one transaction.
+
+        Args:
+            records: Usage records to insert
+        """
+        self.database.executemany(
+            "INSERT INTO usage_logs (session_id, client_ip, endpoint, timestamp,"
+            " prompt_tokens, completion_tokens, tokens_used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    record.session_id,
+                    record.client_ip,
+                    record.endpoint,
+                    record.timestamp,
+                    record.prompt_tokens,
+                    record.completion_tokens,
+                    record.tokens_used,
+                )
+                for record in records
+            ],
+        )
@@ -0,0 +1,86 @@
+"""
+Fake OpenAI-compatible inference server.
+Streams canned answers from the fake engine through ``/v1/chat/completions``,
+so that several replicas with different latencies can run locally, without a
+GPU, to exercise the upstream router:
+    sensai fake-upstream --port 8101 --ttft-ms 100
+    sensai fake-upstream --port 8102 --ttft-ms 400 --token-latency-ms 40
+"""
+
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from backend.api.sse import DONE_EVENT
+from backend.services.llm_service import FakeLLMEngine, GenerationRequest
+
+
+def _chunk(completion_id: str, model: str, **fields: Any) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        **fields,
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def create_fake_upstream_app(engine: FakeLLMEngine, model: str = "fake") -> FastAPI:
+    """
+    Creates the fake OpenAI-compatible server.
+
+    Args:
+        engine: Fake engine producing the answers
+        model: Model name reported by ``/v1/models``
+
+    Returns:
+        The application
+    """
+    app = FastAPI(title="sensAI fake upstream")
+
+    @app.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/v1/models")
+    async def models() -> dict[str, Any]:
+        return {"object": "list", "data": [{"id": model, "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> StreamingResponse:
+        body = await request.json()
+        generation = GenerationRequest(
+            request_id=uuid.uuid4().hex,
+            messages=body.get("messages", []),
+            max_tokens=body.get("max_tokens", 2048),
+        )
+        completion_id = f"chatcmpl-{generation.request_id}"
+
+        async def events() -> AsyncIterator[str]:
+            async for token in engine.stream(generation):
+                yield _chunk(
+                    completion_id,
+                    model,
+                    choices=[{"index": 0, "delta": {"content": token}}],
+                )
+            yield _chunk(
+                completion_id,
+                model,
+                choices=[],
+                usage={
+                    "prompt_tokens": generation.usage.prompt_tokens,
+                    "completion_tokens": generation.usage.completion_tokens,
+                    "total_tokens": generation.usage.total_tokens,
+                },
+            )
+            yield DONE_EVENT
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
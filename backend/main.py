@@ -0,0 +1,287 @@
+"""
+sensAI API server.
+
+Run with the ``sensai`` console script, or with uvicorn directly:
+    uvicorn backend.main:create_app --factory
+"""
+
+import argparse
+import dataclasses
+import logging
+import sys
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from backend import __version__
+from backend.api.routes import conversations, health, history, metrics, review, stats
+from backend.core.config import Settings, get_settings
+from backend.core.exceptions import SensAIError
+from backend.db.batch_writer import BatchWriter
+from backend.db.database import Database
+from backend.db.reviews import ReviewRecord, ReviewStore
+from backend.db.search import ReviewSearchIndex
+from backend.db.stats import ReviewStatsStore
+from backend.db.usage_logs import UsageLogStore, UsageRecord
+from backend.services.history import HistoryService
+from backend.services.llm_service import create_engine
+from backend.services.review_service import ReviewService
+from backend.services.scheduler import MicroBatchScheduler
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """
+    Creates the FastAPI application.
+
+    Args:
+        settings: Backend settings (read from the environment if omitted)
+
+    Returns:
+        The configured application
+    """
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        engine = create_engine(settings)
+        if settings.batch_window_ms > 0:
+            engine = MicroBatchScheduler(
+                engine,
+                window_ms=settings.batch_window_ms,
+                max_batch_size=settings.max_batch_size,
+                max_batch_tokens=settings.max_batch_tokens,
+            )
+        await engine.start()
+
+        database = Database(
+            settings.database_url, pool_size=settings.database_pool_size
+        )
+        usage_logs = UsageLogStore(database)
+        usage_logs.create_tables()
+        usage_log: BatchWriter[UsageRecord] = BatchWriter(
+            usage_logs.insert_many,
+            name="usage_logs",
+            max_batch=settings.usage_log_batch_size,
+            flush_interval_ms=settings.usage_log_flush_ms,
+        )
+        await usage_log.start()
+        search_index = ReviewSearchIndex(database)
+        review_stats = ReviewStatsStore(database)
+        reviews = ReviewStore(
+            database, indexers=[search_index.index, review_stats.record]
+        )
+        reviews.create_tables()
+        search_index.create_tables()
+        review_stats.create_tables()
+        review_log: BatchWriter[ReviewRecord] = BatchWriter(
+            reviews.insert_many,
+            name="reviews",
+            max_batch=settings.review_log_batch_size,
+            flush_interval_ms=settings.review_log_flush_ms,
+        )
+        await review_log.start()
+
+        app.state.settings = settings
+        app.state.engine = engine
+        app.state.database = database
+        app.state.review_service = ReviewService(
+            engine, settings, usage_log=usage_log, review_log=review_log
+        )
+        app.state.history_service = HistoryService(reviews, search_index, review_stats)
+        logger.info("sensAI backend ready (engine=%s)", engine.name)
+        try:
+            yield
+        finally:
+            await app.state.review_service.close()
+            await engine.close()
+            await usage_log.close()
+            await review_log.close()
+            database.close()
+
+    app = FastAPI(title="sensAI", version=__version__, lifespan=lifespan)
+
+    @app.exception_handler(SensAIError)
+    async def sensai_error_handler(request: Request, exc: SensAIError) -> JSONResponse:
+        return JSONResponse(
+            status_code=exc.status_code, content=exc.to_dict(), headers=exc.headers
+        )
+
+    app.include_router(health.router)
+    app.include_router(metrics.router)
+    app.include_router(review.router, prefix="/api")
+    app.include_router(conversations.router, prefix="/api")
+    app.include_router(history.router, prefix="/api")
+    app.include_router(stats.router, prefix="/api")
+    return app
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sensai", description="sensAI backend")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve = subparsers.add_parser("serve", help="Run the API server (default)")
+    serve.add_argument("--host", help="Interface to bind to")
+    serve.add_argument("--port", type=int, help="Port to listen on")
+    serve.add_argument(
+        "--engine",
+        choices=["vllm", "openai", "fake"],
+        help="Inference engine ('openai' proxies SENSAI_UPSTREAM_URL, "
+        "'fake' streams canned answers, no GPU needed)",
+    )
+    serve.add_argument("--log-level", default="info", help="Logging level")
+
+    fake = subparsers.add_parser(
+        "fake-upstream", help="Run a fake OpenAI-compatible inference server (no GPU)"
+    )
+    fake.add_argument("--host", default="127.0.0.1", help="Interface to bind to")
+    fake.add_argument("--port", type=int, default=8101, help="Port to listen on")
+    fake.add_argument(
+        "--ttft-ms", type=float, default=200.0, help="Time to first token"
+    )
+    fake.add_argument(
+        "--token-latency-ms", type=float, default=20.0, help="Per-token latency"
+    )
+    fake.add_argument(
+        "--response-tokens", type=int, default=200, help="Tokens per answer"
+    )
+    fake.add_argument("--log-level", default="info", help="Logging level")
+
+    batch = subparsers.add_parser(
+        "review-batch",
+        help=(
+            "Review every file of a directory or zip archive offline, "
+            "into a JSONL file"
+        ),
+    )
+    batch.add_argument("source", help="Directory or .zip archive of submissions")
+    batch.add_argument(
+        "-o",
+        "--output",
+        default="reviews.jsonl",
+        help="JSONL output (resumed if it exists)",
+    )
+    batch.add_argument(
+        "--engine", choices=["vllm", "openai", "fake"], help="Inference engine"
+    )
+    batch.add_argument("--question", help="Question asked about every submission")
+    batch.add_argument(
+        "--mode", help="Specialized review focus (performance, security, ...)"
+    )
+    batch.add_argument("--level", help="Student level (beginner or advanced)")
+    batch.add_argument(
+        "--workers",
+        type=int,
+        help="Processes preparing the prompts (default: CPU count)",
+    )
+    batch.add_argument(
+        "--concurrency",
+        type=int,
+        help="Generations in flight (default: SENSAI_MAX_IN_FLIGHT)",
+    )
+    batch.add_argument(
+        "--no-progress", action="store_true", help="Hide the progress line"
+    )
+    batch.add_argument("--log-level", default="warning", help="Logging level")
+    return parser
+
+
+def _serve(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    overrides = {
+        name: value
+        for name, value in (
+            ("host", args.host),
+            ("port", args.port),
+            ("engine", args.engine),
+        )
+        if value is not None
+    }
+    settings = dataclasses.replace(get_settings(), **overrides)
+
+    logging.basicConfig(level=args.log_level.upper())
+    # A single worker with an asyncio event loop serves every stream concurrently
+    uvicorn.run(
+        create_app(settings),
+        host=settings.host,
+        port=settings.port,
+        log_level=args.log_level,
+    )
+
+
+def _fake_upstream(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from backend.fake_upstream import create_fake_upstream_app
+    from backend.services.llm_service import FakeLLMEngine
+
+    engine = FakeLLMEngine(
+        ttft_ms=args.ttft_ms,
+        token_latency_ms=args.token_latency_ms,
+        response_tokens=args.response_tokens,
+    )
+    logging.basicConfig(level=args.log_level.upper())
+    uvicorn.run(
+        create_fake_upstream_app(engine),
+        host=args.host,
+        port=args.port,
+        log_level=args.log_level,
+    )
+
+
+def _review_batch(args: argparse.Namespace) -> None:
+    import asyncio
+    from pathlib import Path
+
+    from backend.batch_review import BatchOptions, review_batch
+
+    settings = get_settings()
+    if args.engine is not None:
+        settings = dataclasses.replace(settings, engine=args.engine)
+
+    logging.basicConfig(level=args.log_level.upper())
+    try:
+        summary = asyncio.run(
+            review_batch(
+                Path(args.source),
+                Path(args.output),
+                settings,
+                BatchOptions(question=args.question, mode=args.mode, level=args.level),
+                workers=args.workers,
+                concurrency=args.concurrency,
+                progress=not args.no_progress,
+            )
+        )
+    except (SensAIError, ValueError) as e:
+        sys.exit(f"sensai review-batch: {e}")
+    print(
+        f"{summary.reviewed} reviewed, {summary.resumed} already done, "
+        f"{summary.skipped} skipped, {summary.failed} failed "
+        f"({summary.prompt_tokens} prompt and "
+        f"{summary.completion_tokens} completion tokens) -> {args.output}",
+        file=sys.stderr,
+    )
+    if summary.failed:
+        sys.exit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Entry point of the ``sensai`` console script."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["serve", *argv]
+    args = _build_parser().parse_args(argv)
+    if args.command == "fake-upstream":
+        _fake_upstream(args)
+    elif args.command == "review-batch":
+        _review_batch(args)
+    else:
+        _serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,13 @@ Prompt templates for the AI Coding Sensei.
 Organized by language and use case.
 """
 
-from .base_prompts import SYSTEM_PROMPT, create_code_review_prompt
+from .base_prompts import (
+    SYSTEM_PROMPT,
+    create_code_review_prompt,
+    create_question_prompt,
+    create_resubmission_prompt,
+    create_summary_prompt,
+)
 from .language_specific import (
     PYTHON_PROMPT,
     JAVASCRIPT_PROMPT,
@@ -13,6 +19,8 @@ from .language_specific import (
     GO_PROMPT,
     RUST_PROMPT,
 )
+from .prefix import build_static_prefix, prefix_fingerprint
+from .registry import PromptEntry, PromptRegistry, UnknownPromptError
 from .specialized_prompts import (
     PERFORMANCE_ANALYSIS_PROMPT,
     SECURITY_REVIEW_PROMPT,
@@ -24,6 +32,14 @@ from .specialized_prompts import (
 __all__ = [
     "SYSTEM_PROMPT",
     "create_code_review_prompt",
+    "create_question_prompt",
+    "create_resubmission_prompt",
+    "create_summary_prompt",
+    "build_static_prefix",
+    "prefix_fingerprint",
+    "PromptEntry",
+    "PromptRegistry",
+    "UnknownPromptError",
     "PYTHON_PROMPT",
     "JAVASCRIPT_PROMPT",
     "TYPESCRIPT_PROMPT",
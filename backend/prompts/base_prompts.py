@@ -33,40 +33,94 @@ Teaching Guidelines:
 - Make learning fun and engaging!"""
 
 
-def create_code_review_prompt(code: str, language: str = "unknown", question: str = "", context: str = "") -> str:
+def create_code_review_prompt(
+    code: str,
+    language: str = "unknown",
+    question: str = "",
+    context: str = "",
+    analysis: str = "",
+) -> str:
     """
     Creates a prompt for code review with optional student question and context.
 
+    Static instruction text comes first and variable content (question, code,
+    context) last, so that requests share the longest possible common prefix.
+
     Args:
         code: The code snippet to review
         language: Programming language (if known)
         question: Optional specific question from the student
         context: Optional context about previous conversations or student level
+        analysis: Optional facts found by static analysis of the code
 
     Returns:
         Formatted prompt for the AI model
     """
     prompt_parts = []
 
-    # Add context if provided
-    if context:
-        prompt_parts.append(f"<context>\n{context}\n</context>\n")
+    # Unknown languages get a plain fence rather than an "unknown" one
+    fence = "" if language == "unknown" else language
+    described = f"{fence} code" if fence else "code"
+
+    # Static instruction
+    prompt_parts.append(
+        "Please review the following code as the student's sensei. "
+        "Help them understand and improve.\n"
+    )
 
     # Main instruction
     if question:
-        prompt_parts.append(f"A student has submitted the following {language} code with this question: '{question}'\n")
+        prompt_parts.append(
+            f"A student has submitted the following {described} "
+            f"with this question: '{question}'\n"
+        )
     else:
-        prompt_parts.append(f"A student has submitted the following {language} code for review:\n")
+        prompt_parts.append(
+            f"A student has submitted the following {described} for review:\n"
+        )
 
     # Code block
-    prompt_parts.append(f"```{language}\n{code}\n```\n")
+    prompt_parts.append(f"```{fence}\n{code}\n```")
 
-    # Final instruction
-    prompt_parts.append("Please review this code as their sensei. Help them understand and improve.")
+    # Static analysis facts, so the model does not have to rediscover them
+    if analysis:
+        prompt_parts.append(
+            "\nAn automatic static analysis of this code found (it may be incomplete, "
+            f"check before relying on it):\n<analysis>\n{analysis}\n</analysis>"
+        )
+
+    # Add context if provided
+    if context:
+        prompt_parts.append(f"\n<context>\n{context}\n</context>")
 
     return "\n".join(prompt_parts)
 
 
+def create_question_prompt(
+    question: str, language: str = "unknown", context: str = ""
+) -> str:
+    """
+    Creates a prompt for a question asked in prose, without code to review.
+
+    Args:
+        question: The student's question
+        language: Programming language the question is about (if known)
+        context: Optional context about previous conversations or student level
+
+    Returns:
+        Formatted prompt for the AI model
+    """
+    about = "" if language == "unknown" else f" about {language}"
+    prompt = (
+        f"Please answer the student's question{about} as their sensei. Help them "
+        "understand, do not just give the answer.\n\n"
+        f"<question>\n{question}\n</question>"
+    )
+    if context:
+        prompt += f"\n\n<context>\n{context}\n</context>"
+    return prompt
+
+
 def create_followup_prompt(previous_response: str, student_reply: str) -> str:
     """
     Creates a prompt for follow-up questions in a conversation.
@@ -89,6 +143,72 @@ def create_followup_prompt(previous_response: str, student_reply: str) -> str:
 Continue the conversation as a patient sensei. Answer their question or address their comment while maintaining the teaching approach. Guide them further towards understanding."""
 
 
+def create_resubmission_prompt(
+    previous_review: str, diff: str, language: str = "unknown", question: str = ""
+) -> str:
+    """
+    Creates a follow-up prompt for code resubmitted after a review, from the
+    changed hunks only.
+
+    Args:
+        previous_review: Digest of your review of the previous version
+        diff: Unified diff between the previous and the new version (empty if
+            the code did not change)
+        language: Programming language (if known)
+        question: Optional specific question from the student
+
+    Returns:
+        Formatted follow-up prompt
+    """
+    if diff:
+        fence = "" if language == "unknown" else f" {language}"
+        reply = (
+            f"I changed my{fence} code after your review. Here are the changes "
+            "(unified diff, the rest of the code is unchanged):\n"
+            f"```diff\n{diff}\n```"
+        )
+        reply += f"\n\n{question}" if question else ""
+        reply += (
+            "\n\nReview the changes: tell me which of your points they address, "
+            "and whether they introduce new issues."
+        )
+    else:
+        reply = "I submitted my code again without changing it."
+        reply += f"\n\n{question}" if question else "\n\nWhat should I work on next?"
+    return create_followup_prompt(previous_review, reply)
+
+
+_SUMMARY_INSTRUCTIONS = (
+    "Update the summary of this tutoring conversation with the new turns. Keep "
+    "what the student is working on (language, code names, the problem), what "
+    "they already understood or fixed, the questions still open and your pending "
+    "hints. Drop greetings and repeated code. Write at most a few short "
+    "paragraphs, in the third person, without code blocks."
+)
+
+
+def create_summary_prompt(previous_summary: str, transcript: str) -> str:
+    """
+    Creates a prompt that folds older conversation turns into a rolling summary.
+
+    Args:
+        previous_summary: Summary of the turns folded so far (empty at first)
+        transcript: The turns to fold in, oldest first
+
+    Returns:
+        Formatted summarization prompt
+    """
+    return f"""<previous_summary>
+{previous_summary or "(none yet)"}
+</previous_summary>
+
+<new_turns>
+{transcript}
+</new_turns>
+
+{_SUMMARY_INSTRUCTIONS}"""
+
+
 def create_concept_explanation_prompt(concept: str, language: str = "general") -> str:
     """
     Creates a prompt for explaining a programming concept.
@@ -301,3 +301,14 @@ RUST_PROMPT = """When reviewing Rust code, pay special attention to:
 - Async runtime if applicable
 - Crate dependencies
 - Target platform considerations"""
+
+
+LANGUAGE_PROMPTS = {
+    "python": PYTHON_PROMPT,
+    "javascript": JAVASCRIPT_PROMPT,
+    "typescript": TYPESCRIPT_PROMPT,
+    "java": JAVA_PROMPT,
+    "cpp": CPP_PROMPT,
+    "go": GO_PROMPT,
+    "rust": RUST_PROMPT,
+}
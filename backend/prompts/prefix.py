@@ -0,0 +1,58 @@
+"""
+Static prompt prefix shared by every request of the same kind.
+The prefix is assembled in a fixed order (system prompt, language prompt,
+specialized prompt, level prompt) so that it is byte-identical across requests
+and can be reused by the inference engine's automatic prefix cache.
+"""
+
+import hashlib
+
+from .base_prompts import SYSTEM_PROMPT
+from .language_specific import LANGUAGE_PROMPTS
+from .specialized_prompts import LEVEL_PROMPTS, SPECIALIZED_PROMPTS
+
+PREFIX_SEPARATOR = "\n\n"
+
+
+def build_static_prefix(
+    language: str = "unknown", mode: str | None = None, level: str | None = None
+) -> str:
+    """
+    Builds the static system prompt for a language, review mode and student level.
+
+    Nothing request-specific may be added here: any variable byte would change
+    the prefix and defeat prefix caching.
+
+    Args:
+        language: Programming language (no language block if not supported)
+        mode: Optional specialized review mode (see SPECIALIZED_PROMPTS)
+        level: Optional student level (see LEVEL_PROMPTS)
+
+    Returns:
+        The static prefix
+
+    Raises:
+        KeyError: If the mode or level is not known
+    """
+    parts = [SYSTEM_PROMPT]
+    language_prompt = LANGUAGE_PROMPTS.get(language)
+    if language_prompt:
+        parts.append(language_prompt)
+    if mode:
+        parts.append(SPECIALIZED_PROMPTS[mode])
+    if level:
+        parts.append(LEVEL_PROMPTS[level])
+    return PREFIX_SEPARATOR.join(parts)
+
+
+def prefix_fingerprint(prefix: str) -> str:
+    """
+    Computes a stable fingerprint of a static prefix.
+
+    Args:
+        prefix: Prefix built by ``build_static_prefix``
+
+    Returns:
+        First 16 hex digits of the SHA-256 of the prefix
+    """
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,125 @@
+"""
+Precompiled prompt registry.
+Every valid combination of system, language, specialized and level prompts is
+assembled once at startup, so that a request resolves its static prefix with a
+single dict lookup.
+"""
+
+import itertools
+import sys
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from .language_specific import LANGUAGE_PROMPTS
+from .prefix import build_static_prefix, prefix_fingerprint
+from .specialized_prompts import LEVEL_PROMPTS, SPECIALIZED_PROMPTS
+
+PromptKey = tuple[str | None, str | None, str | None]
+
+# Language value meaning "no language-specific guidance"
+UNKNOWN_LANGUAGE = "unknown"
+
+
+class UnknownPromptError(ValueError):
+    """
+    Raised when a language, mode or level has no prompt.
+
+    Args:
+        kind: What was looked up ("language", "mode" or "level")
+        value: The unsupported value
+        supported: The values that are supported
+    """
+
+    def __init__(self, kind: str, value: str, supported: list[str]) -> None:
+        super().__init__(
+            f"Unknown {kind}: {value!r} (supported: {', '.join(supported)})"
+        )
+        self.kind = kind
+        self.value = value
+        self.supported = supported
+
+
+@dataclass(frozen=True)
+class PromptEntry:
+    """
+    A precompiled static prefix.
+
+    Attributes:
+        language: Language of the language block (None for generic reviews)
+        mode: Specialized review mode, if any
+        level: Student level, if any
+        text: Interned prefix text
+        token_count: Number of tokens of the prefix
+        fingerprint: Stable hash of the prefix
+    """
+
+    language: str | None
+    mode: str | None
+    level: str | None
+    text: str
+    token_count: int
+    fingerprint: str
+
+
+class PromptRegistry:
+    """
+    Lookup table of every static prefix.
+
+    Args:
+        count_tokens: Token counter used to precompute each entry's size
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int]) -> None:
+        self._entries: dict[PromptKey, PromptEntry] = {}
+        for language, mode, level in itertools.product(
+            [None, *LANGUAGE_PROMPTS],
+            [None, *SPECIALIZED_PROMPTS],
+            [None, *LEVEL_PROMPTS],
+        ):
+            text = sys.intern(
+                build_static_prefix(language or UNKNOWN_LANGUAGE, mode, level)
+            )
+            self._entries[(language, mode, level)] = PromptEntry(
+                language=language,
+                mode=mode,
+                level=level,
+                text=text,
+                token_count=count_tokens(text),
+                fingerprint=prefix_fingerprint(text),
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        language: str | None = None,
+        mode: str | None = None,
+        level: str | None = None,
+    ) -> PromptEntry:
+        """
+        Resolves the static prefix of a request.
+
+        Args:
+            language: Programming language ("unknown" or None for a generic review)
+            mode: Optional specialized review mode
+            level: Optional student level
+
+        Returns:
+            The precompiled entry
+
+        Raises:
+            UnknownPromptError: If the language, mode or level is not supported
+        """
+        if language == UNKNOWN_LANGUAGE:
+            language = None
+        entry = self._entries.get((language or None, mode or None, level or None))
+        if entry is not None:
+            return entry
+
+        # Slow path, only to report which part of the key is wrong
+        if language and language not in LANGUAGE_PROMPTS:
+            raise UnknownPromptError("language", language, sorted(LANGUAGE_PROMPTS))
+        if mode and mode not in SPECIALIZED_PROMPTS:
+            raise UnknownPromptError("mode", mode, sorted(SPECIALIZED_PROMPTS))
+        raise UnknownPromptError("level", str(level), sorted(LEVEL_PROMPTS))
@@ -324,3 +324,18 @@ ADVANCED_DEVELOPER_PROMPT = """This student appears to be advanced. Adjust your
 - Consider real-world constraints
 
 Focus on helping them level up further rather than basic concepts."""
+
+
+SPECIALIZED_PROMPTS = {
+    "performance": PERFORMANCE_ANALYSIS_PROMPT,
+    "security": SECURITY_REVIEW_PROMPT,
+    "best_practices": BEST_PRACTICES_PROMPT,
+    "refactoring": REFACTORING_PROMPT,
+    "debug": DEBUG_HELP_PROMPT,
+}
+
+
+LEVEL_PROMPTS = {
+    "beginner": BEGINNER_FRIENDLY_PROMPT,
+    "advanced": ADVANCED_DEVELOPER_PROMPT,
+}
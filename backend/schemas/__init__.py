@@ -0,0 +1,28 @@
+"""
+Pydantic schemas for request validation and response serialization.
+"""
+
+from .history import (
+    CountersItem,
+    DailyCounters,
+    HistoryPage,
+    LanguageCounters,
+    ReviewItem,
+    ReviewSummaryItem,
+    SearchResults,
+    StatsResponse,
+)
+from .review import ChatTurn, ReviewRequest
+
+__all__ = [
+    "ChatTurn",
+    "CountersItem",
+    "DailyCounters",
+    "HistoryPage",
+    "LanguageCounters",
+    "ReviewItem",
+    "ReviewRequest",
+    "ReviewSummaryItem",
+    "SearchResults",
+    "StatsResponse",
+]
@@ -0,0 +1,143 @@
+"""
+Schemas for the review history endpoints.
+"""
+
+from pydantic import BaseModel
+
+
+class ReviewSummaryItem(BaseModel):
+    """
+    One answered review, as listed: without its full code and answer.
+
+    Attributes:
+        id: Row id, to fetch the full review (and the pagination cursor)
+        conversation_id: Conversation the review belongs to
+        timestamp: Unix time at which the answer completed
+        kind: "review" for a first review, "followup" for a later turn
+        language: Programming language of the submission
+        question: Question of the student ("" if none)
+        code_preview: Beginning of the submitted code
+        code_length: Length of the whole submitted code, in characters
+    """
+
+    id: int
+    conversation_id: str
+    timestamp: float
+    kind: str
+    language: str
+    question: str
+    code_preview: str
+    code_length: int
+
+
+class ReviewItem(BaseModel):
+    """
+    One answered review, in full (``GET /api/history/{id}``).
+
+    Attributes:
+        id: Row id, also the pagination cursor
+        review_id: Identifier of the request
+        conversation_id: Conversation the review belongs to
+        timestamp: Unix time at which the answer completed
+        kind: "review" for a first review, "followup" for a later turn
+        language: Programming language of the submission
+        mode: Review focus ("" for a general review)
+        question: Question of the student ("" if none)
+        code: Submitted code, or message for follow-ups
+        response: Answer of the sensei
+    """
+
+    id: int
+    review_id: str
+    conversation_id: str
+    timestamp: float
+    kind: str
+    language: str
+    mode: str
+    question: str
+    code: str
+    response: str
+
+
+class HistoryPage(BaseModel):
+    """
+    Response of ``GET /api/history``.
+
+    Attributes:
+        items: Reviews of the page, newest first
+        next_cursor: Value of ``cursor`` for the following page (None on the last page)
+    """
+
+    items: list[ReviewSummaryItem]
+    next_cursor: int | None = None
+
+
+class SearchResults(BaseModel):
+    """
+    Response of ``GET /api/history/search``.
+
+    Attributes:
+        items: Matching reviews, most relevant first
+        next_offset: Value of ``offset`` for the following page (None on the last page)
+    """
+
+    items: list[ReviewSummaryItem]
+    next_offset: int | None = None
+
+
+class CountersItem(BaseModel):
+    """
+    Counters of a group of reviews.
+
+    Attributes:
+        total: Reviews and follow-ups
+        reviews: First reviews (one per conversation)
+        followups: Follow-up turns
+        avg_code_length: Mean length of the submitted code, in characters
+    """
+
+    total: int
+    reviews: int
+    followups: int
+    avg_code_length: float
+
+
+class LanguageCounters(CountersItem):
+    """
+    Counters of the reviews in one language.
+
+    Attributes:
+        language: Programming language
+    """
+
+    language: str
+
+
+class DailyCounters(CountersItem):
+    """
+    Counters of the reviews of one day.
+
+    Attributes:
+        day: UTC day, as ``YYYY-MM-DD``
+    """
+
+    day: str
+
+
+class StatsResponse(BaseModel):
+    """
+    Response of ``GET /api/stats``.
+
+    Attributes:
+        since_day: First day of the window (None for all time)
+        totals: Counters of every review of the window
+        languages: Counters per language, most reviewed first
+        daily: Counters per day, oldest first (days without reviews omitted)
+        active_sessions: Sessions that sent a review (class-wide statistics only)
+    """
+
+    since_day: str | None
+    totals: CountersItem
+    languages: list[LanguageCounters]
+    daily: list[DailyCounters]
+    active_sessions: int | None = None
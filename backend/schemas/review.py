@@ -0,0 +1,46 @@
+"""
+Schemas for the code review endpoint.
+"""
+
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class ChatTurn(BaseModel):
+    """
+    One message of the conversation so far.
+
+    Attributes:
+        role: Who wrote the message
+        content: Message text
+    """
+
+    role: Literal["user", "assistant"]
+    content: str = Field(..., max_length=200_000)
+
+
+class ReviewRequest(BaseModel):
+    """
+    Payload of ``POST /api/review``.
+
+    Attributes:
+        code: The code snippet (or message) submitted by the student
+        language: Programming language of the snippet ("auto" to detect it,
+            "unknown" for no language-specific guidance)
+        question: Optional specific question from the student
+        mode: Optional specialized review focus ("performance", "security", ...)
+        level: Optional student level ("beginner" or "advanced")
+        history: Previous turns of the conversation, oldest first
+        session_id: Identifier of the client session, used for rate limiting
+        conversation_id: Identifier of the conversation, used to cancel its answers
+    """
+
+    code: str = Field(..., min_length=1, max_length=200_000)
+    language: str = Field(default="auto", max_length=32)
+    question: str | None = Field(default=None, max_length=4_000)
+    mode: str | None = Field(default=None, max_length=32)
+    level: str | None = Field(default=None, max_length=32)
+    history: list[ChatTurn] = Field(default_factory=list, max_length=100)
+    session_id: str | None = Field(default=None, max_length=64)
+    conversation_id: str | None = Field(default=None, max_length=64)
@@ -0,0 +1,3 @@
+"""
+Business logic for the sensAI backend.
+"""
@@ -0,0 +1,242 @@
+"""
+Admission control for generations.
+At most ``max_in_flight`` generations run at once; further requests wait in a
+bounded priority queue, and are rejected right away once the queue is full so
+that clients can retry later instead of timing out.
+"""
+
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from backend.core.exceptions import QueueFullError
+from backend.core.metrics import REGISTRY
+
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "sensai_admission_in_flight",
+    "Generations currently admitted",
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "sensai_admission_queue_depth",
+    "Requests waiting for a generation slot",
+)
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    "sensai_admission_queue_wait_seconds",
+    "Time spent waiting for a generation slot, by request class",
+    ["request_class"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "sensai_admission_rejections_total",
+    "Requests rejected because the wait queue was full, by request class",
+    ["request_class"],
+)
+
+
+class RequestClass(str, enum.Enum):
+    """Scheduling class of a request; lower priorities are served first."""
+
+    FOLLOWUP = "followup"  # Short turn in an ongoing conversation
+    REVIEW = "review"  # First review of a submission
+
+    @property
+    def priority(self) -> int:
+        return _PRIORITIES[self]
+
+
+_PRIORITIES = {RequestClass.FOLLOWUP: 0, RequestClass.REVIEW: 1}
+
+
+@dataclass(order=True)
+class Ticket:
+    """
+    A request's place in the admission queue.
+
+    Tickets are ordered by priority, then by arrival.
+    """
+
+    priority: int
+    sequence: int
+    request_class: RequestClass = field(compare=False)
+    enqueued_at: float = field(default_factory=time.monotonic, compare=False)
+    granted: bool = field(default=False, compare=False)
+    released: bool = field(default=False, compare=False)
+
+
+@dataclass(frozen=True)
+class QueuePosition:
+    """Position of a request waiting for a generation slot (1 is next)."""
+
+    position: int
+
+
+class AdmissionController:
+    """
+    Bounds the number of concurrent generations.
+
+    Args:
+        max_in_flight: Generations allowed to run at once
+        max_queue: Requests allowed to wait for a slot
+        retry_after_s: Delay suggested to rejected clients
+    """
+
+    def __init__(
+        self, max_in_flight: int = 128, max_queue: int = 256, retry_after_s: int = 5
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.retry_after_s = retry_after_s
+        self.in_flight = 0
+        self._waiting: list[Ticket] = []
+        self._sequence = itertools.count()
+        self._changed = asyncio.Event()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiting)
+
+    def reserve(self, request_class: RequestClass) -> Ticket:
+        """
+        Takes a generation slot, or a place in the wait queue.
+
+        Called before the response starts, so that a full queue is reported
+        with a proper HTTP error.
+
+        Args:
+            request_class: Scheduling class of the request
+
+        Returns:
+            A ticket, already granted if a slot was free
+
+        Raises:
+            QueueFullError: If no slot is free and the wait queue is full
+        """
+        granted = self.try_reserve(request_class)
+        if granted is not None:
+            return granted
+
+        ticket = Ticket(request_class.priority, next(self._sequence), request_class)
+        if len(self._waiting) >= self.max_queue:
+            ADMISSION_REJECTIONS.inc(request_class=request_class.value)
+            raise QueueFullError(
+                "The sensei is busy right now, please try again in a few seconds.",
+                retry_after_s=self.retry_after_s,
+                details={"in_flight": self.in_flight, "queued": len(self._waiting)},
+            )
+
+        heapq.heappush(self._waiting, ticket)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiting))
+        return ticket
+
+    def try_reserve(self, request_class: RequestClass) -> Ticket | None:
+        """
+        Takes a generation slot if one is free, without queueing.
+
+        Args:
+            request_class: Scheduling class of the request
+
+        Returns:
+            A granted ticket, or None if no slot is free or requests are waiting
+        """
+        if self.in_flight >= self.max_in_flight or self._waiting:
+            return None
+        ticket = Ticket(request_class.priority, next(self._sequence), request_class)
+        self._grant(ticket)
+        return ticket
+
+    def transfer(self, ticket: Ticket) -> Ticket:
+        """
+        Hands the slot of a granted ticket over to a new owner.
+
+        The old ticket counts as released (releasing it again does nothing),
+        but the slot stays taken until the new ticket is released.
+
+        Args:
+            ticket: Granted ticket from ``reserve``
+
+        Returns:
+            A granted ticket holding the same slot
+        """
+        ticket.released = True
+        return Ticket(
+            ticket.priority,
+            next(self._sequence),
+            ticket.request_class,
+            enqueued_at=ticket.enqueued_at,
+            granted=True,
+        )
+
+    def position(self, ticket: Ticket) -> int:
+        """
+        Returns the 1-based position of a waiting ticket (0 once granted).
+
+        Args:
+            ticket: Ticket from ``reserve``
+        """
+        if ticket.granted:
+            return 0
+        return 1 + sum(1 for other in self._waiting if other < ticket)
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[int]:
+        """
+        Waits until the ticket is granted, reporting its queue position.
+
+        Args:
+            ticket: Ticket from ``reserve``
+
+        Returns:
+            Async iterator over the position, each time it changes; ends when
+            the ticket is granted
+        """
+        last = None
+        while not ticket.granted:
+            # Taken before yielding, so a change during the yield is not missed
+            changed = self._changed
+            position = self.position(ticket)
+            if position != last:
+                yield position
+                last = position
+            await changed.wait()
+
+    def release(self, ticket: Ticket) -> None:
+        """
+        Frees the ticket's slot, or leaves the queue if it was still waiting.
+
+        Safe to call more than once.
+
+        Args:
+            ticket: Ticket from ``reserve``
+        """
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self.in_flight -= 1
+        else:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+
+        while self._waiting and self.in_flight < self.max_in_flight:
+            self._grant(heapq.heappop(self._waiting))
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiting))
+        self._notify()
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = True
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_WAIT.observe(
+            time.monotonic() - ticket.enqueued_at,
+            request_class=ticket.request_class.value,
+        )
+
+    def _notify(self) -> None:
+        # Waiters hold the current event; swap it so they recompute positions
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
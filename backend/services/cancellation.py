@@ -0,0 +1,143 @@
+"""
+Cancellation of in-flight answers.
+Streams register under their conversation, so that the client can stop them
+explicitly (e.g. when the student restarts the conversation) instead of
+letting the model generate an answer nobody will read.
+"""
+
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+from backend.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+STREAMS_CANCELLED = REGISTRY.counter(
+    "sensai_streams_cancelled_total",
+    "Answer streams stopped by an explicit cancel request",
+)
+
+
+@dataclass(eq=False)
+class CancelScope:
+    """
+    Cancellation handle of one stream.
+
+    Attributes:
+        conversation_id: Conversation the stream belongs to
+        cancelled: Set when the stream must stop
+    """
+
+    conversation_id: str
+    cancelled: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class CancellationRegistry:
+    """Tracks the streams of each conversation."""
+
+    def __init__(self) -> None:
+        self._scopes: dict[str, set[CancelScope]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(scopes) for scopes in self._scopes.values())
+
+    def register(self, conversation_id: str) -> CancelScope:
+        """
+        Registers a stream of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier sent by the client
+
+        Returns:
+            The stream's cancel scope, to unregister when the stream ends
+        """
+        scope = CancelScope(conversation_id)
+        self._scopes.setdefault(conversation_id, set()).add(scope)
+        return scope
+
+    def unregister(self, scope: CancelScope) -> None:
+        """
+        Forgets a stream. Safe to call more than once.
+
+        Args:
+            scope: Scope from ``register``
+        """
+        scopes = self._scopes.get(scope.conversation_id)
+        if scopes is None:
+            return
+        scopes.discard(scope)
+        if not scopes:
+            del self._scopes[scope.conversation_id]
+
+    def cancel(self, conversation_id: str) -> int:
+        """
+        Stops every stream of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier
+
+        Returns:
+            Number of streams cancelled
+        """
+        scopes = self._scopes.pop(conversation_id, set())
+        for scope in scopes:
+            scope.cancelled.set()
+        STREAMS_CANCELLED.inc(len(scopes))
+        return len(scopes)
+
+
+async def until_cancelled(
+    items: AsyncIterator[T], cancelled: asyncio.Event
+) -> AsyncIterator[T]:
+    """
+    Forwards items until the event is set, even while waiting for the next one.
+
+    The source is closed as soon as the event is set, which runs its cleanup
+    (and aborts the engine request) right away.
+
+    Args:
+        items: Source async iterator
+        cancelled: Stops the iteration when set
+
+    Returns:
+        Async iterator over the items received before the cancellation
+    """
+    cancel_wait = asyncio.ensure_future(cancelled.wait())
+    next_item: asyncio.Future[T] | None = None
+    try:
+        while True:
+            next_item = asyncio.ensure_future(items.__anext__())
+            await asyncio.wait(
+                {next_item, cancel_wait}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not next_item.done():
+                return
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        cancel_wait.cancel()
+        if next_item is not None and not next_item.done():
+            # Interrupts the source where it waits; it cannot be closed while running
+            next_item.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_item
+        await close_iterator(items)
+
+
+async def close_iterator(items: AsyncIterator[object]) -> None:
+    """
+    Closes an async generator now rather than when it is garbage-collected,
+    so that its cleanup (e.g. aborting an engine request) runs right away.
+
+    Args:
+        items: Async iterator, closed if it is an async generator
+    """
+    aclose = getattr(items, "aclose", None)
+    if aclose is not None:
+        await aclose()
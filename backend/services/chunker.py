@@ -0,0 +1,375 @@
+"""
+Chunked review of large submissions.
+Splits code along syntactic boundaries (top-level functions and classes first,
+then their members) into token-bounded chunks that are reviewed separately, and
+merges the answers of the chunks into one deduplicated text.
+"""
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import accumulate
+
+from backend.services.code_analyzer import BRACE_LANGUAGES, tokenize
+
+# Lines starting a new file of a multi-file submission:
+# "# file: app.py", "// File: src/main.go", "/* file: util.cpp */", "=== app.js ==="
+_FILE_MARKER = re.compile(
+    r"^[ \t]*(?:(?:#|//|--|/\*+|<!--)[ \t]*file[ \t]*:[ \t]*(?P<path>[^\s*]+)[^\n]*"
+    r"|={3,}[ \t]*(?P<banner>[^\s=]+)[ \t]*={3,}[ \t]*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_EXTENSIONS = {
+    "py": "python",
+    "js": "javascript",
+    "jsx": "javascript",
+    "mjs": "javascript",
+    "cjs": "javascript",
+    "ts": "typescript",
+    "tsx": "typescript",
+    "java": "java",
+    "c": "cpp",
+    "h": "cpp",
+    "cc": "cpp",
+    "cpp": "cpp",
+    "cxx": "cpp",
+    "hpp": "cpp",
+    "go": "go",
+    "rs": "rust",
+}
+_PY_DEFINITION = re.compile(r"^(?P<indent>[ \t]*)(?:def\s|async\s+def\s|class\s)")
+_PY_PREAMBLE = re.compile(r"[@#]")
+
+# Paragraphs (and list items) shorter than this are never dropped as repeats
+MIN_REPEAT_CHARS = 40
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+_NON_WORD = re.compile(r"\W+")
+
+
+@dataclass
+class SourceFile:
+    """
+    One file of a submission.
+
+    Attributes:
+        path: File name given by its marker line (empty for a single file)
+        language: Language of the file (from its extension, if known)
+        code: Code of the file
+    """
+
+    path: str
+    language: str
+    code: str
+
+
+@dataclass
+class CodeChunk:
+    """
+    A part of a submission reviewed on its own.
+
+    Attributes:
+        code: Code of the chunk
+        language: Language of the code
+        path: File the chunk comes from (empty for a single file)
+        start_line: First line of the chunk in its file (1-based)
+        end_line: Last line of the chunk in its file
+    """
+
+    code: str
+    language: str
+    path: str
+    start_line: int
+    end_line: int
+
+    @property
+    def location(self) -> str:
+        lines = f"lines {self.start_line}-{self.end_line}"
+        return f"{self.path}, {lines}" if self.path else lines
+
+
+def language_for_path(path: str) -> str | None:
+    """
+    Tells the language of a file from its extension.
+
+    Args:
+        path: File name or path
+
+    Returns:
+        The language, or None if the extension is not a supported one
+    """
+    name = path.rsplit("/", 1)[-1]
+    if "." not in name:
+        return None
+    return _EXTENSIONS.get(name.rsplit(".", 1)[-1].lower())
+
+
+def split_files(code: str, language: str) -> list[SourceFile]:
+    """
+    Splits a multi-file submission on its file marker lines.
+
+    Args:
+        code: Submitted code
+        language: Language of the submission, for files without a known extension
+
+    Returns:
+        The files in order (the whole code as one file if there is no marker)
+    """
+    markers = list(_FILE_MARKER.finditer(code))
+    if not markers:
+        return [SourceFile("", language, code)]
+    files = []
+    if code[: markers[0].start()].strip():
+        files.append(SourceFile("", language, code[: markers[0].start()].strip("\n")))
+    for marker, following in zip(markers, [*markers[1:], None]):
+        path = marker.group("path") or marker.group("banner")
+        body = code[marker.end() : following.start() if following else len(code)]
+        if body.strip():
+            detected = language_for_path(path) or language
+            files.append(SourceFile(path, detected, body.strip("\n")))
+    return files
+
+
+def _python_cuts(lines: list[str]) -> tuple[set[int], set[int]]:
+    """Line indexes starting top-level definitions, and nested definitions."""
+    # By layout rather than with ast, which takes tens of milliseconds on the
+    # largest submissions (and fails on code that does not parse)
+    top: set[int] = set()
+    inner: set[int] = set()
+    for index, line in enumerate(lines):
+        match = _PY_DEFINITION.match(line)
+        if match is None:
+            continue
+        # Decorators and the comments right above a definition belong to it
+        indent = match.group("indent")
+        start = index
+        while start > 0 and _PY_PREAMBLE.match(lines[start - 1][len(indent) :]):
+            if not lines[start - 1].startswith(indent):
+                break
+            start -= 1
+        (inner if indent else top).add(start)
+    return top, inner
+
+
+def _brace_cuts(code: str, language: str) -> tuple[set[int], set[int]]:
+    """Line indexes following the blocks and statements closed at depth 0, then 1."""
+    top: set[int] = set()
+    inner: set[int] = set()
+    depth = 0
+    for token in tokenize(code, language):
+        if token.text == "{":
+            depth += 1
+            continue
+        if token.text == "}":
+            depth = max(depth - 1, 0)
+        elif token.text != ";":
+            continue
+        # Token lines are 1-based: the line index after the token's line
+        if depth == 0:
+            top.add(token.line)
+        elif depth == 1:
+            inner.add(token.line)
+    return top, inner
+
+
+def _segments(start: int, end: int, cuts: set[int]) -> list[tuple[int, int]]:
+    edges = [start, *sorted(cut for cut in cuts if start < cut < end), end]
+    return [(a, b) for a, b in zip(edges, edges[1:]) if a < b]
+
+
+class _Splitter:
+    """Splits the lines of one file into ranges of at most ``budget`` tokens."""
+
+    def __init__(
+        self,
+        lines: list[str],
+        levels: list[set[int]],
+        budget: int,
+        count: Callable[[str], int],
+    ) -> None:
+        self.levels = levels
+        self.budget = budget
+        # Prefix sums of the token counts of the lines (newline included)
+        self.offsets = [0, *accumulate(count(line) + 1 for line in lines)]
+
+    def tokens(self, start: int, end: int) -> int:
+        return self.offsets[end] - self.offsets[start]
+
+    def split(self, start: int, end: int, level: int = 0) -> list[tuple[int, int]]:
+        if self.tokens(start, end) <= self.budget:
+            return [(start, end)]
+        if level == len(self.levels):
+            return self._split_lines(start, end)
+        pieces = []
+        for a, b in _segments(start, end, self.levels[level]):
+            pieces.extend(self.split(a, b, level + 1))
+        return pieces
+
+    def _split_lines(self, start: int, end: int) -> list[tuple[int, int]]:
+        # Last resort: as many whole lines as fit (a longer line stands alone)
+        pieces = []
+        while start < end:
+            stop = start + 1
+            while stop < end and self.tokens(start, stop + 1) <= self.budget:
+                stop += 1
+            pieces.append((start, stop))
+            start = stop
+        return pieces
+
+    def pack(self, pieces: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        # Adjacent pieces are grouped while they fit, so that chunks are few and full
+        packed: list[tuple[int, int]] = []
+        for start, end in pieces:
+            if packed and self.tokens(packed[-1][0], end) <= self.budget:
+                packed[-1] = (packed[-1][0], end)
+            else:
+                packed.append((start, end))
+        return packed
+
+
+def split_code(
+    code: str,
+    language: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+    path: str = "",
+) -> list[CodeChunk]:
+    """
+    Splits the code of one file into chunks of at most ``max_tokens`` tokens.
+
+    Chunks end between top-level definitions when possible; a definition too
+    large for one chunk is split between its members (methods, nested blocks),
+    then on blank lines, then between lines.
+
+    Args:
+        code: Code of the file
+        language: Language of the code
+        max_tokens: Token budget of a chunk
+        count_tokens: Token counter
+        path: File name, recorded in the chunks
+
+    Returns:
+        The chunks, in order (blank chunks are dropped)
+    """
+    lines = code.split("\n")
+    if language == "python":
+        top, inner = _python_cuts(lines)
+    elif language in BRACE_LANGUAGES:
+        top, inner = _brace_cuts(code, language)
+    else:
+        top, inner = set(), set()
+    blank = {index for index, line in enumerate(lines) if not line.strip()}
+    splitter = _Splitter(lines, [top, inner, blank], max_tokens, count_tokens)
+    chunks = []
+    for start, end in splitter.pack(splitter.split(0, len(lines))):
+        # Blank lines at the edges are not worth reviewing or numbering
+        while start < end and not lines[start].strip():
+            start += 1
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        if start < end:
+            chunks.append(
+                CodeChunk("\n".join(lines[start:end]), language, path, start + 1, end)
+            )
+    return chunks
+
+
+def split_submission(
+    code: str, language: str, max_tokens: int, count_tokens: Callable[[str], int]
+) -> list[CodeChunk]:
+    """
+    Splits a submission, possibly made of several files, into chunks.
+
+    Chunks never span two files.
+
+    Args:
+        code: Submitted code
+        language: Language of the submission
+        max_tokens: Token budget of a chunk
+        count_tokens: Token counter
+
+    Returns:
+        The chunks, in order
+    """
+    chunks = []
+    for source in split_files(code, language):
+        chunks.extend(
+            split_code(
+                source.code, source.language, max_tokens, count_tokens, source.path
+            )
+        )
+    return chunks
+
+
+class AnswerMerger:
+    """
+    Merges the streamed answers of the chunks of a submission.
+
+    Reviews of the parts of one submission repeat the same general advice;
+    text is released paragraph by paragraph, and paragraphs or list items
+    already given for an earlier chunk are dropped. Code blocks are kept whole.
+
+    Args:
+        min_chars: Shortest paragraph or list item dropped as a repeat
+    """
+
+    def __init__(self, min_chars: int = MIN_REPEAT_CHARS) -> None:
+        self.min_chars = min_chars
+        self._seen: set[str] = set()
+        self._buffer = ""
+
+    def feed(self, text: str) -> str:
+        """
+        Adds streamed text.
+
+        Args:
+            text: Next delta of the current chunk's answer
+
+        Returns:
+            The text ready to be sent (possibly empty)
+        """
+        self._buffer += text
+        released = []
+        search = 0
+        while (end := self._buffer.find("\n\n", search)) != -1:
+            paragraph = self._buffer[:end]
+            if paragraph.count("```") % 2:
+                # Inside a code block: wait for its end
+                search = end + 2
+                continue
+            released.append(self._keep(paragraph, "\n\n"))
+            self._buffer = self._buffer[end + 2 :]
+            search = 0
+        return "".join(released)
+
+    def flush(self) -> str:
+        """
+        Ends the answer of the current chunk.
+
+        Returns:
+            The rest of its text
+        """
+        paragraph, self._buffer = self._buffer, ""
+        return self._keep(paragraph, "\n\n") if paragraph.strip() else ""
+
+    def _keep(self, paragraph: str, separator: str) -> str:
+        key = self._key(paragraph)
+        if len(key) >= self.min_chars:
+            if key in self._seen:
+                return ""
+            self._seen.add(key)
+        if "```" in paragraph:
+            return paragraph + separator
+        kept = []
+        for line in paragraph.split("\n"):
+            if _LIST_ITEM.match(line):
+                key = self._key(line)
+                if len(key) >= self.min_chars:
+                    if key in self._seen:
+                        continue
+                    self._seen.add(key)
+            kept.append(line)
+        return "\n".join(kept) + separator if kept else ""
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return _NON_WORD.sub(" ", text.lower()).strip()
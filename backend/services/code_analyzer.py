@@ -0,0 +1,857 @@
+"""
+Static analysis pre-pass.
+Extracts the structure, complexity and obvious smells of a submission before
+generation: Python with ``ast``, the other supported languages with a light
+tokenizer. The facts are added to the prompt so that the model does not spend
+tokens rediscovering them, and code that does not even parse is answered
+without the model.
+"""
+
+import ast
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from backend.core.metrics import REGISTRY
+from backend.services.language_detector import detect_language
+
+ANALYSIS_CACHE = REGISTRY.counter(
+    "sensai_analyzer_cache_requests_total",
+    "Code analysis cache lookups, by result",
+    ["result"],
+)
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    "sensai_analyzer_seconds",
+    "Time spent analyzing a submission (cache misses only)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+# Thresholds of the function smells
+MAX_FUNCTION_LINES = 50
+MAX_PARAMETERS = 5
+MAX_NESTING = 4
+MAX_COMPLEXITY = 10
+
+# Name of the functions without one (callbacks, lambdas)
+ANONYMOUS = "<anonymous>"
+
+# Size limits of the facts given to the model
+MAX_SMELLS = 10
+MAX_NAMES = 8
+MAX_LINES_PER_SMELL = 5
+
+# Quick answers only for submissions with at least this many lines, so that a
+# one-line question sent as code is never mistaken for broken code
+QUICK_ANSWER_MIN_LINES = 3
+
+_BUILTINS = frozenset(
+    {
+        "list",
+        "dict",
+        "set",
+        "str",
+        "int",
+        "float",
+        "sum",
+        "min",
+        "max",
+        "len",
+        "id",
+        "input",
+        "type",
+        "range",
+        "map",
+        "filter",
+        "open",
+        "format",
+        "object",
+        "hash",
+        "next",
+        "iter",
+    }
+)
+
+
+@dataclass
+class FunctionInfo:
+    """
+    A function or method of the submission.
+
+    Attributes:
+        name: Name (``Class.method`` for Python methods)
+        line: Line of the definition
+        length: Number of lines
+        parameters: Number of parameters (``self``/``cls`` excluded)
+        complexity: Cyclomatic complexity
+        nesting: Deepest nesting of blocks inside the function
+    """
+
+    name: str
+    line: int
+    length: int = 1
+    parameters: int = 0
+    complexity: int = 1
+    nesting: int = 0
+
+
+@dataclass
+class SyntaxIssue:
+    """
+    Why a submission does not parse.
+
+    Attributes:
+        line: Line of the error (1-based)
+        message: Error message
+        text: Source line of the error
+        column: Column of the error (1-based, 0 if unknown)
+    """
+
+    line: int
+    message: str
+    text: str = ""
+    column: int = 0
+
+
+@dataclass
+class CodeAnalysis:
+    """
+    Facts extracted from a submission.
+
+    Attributes:
+        language: Language the code was analyzed as
+        is_code: Whether the submission looks like code (prose is not analyzed)
+        lines: Number of non-blank lines
+        functions: Functions and methods, in order of definition
+        classes: Classes (and structs, traits...), in order of definition
+        imports: Imported modules
+        smells: Smell descriptions, with the lines where they occur
+        syntax_error: Why the code does not parse, if it does not
+    """
+
+    language: str
+    is_code: bool = True
+    lines: int = 0
+    functions: list[FunctionInfo] = field(default_factory=list)
+    classes: list[str] = field(default_factory=list)
+    imports: list[str] = field(default_factory=list)
+    smells: dict[str, list[int]] = field(default_factory=dict)
+    syntax_error: SyntaxIssue | None = None
+
+    @property
+    def complexity(self) -> int:
+        """Highest cyclomatic complexity of the functions (1 without functions)."""
+        return max((function.complexity for function in self.functions), default=1)
+
+    def smell(self, message: str, line: int) -> None:
+        """Records an occurrence of a smell."""
+        self.smells.setdefault(message, []).append(line)
+
+    def facts(self) -> str:
+        """
+        Formats the analysis as a compact list of facts for the prompt.
+
+        Returns:
+            The facts ("" for prose)
+        """
+        if not self.is_code:
+            return ""
+        facts = []
+        error = self.syntax_error
+        if error is not None:
+            # Exact for Python; the brace check of the other languages is a heuristic
+            problem = "Braces look unbalanced"
+            if self.language == "python":
+                problem = "Does not parse"
+            facts.append(f"- {problem}: line {error.line}: {error.message}")
+
+        structure = [f"{self.lines} lines"]
+        named = [f for f in self.functions if f.name != ANONYMOUS]
+        if named:
+            structure.append(
+                "functions: "
+                + _names([f"{f.name} (complexity {f.complexity})" for f in named])
+            )
+        if self.classes:
+            structure.append(f"classes: {_names(self.classes)}")
+        if self.imports:
+            structure.append(f"imports: {_names(self.imports)}")
+        facts.append(f"- {'; '.join(structure)}")
+
+        for message, lines in list(self.smells.items())[:MAX_SMELLS]:
+            shown = ", ".join(str(line) for line in lines[:MAX_LINES_PER_SMELL])
+            more = "..." if len(lines) > MAX_LINES_PER_SMELL else ""
+            facts.append(
+                f"- {message} (line{'s' if len(lines) > 1 else ''} {shown}{more})"
+            )
+        return "\n".join(facts)
+
+    def quick_answer(self) -> str | None:
+        """
+        Answers the submission without the model, when the analysis is enough.
+
+        Only code that does not parse is answered this way (Python, where the
+        parser is exact): the student is pointed at the error first.
+
+        Returns:
+            The answer, or None if the model should answer
+        """
+        error = self.syntax_error
+        if (
+            error is None
+            or self.language != "python"
+            or self.lines < QUICK_ANSWER_MIN_LINES
+        ):
+            return None
+        excerpt = ""
+        if error.text:
+            caret = " " * max(error.column - 1, 0) + "^"
+            excerpt = f"\n\n```python\n{error.text}\n{caret}\n```"
+        return (
+            "Before we talk about the design of this code, Python cannot run it yet: "
+            f'it stops at line {error.line} with "{error.message}".{excerpt}\n\n'
+            "Take another look at that line and the one just above it. What is Python "
+            "expecting there? Check the brackets, quotes, colons and indentation. "
+            "Once it runs, send it again and we will go through the rest together!"
+        )
+
+
+def _names(names: list[str]) -> str:
+    shown = ", ".join(names[:MAX_NAMES])
+    return shown + (
+        f" and {len(names) - MAX_NAMES} more" if len(names) > MAX_NAMES else ""
+    )
+
+
+def _function_smells(function: FunctionInfo) -> Iterator[str]:
+    if function.length > MAX_FUNCTION_LINES:
+        yield f"`{function.name}` is long ({function.length} lines)"
+    if function.complexity > MAX_COMPLEXITY:
+        yield f"`{function.name}` has a cyclomatic complexity of {function.complexity}"
+    if function.parameters > MAX_PARAMETERS:
+        yield f"`{function.name}` takes {function.parameters} parameters"
+    if function.nesting > MAX_NESTING:
+        yield f"`{function.name}` nests blocks {function.nesting} levels deep"
+
+
+# --- Python -----------------------------------------------------------------
+
+_PY_BRANCHES = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.IfExp,
+    ast.ExceptHandler,
+    ast.Assert,
+    ast.match_case,
+)
+_PY_BLOCKS = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.With,
+    ast.AsyncWith,
+    ast.Try,
+    ast.Match,
+)
+_PY_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _python_function(
+    node: ast.FunctionDef | ast.AsyncFunctionDef, name: str
+) -> FunctionInfo:
+    arguments = node.args
+    parameters = [
+        *arguments.posonlyargs,
+        *arguments.args,
+        *arguments.kwonlyargs,
+        *filter(None, [arguments.vararg, arguments.kwarg]),
+    ]
+    return FunctionInfo(
+        name=name,
+        line=node.lineno,
+        length=(node.end_lineno or node.lineno) - node.lineno + 1,
+        parameters=len([p for p in parameters if p.arg not in ("self", "cls")]),
+    )
+
+
+class _PythonVisitor:
+    """Collects the structure, complexity and smells of a module in one pass."""
+
+    def __init__(self, analysis: CodeAnalysis) -> None:
+        self.analysis = analysis
+        self.imported: dict[str, int] = {}
+        self.used: set[str] = set()
+
+    def visit(
+        self, node: ast.AST, function: FunctionInfo | None, depth: int, scope: str
+    ) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr_context):
+                continue
+            inner, inner_depth, inner_scope = function, depth, scope
+            if isinstance(child, _PY_FUNCTIONS):
+                inner = _python_function(child, scope + child.name)
+                self.analysis.functions.append(inner)
+                inner_depth, inner_scope = 0, f"{scope}{child.name}."
+            elif isinstance(child, ast.ClassDef):
+                self.analysis.classes.append(scope + child.name)
+                inner, inner_depth, inner_scope = None, 0, f"{scope}{child.name}."
+            elif function is not None:
+                if isinstance(child, _PY_BRANCHES):
+                    function.complexity += 1
+                elif isinstance(child, ast.BoolOp):
+                    function.complexity += len(child.values) - 1
+                elif isinstance(child, ast.comprehension):
+                    function.complexity += 1 + len(child.ifs)
+                # An elif is not nested in the if before it
+                elif_ = isinstance(node, ast.If) and node.orelse == [child]
+                if isinstance(child, _PY_BLOCKS) and not elif_:
+                    inner_depth = depth + 1
+                    function.nesting = max(function.nesting, inner_depth)
+            self.smells(child)
+            self.visit(child, inner, inner_depth, inner_scope)
+
+    def smells(self, node: ast.AST) -> None:
+        analysis = self.analysis
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Store) and node.id in _BUILTINS:
+                analysis.smell(f"`{node.id}` shadows a builtin", node.lineno)
+            self.used.add(node.id)
+        elif isinstance(node, ast.ExceptHandler):
+            if node.type is None:
+                analysis.smell(
+                    "bare `except:` also catches KeyboardInterrupt", node.lineno
+                )
+            if all(isinstance(statement, ast.Pass) for statement in node.body):
+                analysis.smell(
+                    "exception silently ignored (`except ...: pass`)", node.lineno
+                )
+        elif isinstance(node, _PY_FUNCTIONS):
+            defaults = [*node.args.defaults, *filter(None, node.args.kw_defaults)]
+            if any(isinstance(d, (ast.List, ast.Dict, ast.Set)) for d in defaults):
+                analysis.smell("mutable default argument", node.lineno)
+        elif isinstance(node, ast.arg):
+            if node.arg in _BUILTINS:
+                analysis.smell(f"`{node.arg}` shadows a builtin", node.lineno)
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in ("eval", "exec"):
+                analysis.smell(f"`{node.func.id}()` runs arbitrary code", node.lineno)
+        elif isinstance(node, ast.Compare):
+            if any(isinstance(op, (ast.Eq, ast.NotEq)) for op in node.ops) and any(
+                isinstance(c, ast.Constant) and c.value is None
+                for c in node.comparators
+            ):
+                analysis.smell(
+                    "comparison to None with `==` (use `is None`)", node.lineno
+                )
+        elif isinstance(node, ast.Global):
+            analysis.smell("`global` statement", node.lineno)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                analysis.imports.append(alias.name)
+                name = (alias.asname or alias.name).split(".")[0]
+                self.imported.setdefault(name, node.lineno)
+        elif isinstance(node, ast.ImportFrom):
+            if node.module:
+                analysis.imports.append(node.module)
+            for alias in node.names:
+                if alias.name == "*":
+                    analysis.smell("wildcard import", node.lineno)
+                else:
+                    self.imported.setdefault(alias.asname or alias.name, node.lineno)
+
+    def finish(self) -> None:
+        self.analysis.imports = list(dict.fromkeys(self.analysis.imports))
+        for name, line in self.imported.items():
+            if name not in self.used:
+                self.analysis.smell(f"`{name}` imported but unused", line)
+
+
+def _analyze_python(code: str, analysis: CodeAnalysis) -> bool:
+    """Fills the analysis in, False if the code is too deeply nested to analyze."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        if e.text and not detect_language(e.text).is_code:
+            # Prose around the code (a question pasted with it): nothing reliable to say
+            analysis.is_code = False
+            return True
+        analysis.syntax_error = SyntaxIssue(
+            line=e.lineno or 1,
+            message=e.msg,
+            text=(e.text or "").rstrip("\n"),
+            column=e.offset or 0,
+        )
+        return True
+    except (RecursionError, MemoryError, ValueError):
+        # Expressions nested thousands deep ("x = ----...1") exhaust the parser
+        return False
+    visitor = _PythonVisitor(analysis)
+    try:
+        visitor.visit(tree, None, 0, "")
+    except RecursionError:
+        return False
+    visitor.finish()
+    return True
+
+
+# --- Brace languages ---------------------------------------------------------
+
+# Strings and comments first, so that braces and keywords inside them are skipped.
+# Single quotes delimit strings in JavaScript/TypeScript and one character (or a
+# Rust lifetime, which has no closing quote) elsewhere.
+_TOKEN_PATTERN = (
+    r"(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)"
+    r"|(?P<string>\"(?:\\.|[^\"\\\n])*\"|`(?:\\.|[^`\\])*`|{quote})"
+    r"|(?P<name>[A-Za-z_$][A-Za-z0-9_$]*)"
+    r"|(?P<number>\d[\w.]*)"
+    r"|(?P<op>\?\?|\?\.|&&|\|\||===|!==|==|!=|:=|=>|->|::|\S)"
+)
+_SCRIPT_TOKENS = re.compile(_TOKEN_PATTERN.format(quote=r"'(?:\\.|[^'\\\n])*'"))
+_COMPILED_TOKENS = re.compile(
+    _TOKEN_PATTERN.format(quote=r"'(?:\\[^'\n]{1,8}|[^'\\\n])'")
+)
+
+_SCRIPT_LANGUAGES = frozenset({"javascript", "typescript"})
+_CONTROL = frozenset(
+    {
+        "if",
+        "else",
+        "for",
+        "while",
+        "do",
+        "switch",
+        "catch",
+        "try",
+        "finally",
+        "return",
+        "new",
+        "sizeof",
+        "synchronized",
+        "with",
+        "match",
+        "loop",
+        "unsafe",
+        "select",
+        "defer",
+        "go",
+    }
+)
+_TYPE_KEYWORDS = frozenset(
+    {"class", "struct", "interface", "enum", "trait", "impl", "union"}
+)
+_IMPORT_KEYWORDS = frozenset({"import", "include", "use"})
+# Tokens after which a Go statement continues on the next line
+_CONTINUATIONS = frozenset(
+    {"(", "[", ",", ".", "=", ":=", "+", "-", "*", "/", "&&", "||"}
+)
+_BRANCH_NAMES = frozenset({"if", "for", "while", "case", "catch"})
+_BRANCH_OPS = frozenset({"&&", "||", "?"})
+_UNSAFE_C_CALLS = frozenset({"gets", "strcpy", "strcat", "sprintf", "scanf"})
+
+
+@dataclass(slots=True)
+class Token:
+    """
+    A token of brace-language code (comments are dropped).
+
+    Attributes:
+        kind: "string", "name", "number" or "op"
+        text: Token text
+        line: Line of the token (1-based)
+    """
+
+    kind: str
+    text: str
+    line: int
+
+
+@dataclass
+class _Block:
+    function: FunctionInfo | None = None
+    catch: bool = False
+    opened: int = 0
+
+
+def tokenize(code: str, language: str) -> list[Token]:
+    """
+    Splits brace-language code into tokens, skipping comments.
+
+    Args:
+        code: Submitted code
+        language: Language of the code (quotes differ between languages)
+
+    Returns:
+        The tokens, in order
+    """
+    pattern = _SCRIPT_TOKENS if language in _SCRIPT_LANGUAGES else _COMPILED_TOKENS
+    tokens = []
+    line, position = 1, 0
+    for match in pattern.finditer(code):
+        start = match.start()
+        line += code.count("\n", position, start)
+        position = start
+        if match.lastgroup != "comment":
+            tokens.append(Token(match.lastgroup or "op", match.group(), line))
+    return tokens
+
+
+def _matching_paren(header: list[Token], start: int) -> int:
+    depth = 0
+    for i in range(start, len(header)):
+        if header[i].text == "(":
+            depth += 1
+        elif header[i].text == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(header)
+
+
+def _count_parameters(tokens: list[Token]) -> int:
+    """Counts the comma-separated items of a parameter list (parentheses excluded)."""
+    if not tokens:
+        return 0
+    depth = commas = 0
+    for token in tokens:
+        if token.text in ("(", "<", "[", "{"):
+            depth += 1
+        elif token.text in (")", ">", "]", "}"):
+            depth -= 1
+        elif token.text == "," and depth == 0:
+            commas += 1
+    return commas + 1
+
+
+def _function(header: list[Token], name: int, paren: int) -> FunctionInfo:
+    close = _matching_paren(header, paren)
+    return FunctionInfo(
+        name=header[name].text if header[name].kind == "name" else ANONYMOUS,
+        line=header[name].line,
+        parameters=_count_parameters(header[paren + 1 : close]),
+    )
+
+
+def _function_header(header: list[Token], language: str) -> FunctionInfo | None:
+    """Recognizes the header of a function body (the tokens before its ``{``)."""
+    if not header or header[0].text in _CONTROL:
+        return None
+    texts = [token.text for token in header]
+    for keyword in ("fn", "func", "function"):
+        if keyword not in texts:
+            continue
+        i = texts.index(keyword) + 1
+        if keyword == "func" and i < len(texts) and texts[i] == "(":
+            i = _matching_paren(header, i) + 1  # Go method receiver
+        if "(" not in texts[i:]:
+            return None
+        paren = texts.index("(", i)
+        return _function(header, i if i < paren else i - 1, paren)
+    if language in _SCRIPT_LANGUAGES and "=>" in texts:
+        # const name = (a, b) => {
+        arrow = texts.index("=>")
+        if arrow and texts[arrow - 1] == ")":
+            paren = max(
+                i
+                for i in range(arrow)
+                if texts[i] == "(" and (_matching_paren(header, i) == arrow - 1)
+            )
+        else:
+            paren = arrow - 1
+        if "=" in texts[:paren]:
+            return _function(header, texts.index("=") - 1, paren)
+        return _function(header, paren, paren)
+    if ")" not in texts or texts[-1] in (";", "=", ","):
+        return None
+    # Methods and C-family functions: name(params) [const|throws ...] {
+    for i, token in enumerate(header[:-1]):
+        if token.kind == "name" and texts[i + 1] == "(":
+            if token.text in _CONTROL or "=" in texts[:i]:
+                return None
+            if i and texts[i - 1] in ("new", "."):
+                return None
+            return _function(header, i, i + 1)
+    return None
+
+
+def _type_header(header: list[Token]) -> str | None:
+    """Recognizes the header of a class, struct, trait... body."""
+    texts = [token.text for token in header]
+    if "(" in texts:
+        return None
+    for i, token in enumerate(header):
+        if token.kind != "name" or token.text not in _TYPE_KEYWORDS:
+            continue
+        following = header[i + 1 :]
+        if following and following[0].text == "<":  # impl<T> Name<T>
+            following = (
+                following[texts[i + 1 :].index(">") + 1 :] if ">" in texts[i:] else []
+            )
+        if following and following[0].kind == "name":
+            return following[0].text
+        if i >= 2 and texts[i - 2] == "type":  # Go: type Name struct
+            return texts[i - 1]
+        return None
+    return None
+
+
+def _import_statement(tokens: list[Token], start: int) -> tuple[list[str], int]:
+    """
+    Reads the import statement whose keyword is ``tokens[start]``.
+
+    Returns:
+        The imported modules, and the index of the token after the statement
+    """
+    line = tokens[start].line
+    depth = 0
+    end = start + 1
+    while end < len(tokens):
+        token = tokens[end]
+        if depth == 0 and (token.line != line or token.text == ";"):
+            break
+        depth += {"(": 1, ")": -1}.get(token.text, 0)  # Go: import ( "fmt" "os" )
+        end += 1
+    statement = tokens[start + 1 : end]
+    strings = [t.text.strip("'\"`") for t in statement if t.kind == "string"]
+    if strings:
+        return strings, end
+    module = "".join(t.text for t in statement if t.text not in ("<", ">", "{", "}"))
+    return [module] if module else [], end
+
+
+def _brace_smells(tokens: list[Token], language: str, analysis: CodeAnalysis) -> None:
+    for i, token in enumerate(tokens):
+        after = tokens[i + 1].text if i + 1 < len(tokens) else ""
+        before = tokens[i - 1].text if i else ""
+        name = token.kind == "name"
+        if language in _SCRIPT_LANGUAGES:
+            if name and token.text == "var":
+                analysis.smell("`var` declarations (prefer `let`/`const`)", token.line)
+            elif token.text in ("==", "!="):
+                analysis.smell(f"loose equality `{token.text}`", token.line)
+            elif name and token.text == "eval" and after == "(":
+                analysis.smell("`eval()` runs arbitrary code", token.line)
+            elif (
+                language == "typescript"
+                and name
+                and token.text == "any"
+                and before == ":"
+            ):
+                analysis.smell("`any` type", token.line)
+        elif language == "cpp":
+            if name and token.text in _UNSAFE_C_CALLS and after == "(":
+                analysis.smell(f"`{token.text}()` can overflow its buffer", token.line)
+            elif name and token.text == "using" and after == "namespace":
+                analysis.smell("`using namespace` directive", token.line)
+            elif name and token.text == "delete":
+                analysis.smell("manual memory management (`new`/`delete`)", token.line)
+        elif language == "java":
+            if name and token.text == "catch" and i + 2 < len(tokens):
+                caught = tokens[i + 2].text
+                if caught in ("Exception", "Throwable"):
+                    analysis.smell(f"catches every `{caught}`", token.line)
+        elif language == "go":
+            if (
+                name
+                and token.text == "_"
+                and (after in (":=", "=", ",") or before == ",")
+            ):
+                analysis.smell(
+                    "value (possibly an error) discarded with `_`", token.line
+                )
+            elif name and token.text == "panic" and after == "(":
+                analysis.smell("`panic()` instead of returning an error", token.line)
+        elif language == "rust":
+            if (
+                name
+                and token.text in ("unwrap", "expect")
+                and before == "."
+                and after == "("
+            ):
+                analysis.smell(f"`.{token.text}()` panics on errors", token.line)
+            elif name and token.text == "unsafe":
+                analysis.smell("`unsafe` code", token.line)
+
+
+def _analyze_braces(code: str, language: str, analysis: CodeAnalysis) -> None:
+    tokens = tokenize(code, language)
+    blocks: list[_Block] = []
+    functions: list[FunctionInfo] = []  # Functions being read, innermost last
+    header: list[Token] = []
+    skip_to = 0
+    for index, token in enumerate(tokens):
+        text = token.text
+        if index < skip_to:
+            continue
+        if (
+            language == "go"
+            and header
+            and token.line != header[-1].line
+            and header[-1].text not in _CONTINUATIONS
+        ):
+            header = []  # Go statements end at the end of the line
+        if token.kind == "name" and text in _IMPORT_KEYWORDS and not header:
+            modules, skip_to = _import_statement(tokens, index)
+            analysis.imports.extend(modules)
+            continue
+        if text == "#" and not header:
+            # Preprocessor line: #include <vector>, #define...
+            modules, skip_to = _import_statement(tokens, index)
+            if index + 1 < len(tokens) and tokens[index + 1].text == "include":
+                analysis.imports.extend(
+                    module.removeprefix("include") for module in modules
+                )
+            continue
+        if token.kind == "name" and text == "require" and index + 2 < len(tokens):
+            if tokens[index + 2].kind == "string":
+                analysis.imports.append(tokens[index + 2].text.strip("'\"`"))
+
+        function = functions[-1] if functions else None
+        if function is not None and (
+            (token.kind == "name" and text in _BRANCH_NAMES)
+            or (text in _BRANCH_OPS and not (text == "?" and language == "rust"))
+            or (text == "=>" and language == "rust")  # match arms
+        ):
+            function.complexity += 1
+
+        if text == "{":
+            block = _Block(
+                catch=bool(header) and header[0].text == "catch", opened=token.line
+            )
+            type_name = _type_header(header)
+            if type_name is not None:
+                analysis.classes.append(type_name)
+            else:
+                block.function = _function_header(header, language)
+                if block.function is not None:
+                    analysis.functions.append(block.function)
+                    functions.append(block.function)
+            blocks.append(block)
+            depth = 0
+            for outer in reversed(blocks):
+                if outer.function is not None:
+                    outer.function.nesting = max(outer.function.nesting, depth)
+                    break
+                depth += 1
+            header = []
+        elif text == "}":
+            header = []
+            if not blocks:
+                if analysis.syntax_error is None:
+                    analysis.syntax_error = SyntaxIssue(
+                        token.line, "unmatched closing brace"
+                    )
+                continue
+            block = blocks.pop()
+            if block.catch and tokens[index - 1].text == "{":
+                analysis.smell("empty catch block", block.opened)
+            if block.function is not None:
+                block.function.length = token.line - block.function.line + 1
+                functions.pop()
+        elif text == ";":
+            header = []
+        else:
+            header.append(token)
+    if blocks and analysis.syntax_error is None:
+        analysis.syntax_error = SyntaxIssue(blocks[-1].opened, "unclosed brace")
+    analysis.imports = list(dict.fromkeys(analysis.imports))
+    analysis.classes = list(dict.fromkeys(analysis.classes))  # Rust: struct and impl
+    _brace_smells(tokens, language, analysis)
+
+
+# --- Analyzer -----------------------------------------------------------------
+
+BRACE_LANGUAGES = frozenset({"javascript", "typescript", "java", "cpp", "go", "rust"})
+SUPPORTED_LANGUAGES = frozenset({"python", *BRACE_LANGUAGES})
+
+
+def analyze_code(code: str, language: str) -> CodeAnalysis | None:
+    """
+    Analyzes a submission (uncached).
+
+    Args:
+        code: Submitted code
+        language: Language of the code
+
+    Returns:
+        The analysis, or None if the language is not supported or the code
+        is beyond the parser
+    """
+    if language not in SUPPORTED_LANGUAGES:
+        return None
+    analysis = CodeAnalysis(
+        language=language,
+        is_code=detect_language(code).is_code,
+        lines=sum(1 for line in code.splitlines() if line.strip()),
+    )
+    if not analysis.is_code:
+        return analysis
+    if language == "python":
+        if not _analyze_python(code, analysis):
+            return None
+    else:
+        _analyze_braces(code, language, analysis)
+    # Function smells first: they are the most useful to the model
+    smells = analysis.smells
+    analysis.smells = {}
+    for function in analysis.functions:
+        for message in _function_smells(function):
+            analysis.smell(message, function.line)
+    analysis.smells.update(smells)
+    return analysis
+
+
+class CodeAnalyzer:
+    """
+    Static analyzer with a cache of results by content hash.
+
+    Students resubmit the same exercise over and over (and the same code is
+    analyzed again on every follow-up), so results are kept in a bounded LRU.
+    Analysis runs on the event loop: longer submissions are not analyzed.
+
+    Args:
+        capacity: Number of analyses kept
+        max_chars: Longest submission analyzed
+    """
+
+    def __init__(self, capacity: int = 4096, max_chars: int = 20_000) -> None:
+        self.capacity = capacity
+        self.max_chars = max_chars
+        self._cache: OrderedDict[str, CodeAnalysis | None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def analyze(self, code: str, language: str) -> CodeAnalysis | None:
+        """
+        Analyzes a submission, or returns the cached analysis of the same code.
+
+        Args:
+            code: Submitted code
+            language: Language of the code
+
+        Returns:
+            The analysis, or None if the language is not supported or the
+            submission is too long
+        """
+        if language not in SUPPORTED_LANGUAGES or len(code) > self.max_chars:
+            return None
+        key = hashlib.sha256(f"{language}\x00{code}".encode()).hexdigest()
+        if key in self._cache:
+            ANALYSIS_CACHE.inc(result="hit")
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        ANALYSIS_CACHE.inc(result="miss")
+        started = time.perf_counter()
+        analysis = analyze_code(code, language)
+        ANALYSIS_SECONDS.observe(time.perf_counter() - started)
+        self._cache[key] = analysis
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return analysis
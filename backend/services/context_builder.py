@@ -0,0 +1,234 @@
+"""
+Token-budgeted prompt assembly.
+Fits the system prompt, the language and specialized guidance, the most recent
+conversation turns and the new request into the model's context window.
+"""
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from backend.core.exceptions import ContextTooLargeError, InvalidRequestError
+from backend.prompts import (
+    PromptEntry,
+    PromptRegistry,
+    UnknownPromptError,
+    create_code_review_prompt,
+    create_question_prompt,
+    create_resubmission_prompt,
+)
+from backend.schemas.review import ReviewRequest
+from backend.services.conversation_memory import ConversationSnapshot
+from backend.services.llm_service import Message
+from backend.services.resubmission import Resubmission
+from backend.services.tokenizer import estimate_tokens
+
+# Chat template markers ([INST], [/INST], </s>...) added around each message
+MESSAGE_OVERHEAD_TOKENS = 8
+
+CONVERSATION_SUMMARY = (
+    "\n\nSummary of the earlier part of this conversation:\n"
+    "<conversation_summary>\n{summary}\n</conversation_summary>"
+)
+
+
+@dataclass
+class BuiltContext:
+    """
+    Result of prompt assembly.
+
+    Attributes:
+        messages: Chat messages to send to the engine
+        prompt_tokens: Token count of the messages (template overhead included)
+        max_tokens: Completion budget left in the context window
+        prefix_fingerprint: Fingerprint of the static system prefix
+        dropped_turns: Number of history turns that did not fit
+    """
+
+    messages: list[Message]
+    prompt_tokens: int
+    max_tokens: int
+    prefix_fingerprint: str
+    dropped_turns: int = 0
+
+
+class ContextBuilder:
+    """
+    Builds prompts that always fit the model's context window.
+
+    The system message (SYSTEM_PROMPT + language, specialized and level prompts)
+    is a precompiled static prefix shared by every request of the same kind;
+    it and the new request are mandatory. History turns fill the remaining budget,
+    newest first, so the oldest turns are the first to be dropped. With a
+    conversation memory, the summary of the older turns follows the static
+    prefix (which stays shared) and only the latest turns are sent verbatim.
+
+    Args:
+        max_model_len: Context window of the model, in tokens
+        max_tokens: Completion tokens to reserve for the answer
+        min_completion_tokens: Smallest answer budget worth generating
+        count_tokens: Token counter (the engine tokenizer when available)
+        registry: Precompiled prefixes (built with ``count_tokens`` if omitted)
+    """
+
+    def __init__(
+        self,
+        max_model_len: int = 8192,
+        max_tokens: int = 2048,
+        min_completion_tokens: int = 256,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        registry: PromptRegistry | None = None,
+    ) -> None:
+        self.max_model_len = max_model_len
+        self.max_tokens = max_tokens
+        self.min_completion_tokens = min_completion_tokens
+        self.count_tokens = count_tokens
+        self.registry = registry or PromptRegistry(count_tokens)
+
+    def _message_tokens(self, content: str) -> int:
+        return self.count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def resolve_prefix(self, request: ReviewRequest) -> PromptEntry:
+        """
+        Looks up the precompiled static prefix of a request.
+
+        Args:
+            request: The validated review request
+
+        Returns:
+            The registry entry for the request's language, mode and level
+
+        Raises:
+            InvalidRequestError: If the language, mode or level is not supported
+        """
+        try:
+            return self.registry.get(request.language, request.mode, request.level)
+        except UnknownPromptError as e:
+            raise InvalidRequestError(
+                str(e), details={"field": e.kind, "supported": e.supported}
+            ) from e
+
+    def build(
+        self,
+        request: ReviewRequest,
+        retrieval_context: str = "",
+        memory: ConversationSnapshot | None = None,
+        analysis: str = "",
+        is_code: bool = True,
+        resubmission: Resubmission | None = None,
+    ) -> BuiltContext:
+        """
+        Builds the messages for a review request.
+
+        Args:
+            request: The validated review request
+            retrieval_context: Optional reference material added after the code
+            memory: Memory of the conversation, used instead of the request's
+                history when available
+            analysis: Optional static analysis facts added after the code
+            is_code: False if the submission is a question in prose, not code
+            resubmission: Changes since the code last reviewed in the conversation;
+                the prompt then holds the changed hunks and the previous review
+                instead of the code and the verbatim turns
+
+        Returns:
+            The assembled context
+
+        Raises:
+            ContextTooLargeError: If the submission alone leaves no room for an answer
+        """
+        prefix = self.resolve_prefix(request)
+        system_message = {"role": "system", "content": prefix.text}
+        summary_tokens = 0
+        if memory is not None and memory.summary:
+            summary = CONVERSATION_SUMMARY.format(summary=memory.summary)
+            system_message["content"] += summary
+            summary_tokens = self.count_tokens(summary)
+        if resubmission is not None:
+            content = create_resubmission_prompt(
+                resubmission.previous_review,
+                resubmission.diff,
+                request.language,
+                request.question or "",
+            )
+        elif is_code:
+            content = create_code_review_prompt(
+                code=request.code,
+                language=request.language,
+                question=request.question or "",
+                context=retrieval_context,
+                analysis=analysis,
+            )
+        else:
+            question = "\n\n".join(filter(None, [request.code, request.question]))
+            content = create_question_prompt(
+                question, request.language, retrieval_context
+            )
+        user_message = {"role": "user", "content": content}
+
+        budget = self.max_model_len - self.min_completion_tokens
+        used = (
+            prefix.token_count
+            + summary_tokens
+            + MESSAGE_OVERHEAD_TOKENS
+            + self._message_tokens(user_message["content"])
+        )
+        if used > budget:
+            raise ContextTooLargeError(
+                "The submission is too large for the model's context window.",
+                details={"prompt_tokens": used, "max_prompt_tokens": budget},
+            )
+
+        # Leave the full answer budget if possible, shrink history first
+        history_budget = self.max_model_len - self.max_tokens - used
+        if resubmission is not None:
+            # The verbatim turns hold the previous versions of the code
+            history: list[Message] = []
+        elif memory is not None:
+            history = _merge_consecutive(memory.turns)
+        else:
+            history = _merge_consecutive(
+                [
+                    {"role": turn.role, "content": turn.content}
+                    for turn in request.history
+                ]
+            )
+        turns = self._fit_history(history, history_budget)
+        used += sum(self._message_tokens(turn["content"]) for turn in turns)
+
+        return BuiltContext(
+            messages=[system_message, *turns, user_message],
+            prompt_tokens=used,
+            max_tokens=min(self.max_tokens, self.max_model_len - used),
+            prefix_fingerprint=prefix.fingerprint,
+            dropped_turns=len(history) - len(turns),
+        )
+
+    def _fit_history(self, history: list[Message], budget: int) -> list[Message]:
+        """Keeps the most recent turns that fit the budget, in chronological order."""
+        kept: list[Message] = []
+        for turn in reversed(history):
+            cost = self._message_tokens(turn["content"])
+            if cost > budget:
+                break
+            budget -= cost
+            kept.append(turn)
+        kept.reverse()
+
+        # Chat templates expect user/assistant alternation starting with the user,
+        # and the new request is a user turn, so history must end with the assistant
+        while kept and kept[0]["role"] != "user":
+            kept.pop(0)
+        while kept and kept[-1]["role"] != "assistant":
+            kept.pop()
+        return kept
+
+
+def _merge_consecutive(history: Sequence[Message]) -> list[Message]:
+    """Merges consecutive turns of the same role so that roles alternate."""
+    merged: list[Message] = []
+    for turn in history:
+        if merged and merged[-1]["role"] == turn["role"]:
+            merged[-1]["content"] += f"\n\n{turn['content']}"
+        else:
+            merged.append({"role": turn["role"], "content": turn["content"]})
+    return merged
@@ -0,0 +1,252 @@
+"""
+Conversation memory.
+The latest turns of a conversation are kept verbatim; older turns are folded
+into a rolling summary by the model, in the background after each answer, so
+that follow-up prompts stay bounded however long the conversation runs.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from backend.core.metrics import REGISTRY
+from backend.prompts import create_summary_prompt
+from backend.services.cancellation import close_iterator
+from backend.services.llm_service import GenerationRequest, LLMEngine, Message
+
+logger = logging.getLogger(__name__)
+
+SUMMARIES = REGISTRY.counter(
+    "sensai_memory_summaries_total",
+    "Rolling summary updates of conversations, by outcome",
+    ["outcome"],
+)
+SUMMARY_SECONDS = REGISTRY.histogram(
+    "sensai_memory_summary_seconds",
+    "Time spent folding older turns into a conversation summary",
+)
+CONVERSATIONS = REGISTRY.gauge(
+    "sensai_memory_conversations",
+    "Conversations held in memory",
+)
+
+SUMMARY_TEMPERATURE = 0.2
+
+
+@dataclass
+class Submission:
+    """
+    The latest code reviewed in a conversation.
+
+    Attributes:
+        code: Submitted code
+        language: Language of the code
+        review: Answer of the sensei to it
+    """
+
+    code: str
+    language: str
+    review: str
+
+
+@dataclass
+class ConversationSnapshot:
+    """
+    Memory of a conversation, as used to build a prompt.
+
+    Attributes:
+        summary: Summary of the turns older than ``turns`` ("" if none)
+        turns: Latest turns, verbatim, oldest first (user/assistant alternating)
+        submission: Latest code reviewed in the conversation, if any
+    """
+
+    summary: str
+    turns: list[Message]
+    submission: Submission | None = None
+
+
+@dataclass(eq=False)
+class _Conversation:
+    summary: str = ""
+    turns: list[Message] = field(default_factory=list)
+    task: "asyncio.Task[None] | None" = None
+    submission: Submission | None = None
+    # Oldest turns being folded by the running summary
+    folding: int = 0
+
+
+class ConversationMemory:
+    """
+    Rolling memory of the conversations, by conversation id.
+
+    Every answered turn is appended verbatim; once a conversation holds more
+    than ``recent_turns`` messages, a background task asks the model to fold
+    the oldest ones into the conversation's summary. Conversations are kept in
+    a bounded LRU; a forgotten one (or one started before a restart) falls back
+    to the history sent by the client.
+
+    Args:
+        engine: Engine generating the summaries
+        recent_turns: Messages kept verbatim (user and assistant, so even)
+        summary_max_tokens: Length limit of a summary
+        max_turn_chars: Characters of each message given to the summarizer
+            (long code pastes are cut)
+        max_conversations: Conversations kept in memory
+        max_concurrent_summaries: Summaries generated at once, so that they
+            never take more than a few engine slots from the students
+    """
+
+    def __init__(
+        self,
+        engine: LLMEngine,
+        recent_turns: int = 6,
+        summary_max_tokens: int = 256,
+        max_turn_chars: int = 4000,
+        max_conversations: int = 10_000,
+        max_concurrent_summaries: int = 2,
+    ) -> None:
+        self.engine = engine
+        self.recent_turns = max(2, recent_turns - recent_turns % 2)
+        self.summary_max_tokens = summary_max_tokens
+        self.max_turn_chars = max_turn_chars
+        self.max_conversations = max_conversations
+        # Turns kept while summaries fail, beyond which the oldest are dropped
+        self.max_turns = 4 * self.recent_turns
+        self._conversations: OrderedDict[str, _Conversation] = OrderedDict()
+        self._summaries = asyncio.Semaphore(max_concurrent_summaries)
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def get(self, conversation_id: str) -> ConversationSnapshot | None:
+        """
+        Reads the memory of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier
+
+        Returns:
+            The summary and latest turns, or None if the conversation is unknown
+        """
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        self._conversations.move_to_end(conversation_id)
+        return ConversationSnapshot(
+            conversation.summary, list(conversation.turns), conversation.submission
+        )
+
+    def append(
+        self,
+        conversation_id: str,
+        user: str,
+        assistant: str,
+        history: Sequence[Message] = (),
+        submission: Submission | None = None,
+    ) -> None:
+        """
+        Records an answered turn, and starts folding older turns if needed.
+
+        Args:
+            conversation_id: Conversation identifier
+            user: Message of the student
+            assistant: Answer of the sensei
+            history: Turns sent by the client, used if the conversation is unknown
+            submission: Code reviewed by this turn, if any (questions in prose
+                keep the previous one)
+        """
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            conversation = self._conversations[conversation_id] = _Conversation(
+                turns=list(history)
+            )
+            while len(self._conversations) > self.max_conversations:
+                _, evicted = self._conversations.popitem(last=False)
+                if evicted.task is not None:
+                    evicted.task.cancel()
+            CONVERSATIONS.set(len(self._conversations))
+        else:
+            self._conversations.move_to_end(conversation_id)
+
+        if submission is not None:
+            conversation.submission = submission
+        conversation.turns += [
+            {"role": "user", "content": user},
+            {"role": "assistant", "content": assistant},
+        ]
+        if len(conversation.turns) > self.max_turns:
+            dropped = len(conversation.turns) - self.max_turns
+            del conversation.turns[:dropped]
+            conversation.folding = max(0, conversation.folding - dropped)
+        if len(conversation.turns) > self.recent_turns and (
+            conversation.task is None or conversation.task.done()
+        ):
+            conversation.task = asyncio.create_task(self._summarize(conversation))
+
+    async def _summarize(self, conversation: _Conversation) -> None:
+        async with self._summaries:
+            # Turns appended meanwhile are folded by the next round
+            while len(conversation.turns) > self.recent_turns:
+                folded = conversation.turns[
+                    : len(conversation.turns) - self.recent_turns
+                ]
+                conversation.folding = len(folded)
+                started = time.perf_counter()
+                try:
+                    summary = await self._generate(conversation.summary, folded)
+                except Exception:
+                    logger.warning("Conversation summary failed", exc_info=True)
+                    SUMMARIES.inc(outcome="failed")
+                    conversation.folding = 0
+                    return
+                SUMMARY_SECONDS.observe(time.perf_counter() - started)
+                SUMMARIES.inc(outcome="updated")
+                conversation.summary = summary
+                # Turns appended meanwhile may have pushed some folded ones out
+                # (see max_turns); only those still held are removed
+                del conversation.turns[: conversation.folding]
+                conversation.folding = 0
+
+    async def _generate(self, previous_summary: str, turns: list[Message]) -> str:
+        transcript = "\n\n".join(
+            f"{turn['role']}: {turn['content'][: self.max_turn_chars]}"
+            for turn in turns
+        )
+        generation = GenerationRequest(
+            request_id=f"summary-{uuid.uuid4().hex}",
+            messages=[
+                {
+                    "role": "user",
+                    "content": create_summary_prompt(previous_summary, transcript),
+                }
+            ],
+            max_tokens=self.summary_max_tokens,
+            temperature=SUMMARY_TEMPERATURE,
+        )
+        chunks = []
+        completed = False
+        tokens = self.engine.stream(generation)
+        try:
+            async for token in tokens:
+                chunks.append(token)
+            completed = True
+        finally:
+            await close_iterator(tokens)
+            if not completed:
+                await self.engine.abort(generation.request_id)
+        return "".join(chunks).strip()
+
+    async def close(self) -> None:
+        """Cancels the summaries still being generated."""
+        tasks = [
+            conversation.task
+            for conversation in self._conversations.values()
+            if conversation.task is not None and not conversation.task.done()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
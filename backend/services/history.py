@@ -0,0 +1,147 @@
+"""
+Review history: the answered reviews stored in the database, read page by page.
+"""
+
+import asyncio
+import time
+from collections.abc import Sequence
+
+from backend.core.exceptions import NotFoundError
+from backend.core.metrics import REGISTRY
+from backend.db.reviews import ReviewPage, ReviewRecord, ReviewStore
+from backend.db.search import ReviewSearchIndex, SearchPage
+from backend.db.stats import ReviewStats, ReviewStatsStore
+
+SEARCH_LATENCY = REGISTRY.histogram(
+    "sensai_history_search_seconds",
+    "Time spent answering a full-text search of the review history",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class HistoryService:
+    """
+    Reads the review history without blocking the event loop.
+
+    Reviews are written by the review service's background writer, so a review
+    shows up here shortly (``review_log_flush_ms``) after its answer completed.
+
+    Args:
+        store: Store of the ``reviews`` table
+        search_index: Full-text index of the same table
+        stats_store: Daily counters of the same table
+    """
+
+    def __init__(
+        self,
+        store: ReviewStore,
+        search_index: ReviewSearchIndex,
+        stats_store: ReviewStatsStore,
+    ) -> None:
+        self.store = store
+        self.search_index = search_index
+        self.stats_store = stats_store
+
+    async def list_reviews(
+        self,
+        session_id: str | None = None,
+        conversation_id: str | None = None,
+        languages: Sequence[str] = (),
+        since: float | None = None,
+        until: float | None = None,
+        cursor: int | None = None,
+        limit: int = 20,
+    ) -> ReviewPage:
+        """
+        Reads one page of review summaries, newest first.
+
+        Args:
+            session_id: Only reviews of this session
+            conversation_id: Only reviews of this conversation
+            languages: Only reviews in these languages (any language if empty)
+            since: Only reviews answered at or after this Unix time
+            until: Only reviews answered before this Unix time
+            cursor: ``next_cursor`` of the previous page (None for the first page)
+            limit: Maximum number of reviews returned
+
+        Returns:
+            The page
+        """
+        return await asyncio.to_thread(
+            self.store.list_page,
+            session_id=session_id,
+            conversation_id=conversation_id,
+            languages=languages,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit,
+        )
+
+    async def get_review(self, row_id: int) -> ReviewRecord:
+        """
+        Reads one review in full.
+
+        Args:
+            row_id: Row id of the review (``id`` of its summary)
+
+        Returns:
+            The review
+
+        Raises:
+            NotFoundError: If there is no review with this id
+        """
+        record = await asyncio.to_thread(self.store.get, row_id)
+        if record is None:
+            raise NotFoundError("This review does not exist.", details={"id": row_id})
+        return record
+
+    async def search(
+        self,
+        query: str,
+        session_id: str | None = None,
+        languages: Sequence[str] = (),
+        offset: int = 0,
+        limit: int = 20,
+    ) -> SearchPage:
+        """
+        Finds the reviews whose code, question or answer match a query.
+
+        Args:
+            query: Search terms; all of them must match, the last one as a prefix
+            session_id: Only reviews of this session
+            languages: Only reviews in these languages (any language if empty)
+            offset: ``next_offset`` of the previous page (0 for the first page)
+            limit: Maximum number of reviews returned
+
+        Returns:
+            The page, most relevant first
+        """
+        started = time.perf_counter()
+        page = await asyncio.to_thread(
+            self.search_index.search,
+            query,
+            session_id=session_id,
+            languages=languages,
+            offset=offset,
+            limit=limit,
+        )
+        SEARCH_LATENCY.observe(time.perf_counter() - started)
+        return page
+
+    async def stats(
+        self, session_id: str | None = None, days: int | None = None
+    ) -> ReviewStats:
+        """
+        Reads the review statistics of a time window.
+
+        Args:
+            session_id: Statistics of this session (of the whole class if None)
+            days: Number of days in the window, today included (all time if None)
+
+        Returns:
+            The statistics
+        """
+        return await asyncio.to_thread(
+            self.stats_store.stats, session_id=session_id, days=days
+        )
@@ -0,0 +1,408 @@
+"""
+Inference engines for the AI Coding Sensei.
+Every engine streams the answer token by token through an async iterator, so the
+API layer can forward text to the client as soon as it is generated.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from backend.core.config import Settings
+from backend.services.tokenizer import estimate_tokens
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+Message = dict[str, str]
+
+
+@dataclass
+class Usage:
+    """
+    Tokens processed by the engine for one generation.
+
+    Attributes:
+        prompt_tokens: Tokens of the prompt
+        completion_tokens: Tokens generated so far
+    """
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class GenerationRequest:
+    """
+    A single generation submitted to an engine.
+
+    Attributes:
+        request_id: Unique identifier, used to abort the generation
+        messages: Chat messages (role/content) forming the prompt
+        max_tokens: Maximum number of tokens to generate
+        temperature: Sampling temperature
+        top_p: Nucleus sampling threshold
+        prefix_fingerprint: Fingerprint of the static system prefix, if any
+        affinity_key: Conversation identifier, used to route every turn of a
+            conversation to the same replica (derived from the prompt if empty)
+        usage: Actual token usage, updated by the engine while it streams
+    """
+
+    request_id: str
+    messages: list[Message]
+    max_tokens: int = 2048
+    temperature: float = 0.7
+    top_p: float = 0.9
+    prefix_fingerprint: str = ""
+    affinity_key: str = ""
+    usage: Usage = field(default_factory=Usage)
+
+
+class EngineError(RuntimeError):
+    """Raised when the inference engine fails to produce an answer."""
+
+
+class LLMEngine(ABC):
+    """
+    Base class of all inference engines.
+
+    Engines are started once in the application lifespan and shared by every
+    request; ``stream`` must be safe to call concurrently from many tasks.
+    """
+
+    name: str = "base"
+
+    async def start(self) -> None:
+        """Loads the model or opens connections. Called once at startup."""
+
+    async def close(self) -> None:
+        """Releases resources. Called once at shutdown."""
+
+    async def health(self) -> bool:
+        """
+        Reports whether the engine can serve requests.
+
+        Returns:
+            True if the engine is ready
+        """
+        return True
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens of a text with the model's tokenizer.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            Token count (an estimate for engines without a tokenizer)
+        """
+        return estimate_tokens(text)
+
+    @abstractmethod
+    def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        """
+        Generates an answer and yields it as text deltas.
+
+        Args:
+            request: The generation to run
+
+        Returns:
+            Async iterator over the generated text, one delta at a time
+        """
+
+    async def abort(self, request_id: str) -> None:
+        """
+        Stops a running generation and frees its resources.
+
+        Args:
+            request_id: Identifier of the generation to abort
+        """
+
+
+class FakeLLMEngine(LLMEngine):
+    """
+    CPU-only engine that simulates a streaming LLM.
+
+    It sleeps for a configurable time to first token and per-token latency and
+    emits a canned Socratic answer, which makes it possible to load-test the
+    streaming path without a GPU.
+    """
+
+    name = "fake"
+
+    _VOCABULARY = (
+        "Great start! Let me ask you a few questions to help you think deeper.\n\n"
+        "1. What happens if the input is empty?\n"
+        "2. Which part of this code runs most often, and why?\n"
+        "3. How could you test this function with a few small examples?\n\n"
+        "Take a moment to reason about each question before changing the code. "
+    ).split(" ")
+
+    def __init__(
+        self,
+        ttft_ms: float = 200.0,
+        token_latency_ms: float = 20.0,
+        response_tokens: int = 200,
+    ) -> None:
+        self.ttft = ttft_ms / 1000
+        self.token_latency = token_latency_ms / 1000
+        self.response_tokens = response_tokens
+        self._aborted: set[str] = set()
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        request.usage.prompt_tokens = sum(
+            self.count_tokens(message["content"]) for message in request.messages
+        )
+        await asyncio.sleep(self.ttft)
+        words = itertools.cycle(self._VOCABULARY)
+        try:
+            for index in range(min(self.response_tokens, request.max_tokens)):
+                if request.request_id in self._aborted:
+                    return
+                if index:
+                    await asyncio.sleep(self.token_latency)
+                request.usage.completion_tokens += 1
+                yield next(words) + " "
+        finally:
+            self._aborted.discard(request.request_id)
+
+    async def abort(self, request_id: str) -> None:
+        self._aborted.add(request_id)
+
+
+class VLLMEngine(LLMEngine):
+    """
+    In-process vLLM engine.
+
+    Uses ``AsyncLLMEngine`` so that concurrent requests are continuously batched
+    on the GPU while each one streams its own output.
+    """
+
+    name = "vllm"
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        # vLLM ships without type information
+        self._engine: Any = None
+        self._tokenizer: Any = None
+
+    async def start(self) -> None:
+        # Imported lazily: vLLM pulls in torch/CUDA, which the fake engine avoids
+        from vllm import AsyncEngineArgs, AsyncLLMEngine
+
+        engine_args = AsyncEngineArgs(
+            model=self.settings.model,
+            max_model_len=self.settings.max_model_len,
+            gpu_memory_utilization=self.settings.gpu_memory_utilization,
+            enable_prefix_caching=True,
+        )
+        self._engine = AsyncLLMEngine.from_engine_args(engine_args)
+        self._tokenizer = await self._engine.get_tokenizer()
+        logger.info("vLLM engine loaded model %s", self.settings.model)
+
+    async def health(self) -> bool:
+        if self._engine is None:
+            return False
+        try:
+            await self._engine.check_health()
+        except Exception:
+            return False
+        return True
+
+    def count_tokens(self, text: str) -> int:
+        if self._tokenizer is None:
+            return estimate_tokens(text)
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+    def _render_prompt(self, messages: list[Message]) -> str:
+        if self._tokenizer is not None and getattr(
+            self._tokenizer, "chat_template", None
+        ):
+            prompt: str = self._tokenizer.apply_chat_template(
+                messages, tokenize=False, add_generation_prompt=True
+            )
+            return prompt
+        return "\n\n".join(message["content"] for message in messages)
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        if self._engine is None:
+            raise EngineError("vLLM engine is not started")
+
+        from vllm import SamplingParams
+
+        sampling_params = SamplingParams(
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            top_p=request.top_p,
+        )
+        prompt = self._render_prompt(request.messages)
+
+        # vLLM reports the cumulative text; forward only what is new
+        sent = 0
+        async for output in self._engine.generate(
+            prompt, sampling_params, request.request_id
+        ):
+            request.usage.prompt_tokens = len(output.prompt_token_ids or ())
+            request.usage.completion_tokens = len(output.outputs[0].token_ids)
+            text = output.outputs[0].text
+            if len(text) > sent:
+                yield text[sent:]
+                sent = len(text)
+
+    async def abort(self, request_id: str) -> None:
+        if self._engine is not None:
+            await self._engine.abort(request_id)
+
+
+class OpenAICompatibleEngine(LLMEngine):
+    """
+    Engine backed by an OpenAI-compatible HTTP server (``vllm serve``, TGI...).
+
+    Streams ``/v1/chat/completions`` over one pooled HTTP/1.1 connection per
+    in-flight request; aborting a request closes its connection, which makes
+    the server stop the generation.
+    """
+
+    name = "openai"
+
+    def __init__(self, settings: Settings, base_url: str | None = None) -> None:
+        self.settings = settings
+        self.base_url = (base_url or settings.upstream_urls[0]).rstrip("/")
+        self._client: httpx.AsyncClient | None = None
+        self._responses: dict[str, Any] = {}
+
+    async def start(self) -> None:
+        # Imported lazily: only this engine needs an HTTP client
+        import httpx
+
+        headers = {}
+        if self.settings.upstream_api_key:
+            headers["Authorization"] = f"Bearer {self.settings.upstream_api_key}"
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(10.0, read=None),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=64),
+        )
+        logger.info("OpenAI-compatible engine using %s", self.base_url)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def health(self) -> bool:
+        if self._client is None:
+            return False
+        for path in ("/health", "/v1/models"):
+            try:
+                response = await self._client.get(path, timeout=5.0)
+            except Exception:
+                return False
+            if response.status_code == 200:
+                return True
+        return False
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        if self._client is None:
+            raise EngineError("OpenAI-compatible engine is not started")
+
+        body = {
+            "model": self.settings.model,
+            "messages": request.messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "top_p": request.top_p,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        # Estimated until the server reports the exact usage
+        request.usage.prompt_tokens = sum(
+            self.count_tokens(message["content"]) for message in request.messages
+        )
+        async with self._client.stream(
+            "POST", "/v1/chat/completions", json=body
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise EngineError(
+                    f"Upstream returned {response.status_code}: {response.text[:200]}"
+                )
+            self._responses[request.request_id] = response
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:") :].strip()
+                    if data == "[DONE]":
+                        return
+                    chunk = json.loads(data)
+                    # Sent last, with an empty choice list
+                    usage = chunk.get("usage")
+                    if usage:
+                        request.usage.prompt_tokens = usage.get("prompt_tokens", 0)
+                        request.usage.completion_tokens = usage.get(
+                            "completion_tokens", 0
+                        )
+                    choices = chunk.get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        # One token per chunk, until the exact usage arrives
+                        request.usage.completion_tokens += 1
+                        yield content
+            finally:
+                self._responses.pop(request.request_id, None)
+
+    async def abort(self, request_id: str) -> None:
+        response = self._responses.pop(request_id, None)
+        if response is not None:
+            await response.aclose()
+
+
+def create_engine(settings: Settings) -> LLMEngine:
+    """
+    Builds the inference engine selected in the settings.
+
+    Args:
+        settings: Backend settings
+
+    Returns:
+        An engine instance, not yet started
+    """
+    if settings.engine == "fake":
+        return FakeLLMEngine(
+            ttft_ms=settings.fake_ttft_ms,
+            token_latency_ms=settings.fake_token_latency_ms,
+            response_tokens=settings.fake_response_tokens,
+        )
+    if settings.engine == "vllm":
+        return VLLMEngine(settings)
+    if settings.engine == "openai":
+        if len(settings.upstream_urls) == 1:
+            return OpenAICompatibleEngine(settings)
+        # Imported here: the router module builds on this one
+        from backend.services.router import UpstreamRouter
+
+        return UpstreamRouter(
+            [OpenAICompatibleEngine(settings, url) for url in settings.upstream_urls],
+            affinity_slack_tokens=settings.router_affinity_slack_tokens,
+            health_interval_s=settings.router_health_interval_s,
+            max_failures=settings.router_max_failures,
+            hedge_enabled=settings.router_hedge_enabled,
+            hedge_percentile=settings.router_hedge_percentile,
+            hedge_min_delay_ms=settings.router_hedge_min_delay_ms,
+            ttft_slo_ms=settings.router_ttft_slo_ms,
+            hedge_max_ratio=settings.router_hedge_max_ratio,
+        )
+    raise ValueError(f"Unknown inference engine: {settings.engine!r}")
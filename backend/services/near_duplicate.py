@@ -0,0 +1,266 @@
+"""
+Near-duplicate detection for submitted code.
+Submissions are fingerprinted with a 64-bit SimHash over identifier-normalized
+token shingles, so that renamed variables and reformatting still match, and
+indexed with banded LSH for constant-time lookups.
+"""
+
+import enum
+import hashlib
+import re
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from backend.core.metrics import REGISTRY
+
+NEAR_DUPLICATE_LOOKUPS = REGISTRY.counter(
+    "sensai_near_duplicate_lookups_total",
+    "Near-duplicate index lookups, by result",
+    ["result"],
+)
+NEAR_DUPLICATE_ENTRIES = REGISTRY.gauge(
+    "sensai_near_duplicate_entries",
+    "Submissions stored in the near-duplicate index",
+)
+
+FINGERPRINT_BITS = 64
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+SHINGLE_SIZE = 4
+KEY_BYTES = 32
+
+_TOKEN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[A-Za-z_]\w*|\d+(?:\.\d+)?|\S'
+)
+_LINE_COMMENT = re.compile(r"(?://|#)[^\n]*")
+
+# Names kept verbatim; every other identifier becomes a placeholder
+_KEPT_NAMES = frozenset("""
+    and as assert async await break case catch class const continue def default
+    del delete do elif else enum except extends false final finally fn for from
+    func function go if impl implements import in interface is lambda let loop
+    match mod mut new nil none not null or package pass private protected pub
+    public raise return self static struct super switch this throw throws trait
+    true try type var void while with yield int float str bool char double long
+    string list dict set tuple vec map len range print println printf append
+    """.split())
+
+
+class NearDuplicatePolicy(str, enum.Enum):
+    """What to do when a submission nearly matches a previous one."""
+
+    REUSE = "reuse"  # Answer with the previous review
+    CONTEXT = "context"  # Give the previous review to the model as context
+    METRIC = "metric"  # Only count the match
+    OFF = "off"  # Do not fingerprint submissions
+
+
+def _shingle_tokens(code: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN.findall(_LINE_COMMENT.sub("", code)):
+        if token[0] in "\"'":
+            tokens.append("S")
+        elif token[0].isalpha() or token[0] == "_":
+            tokens.append(token if token.lower() in _KEPT_NAMES else "V")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+# Per-bit counters are kept in 20-bit lanes of one big integer, so summing a
+# shingle hash into them costs 8 table lookups instead of 64 bit tests
+_LANE_BITS = 20
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_MAX_SHINGLES = _LANE_MASK
+_SPREAD = [
+    [
+        sum(
+            1 << (_LANE_BITS * (8 * byte_index + bit))
+            for bit in range(8)
+            if byte >> bit & 1
+        )
+        for byte in range(256)
+    ]
+    for byte_index in range(FINGERPRINT_BITS // 8)
+]
+
+
+def simhash(code: str) -> int:
+    """
+    Computes the 64-bit SimHash of a code snippet.
+
+    Args:
+        code: Submitted code
+
+    Returns:
+        Fingerprint whose Hamming distance reflects how different two snippets are
+    """
+    tokens = _shingle_tokens(code)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles: Iterable[str] = [" ".join(tokens)]
+    else:
+        count = min(len(tokens) - SHINGLE_SIZE + 1, _MAX_SHINGLES)
+        shingles = (" ".join(tokens[i : i + SHINGLE_SIZE]) for i in range(count))
+
+    counters = 0
+    total = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for byte_index, byte in enumerate(digest):
+            counters += _SPREAD[byte_index][byte]
+        total += 1
+
+    # A bit is set when most shingle hashes have it set
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if 2 * (counters >> (_LANE_BITS * bit) & _LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """
+    Banded LSH index over SimHash fingerprints.
+
+    The 64-bit fingerprint is split in 4 bands of 16 bits; two fingerprints
+    within a Hamming distance of 3 share at least one band exactly, so looking
+    up the 4 band buckets finds every match. Buckets are singly-linked lists
+    and keys are stored in flat arrays, which keeps each entry under 60 bytes.
+
+    Buckets fill up with variants of popular exercises, so a lookup scans at
+    most ``max_candidates`` entries (the most recent ones, which come first).
+
+    Args:
+        max_distance: Largest Hamming distance considered a near-duplicate (< BANDS)
+        capacity: Maximum number of entries; the oldest half is dropped when full
+        max_candidates: Entries of the scope compared at most by one lookup
+        max_scopes: Scopes remembered; entries of the least recently used scope
+            stop matching when it is forgotten, and age out of the index
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 3,
+        capacity: int = 500_000,
+        max_candidates: int = 256,
+        max_scopes: int = 10_000,
+    ) -> None:
+        if not 0 <= max_distance < BANDS:
+            raise ValueError(f"max_distance must be between 0 and {BANDS - 1}")
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self.max_candidates = max_candidates
+        self.max_scopes = max_scopes
+        self._scopes: OrderedDict[str, int] = OrderedDict()
+        self._next_scope_id = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._fingerprints = array("Q")
+        self._scope_ids = array("I")
+        self._keys = bytearray()
+        self._heads = [array("i", [-1]) * (1 << BAND_BITS) for _ in range(BANDS)]
+        self._next = [array("i") for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def _scope_id(self, scope: str) -> int:
+        scope_id = self._scopes.get(scope)
+        if scope_id is not None:
+            self._scopes.move_to_end(scope)
+            return scope_id
+        # Ids are never reused, so the entries of a forgotten scope match nothing
+        scope_id = self._scopes[scope] = self._next_scope_id
+        self._next_scope_id += 1
+        if len(self._scopes) > self.max_scopes:
+            self._scopes.popitem(last=False)
+        return scope_id
+
+    def add(self, code: str, scope: str, key: str) -> None:
+        """
+        Indexes a submission.
+
+        Args:
+            code: Submitted code
+            scope: Only submissions of the same scope match (language, question...)
+            key: Hex SHA-256 returned on a match (the response cache key)
+        """
+        fingerprint = simhash(code)
+        scope_id = self._scope_id(scope)
+        if self._nearest(fingerprint, scope_id)[1] == 0:
+            # Already indexed: a copy would only lengthen the buckets
+            return
+        if len(self) >= self.capacity:
+            self._compact()
+        self._insert(fingerprint, scope_id, key)
+        NEAR_DUPLICATE_ENTRIES.set(len(self))
+
+    def _insert(self, fingerprint: int, scope_id: int, key: str) -> None:
+        entry = len(self._fingerprints)
+        self._fingerprints.append(fingerprint)
+        self._scope_ids.append(scope_id)
+        self._keys += bytes.fromhex(key)
+        for band in range(BANDS):
+            bucket = fingerprint >> (band * BAND_BITS) & BAND_MASK
+            self._next[band].append(self._heads[band][bucket])
+            self._heads[band][bucket] = entry
+
+    def _compact(self) -> None:
+        """Drops the oldest half of the entries."""
+        keep = len(self) // 2
+        start = len(self) - keep
+        entries = [
+            (self._fingerprints[entry], self._scope_ids[entry], self._key(entry))
+            for entry in range(start, len(self))
+        ]
+        self._reset()
+        for fingerprint, scope_id, key in entries:
+            self._insert(fingerprint, scope_id, key)
+
+    def _key(self, entry: int) -> str:
+        return self._keys[entry * KEY_BYTES : (entry + 1) * KEY_BYTES].hex()
+
+    def _nearest(self, fingerprint: int, scope_id: int) -> tuple[int, int]:
+        """Closest entry of the scope within ``max_distance`` (-1 if none)."""
+        best_entry, best_distance = -1, self.max_distance + 1
+        budget = self.max_candidates
+        for band in range(BANDS):
+            entry = self._heads[band][fingerprint >> (band * BAND_BITS) & BAND_MASK]
+            while entry != -1 and budget:
+                if self._scope_ids[entry] == scope_id:
+                    budget -= 1
+                    distance = (self._fingerprints[entry] ^ fingerprint).bit_count()
+                    # Newer entries come first in a bucket; keep them on ties
+                    if distance < best_distance:
+                        if distance == 0:
+                            return entry, 0
+                        best_entry, best_distance = entry, distance
+                entry = self._next[band][entry]
+        return best_entry, best_distance
+
+    def find(self, code: str, scope: str) -> str | None:
+        """
+        Finds the closest previous submission of the same scope.
+
+        Args:
+            code: Submitted code
+            scope: Scope of the submission
+
+        Returns:
+            Key of the nearest match within ``max_distance``, or None
+        """
+        scope_id = self._scopes.get(scope)
+        if scope_id is None or not len(self):
+            NEAR_DUPLICATE_LOOKUPS.inc(result="miss")
+            return None
+        self._scopes.move_to_end(scope)
+
+        best_entry, best_distance = self._nearest(simhash(code), scope_id)
+        if best_entry == -1:
+            NEAR_DUPLICATE_LOOKUPS.inc(result="miss")
+            return None
+        NEAR_DUPLICATE_LOOKUPS.inc(result="exact" if best_distance == 0 else "near")
+        return self._key(best_entry)
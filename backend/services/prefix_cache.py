@@ -0,0 +1,67 @@
+"""
+Prefix cache hit tracking.
+The inference engine reuses the KV cache of prompt prefixes it has recently
+seen; tracking the static prefix fingerprints of recent requests gives the
+hit rate that layout to expect.
+"""
+
+from collections import OrderedDict
+
+from backend.core.metrics import REGISTRY
+
+PREFIX_REQUESTS = REGISTRY.counter(
+    "sensai_prefix_cache_requests_total",
+    "Requests by static prompt prefix, split by whether the prefix was recently seen",
+    ["result"],
+)
+PREFIX_HIT_RATIO = REGISTRY.gauge(
+    "sensai_prefix_cache_hit_ratio",
+    "Share of requests whose static prompt prefix was recently seen",
+)
+
+
+class PrefixCacheTracker:
+    """
+    Remembers the most recently used prefix fingerprints.
+
+    This mirrors the engine's LRU eviction of cached prefixes; since the engine
+    may also evict under memory pressure, the reported ratio is an upper bound.
+
+    Args:
+        capacity: Number of distinct prefixes assumed to stay cached
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = capacity
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self.hits = 0
+        self.requests = 0
+
+    def record(self, fingerprint: str) -> bool:
+        """
+        Records a request using a prefix.
+
+        Args:
+            fingerprint: Fingerprint of the request's static prefix
+
+        Returns:
+            True if the prefix was recently seen (likely cached by the engine)
+        """
+        hit = fingerprint in self._recent
+        if hit:
+            self._recent.move_to_end(fingerprint)
+        else:
+            self._recent[fingerprint] = None
+            if len(self._recent) > self.capacity:
+                self._recent.popitem(last=False)
+
+        self.requests += 1
+        self.hits += hit
+        PREFIX_REQUESTS.inc(result="hit" if hit else "miss")
+        PREFIX_HIT_RATIO.set(self.hit_ratio)
+        return hit
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of recorded requests that reused a recent prefix."""
+        return self.hits / self.requests if self.requests else 0.0
@@ -0,0 +1,187 @@
+"""
+Quota accounting: token budgets per session and per client address, and the
+usage log of every served request.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import NoReturn
+
+from backend.core.config import Settings
+from backend.core.exceptions import RateLimitError
+from backend.core.metrics import REGISTRY
+from backend.db.batch_writer import BatchWriter
+from backend.db.usage_logs import UsageRecord
+from backend.services.llm_service import Usage
+from backend.services.rate_limiter import TokenBucketLimiter
+
+RATE_LIMITED = REGISTRY.counter(
+    "sensai_rate_limited_total",
+    "Requests rejected by the token budget, by scope",
+    ["scope"],
+)
+TOKENS_ESTIMATED = REGISTRY.counter(
+    "sensai_tokens_estimated_total",
+    "Tokens charged upfront to client budgets",
+)
+TOKENS_USED = REGISTRY.counter(
+    "sensai_tokens_used_total",
+    "Tokens processed by the engine, by kind (prompt or completion)",
+    ["kind"],
+)
+
+
+@dataclass
+class Charge:
+    """
+    Tokens taken from a client's budgets for one request.
+
+    Attributes:
+        session_id: Session of the request (empty if anonymous)
+        client_ip: Address of the client
+        endpoint: API endpoint
+        tokens: Tokens currently charged
+        settled: Whether the charge was reconciled with the actual usage
+    """
+
+    session_id: str
+    client_ip: str
+    endpoint: str
+    tokens: int
+    settled: bool = False
+
+
+class QuotaService:
+    """
+    Charges requests against per-session and per-IP token buckets.
+
+    A request is charged its estimated prompt plus completion tokens before it
+    runs; when its stream ends the charge is reconciled with the tokens the
+    engine actually processed, and a usage record is queued for the database.
+
+    Args:
+        settings: Backend settings (budgets)
+        usage_log: Background writer of usage records, if any
+    """
+
+    def __init__(
+        self, settings: Settings, usage_log: BatchWriter[UsageRecord] | None = None
+    ) -> None:
+        self.enabled = settings.rate_limit_enabled
+        self.completion_estimate = settings.completion_token_estimate
+        self.usage_log = usage_log
+        self.sessions = TokenBucketLimiter(
+            capacity=settings.session_token_burst,
+            refill_per_s=settings.session_tokens_per_minute / 60,
+        )
+        self.ips = TokenBucketLimiter(
+            capacity=settings.ip_token_burst,
+            refill_per_s=settings.ip_tokens_per_minute / 60,
+        )
+
+    def estimate(self, prompt_tokens: int, max_tokens: int) -> int:
+        """
+        Estimates the tokens a request will consume.
+
+        Args:
+            prompt_tokens: Tokens of the prompt
+            max_tokens: Completion limit of the request
+
+        Returns:
+            Prompt tokens plus the expected completion length
+        """
+        return prompt_tokens + min(max_tokens, self.completion_estimate)
+
+    def charge(
+        self, session_id: str, client_ip: str, endpoint: str, tokens: int
+    ) -> Charge:
+        """
+        Takes the estimated tokens from the session and IP budgets.
+
+        Args:
+            session_id: Session of the request (empty if anonymous)
+            client_ip: Address of the client
+            endpoint: API endpoint
+            tokens: Estimated tokens
+
+        Returns:
+            The charge, to settle when the request ends
+
+        Raises:
+            RateLimitError: If either budget is exhausted
+        """
+        charge = Charge(session_id, client_ip, endpoint, tokens)
+        if not self.enabled:
+            charge.tokens = 0
+            return charge
+
+        if session_id:
+            wait = self.sessions.try_acquire(session_id, tokens)
+            if wait:
+                self._reject("session", wait)
+        wait = self.ips.try_acquire(client_ip, tokens)
+        if wait:
+            if session_id:
+                self.sessions.adjust(session_id, -tokens)
+            self._reject("ip", wait)
+
+        TOKENS_ESTIMATED.inc(tokens)
+        return charge
+
+    def _reject(self, scope: str, wait: float) -> NoReturn:
+        RATE_LIMITED.inc(scope=scope)
+        raise RateLimitError(
+            "You are sending requests too fast, please slow down.",
+            retry_after_s=max(1, math.ceil(min(wait, 3600))),
+            details={"scope": scope},
+        )
+
+    def _adjust(self, charge: Charge, tokens: int) -> None:
+        if not self.enabled or not tokens:
+            return
+        if charge.session_id:
+            self.sessions.adjust(charge.session_id, tokens)
+        self.ips.adjust(charge.client_ip, tokens)
+        charge.tokens += tokens
+
+    def refund(self, charge: Charge) -> None:
+        """
+        Gives back the whole charge of a request that was not served.
+
+        Args:
+            charge: Charge from ``charge``
+        """
+        if not charge.settled:
+            charge.settled = True
+            self._adjust(charge, -charge.tokens)
+
+    def settle(self, charge: Charge, usage: Usage) -> None:
+        """
+        Reconciles a charge with the engine's actual usage and logs it.
+
+        Safe to call more than once; only the first call counts.
+
+        Args:
+            charge: Charge from ``charge``
+            usage: Tokens the engine processed for the request (zero for
+                answers replayed from the cache or shared with another request)
+        """
+        if charge.settled:
+            return
+        charge.settled = True
+        self._adjust(charge, usage.total_tokens - charge.tokens)
+        TOKENS_USED.inc(usage.prompt_tokens, kind="prompt")
+        TOKENS_USED.inc(usage.completion_tokens, kind="completion")
+
+        if self.usage_log is not None:
+            self.usage_log.submit(
+                UsageRecord(
+                    session_id=charge.session_id,
+                    client_ip=charge.client_ip,
+                    endpoint=charge.endpoint,
+                    timestamp=time.time(),
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                )
+            )
@@ -0,0 +1,93 @@
+"""
+Token-bucket rate limiting.
+Clients are charged in model tokens rather than requests, since a full-file
+review costs the GPU far more than a one-line follow-up.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token buckets, one per key (session, IP address...).
+
+    Each bucket holds up to ``capacity`` tokens and refills continuously at
+    ``refill_per_s``. Charges can be adjusted after the fact, so a bucket may
+    go negative when a request used more than estimated.
+
+    Args:
+        capacity: Bucket size, i.e. the largest burst allowed
+        refill_per_s: Tokens added back per second
+        max_keys: Buckets kept in memory; the least recently used are dropped
+            (a dropped bucket comes back full)
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_s: float,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.refill_per_s = refill_per_s
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> [tokens, last refill time]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, key: str) -> list[float]:
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.capacity, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(
+                self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_s
+            )
+            bucket[1] = now
+        return bucket
+
+    def try_acquire(self, key: str, tokens: float) -> float:
+        """
+        Takes tokens from a bucket if it holds enough.
+
+        Requests larger than the bucket are let through when it is full.
+
+        Args:
+            key: Bucket key
+            tokens: Tokens to take
+
+        Returns:
+            0 if the tokens were taken, otherwise the seconds to wait before
+            enough tokens are available
+        """
+        bucket = self._bucket(key)
+        needed = min(tokens, self.capacity)
+        if bucket[0] >= needed:
+            bucket[0] -= tokens
+            return 0.0
+        if self.refill_per_s <= 0:
+            return math.inf
+        return (needed - bucket[0]) / self.refill_per_s
+
+    def adjust(self, key: str, tokens: float) -> None:
+        """
+        Corrects a previous charge.
+
+        Args:
+            key: Bucket key
+            tokens: Extra tokens to take (negative to give tokens back)
+        """
+        bucket = self._bucket(key)
+        bucket[0] = min(self.capacity, bucket[0] - tokens)
@@ -0,0 +1,218 @@
+"""
+Exact-match response cache.
+Identical submissions (same normalized code, language, question and prompt
+version) are answered from memory instead of running a new generation.
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+
+from backend.core.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "sensai_response_cache_requests_total",
+    "Response cache lookups, by result",
+    ["result"],
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "sensai_response_cache_evictions_total",
+    "Response cache entries evicted, by reason",
+    ["reason"],
+)
+CACHE_BYTES = REGISTRY.gauge(
+    "sensai_response_cache_bytes",
+    "Size of the cached responses, in bytes",
+)
+
+# Bump when the prompt wording changes in a way that should invalidate answers
+PROMPT_VERSION = "2"
+
+_HASH_COMMENT_LANGUAGES = {"python"}
+
+# Strings are matched first so that comment markers inside them are kept
+_C_STYLE_TOKENS = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`|//[^\n]*|/\*.*?\*/',
+    re.DOTALL,
+)
+_PYTHON_TOKENS = re.compile(
+    r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\''
+    r'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|#[^\n]*'
+)
+_INLINE_WHITESPACE = re.compile(r"[ \t]+")
+_REPLAY_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def _strip_comments(
+    code: str, pattern: re.Pattern[str], markers: tuple[str, ...]
+) -> str:
+    def replace(match: re.Match[str]) -> str:
+        token = match.group(0)
+        return "" if token.startswith(markers) else token
+
+    return pattern.sub(replace, code)
+
+
+def normalize_code(code: str, language: str = "unknown") -> str:
+    """
+    Normalizes code so that formatting-only differences share a cache entry.
+
+    Comments, trailing whitespace, blank lines and runs of inline whitespace are
+    removed. Leading indentation is kept for Python, where it is meaningful.
+
+    Args:
+        code: Submitted code
+        language: Programming language of the code
+
+    Returns:
+        The normalized code
+    """
+    if language in _HASH_COMMENT_LANGUAGES:
+        code = _strip_comments(code, _PYTHON_TOKENS, ("#",))
+    else:
+        code = _strip_comments(code, _C_STYLE_TOKENS, ("//", "/*"))
+
+    lines = []
+    for line in code.expandtabs(4).splitlines():
+        body = _INLINE_WHITESPACE.sub(" ", line.strip())
+        if not body:
+            continue
+        indent = (
+            len(line) - len(line.lstrip()) if language in _HASH_COMMENT_LANGUAGES else 0
+        )
+        lines.append(" " * indent + body)
+    return "\n".join(lines)
+
+
+def make_cache_key(code: str, language: str, question: str, prompt_version: str) -> str:
+    """
+    Computes the cache key of a review.
+
+    Args:
+        code: Submitted code
+        language: Programming language of the code
+        question: Student question (empty if none)
+        prompt_version: Identifies the prompt (prefix fingerprint, version, model)
+
+    Returns:
+        Hex SHA-256 of the normalized inputs
+    """
+    payload = json.dumps(
+        [
+            normalize_code(code, language),
+            language,
+            " ".join(question.split()),
+            prompt_version,
+        ]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CacheEntry:
+    text: str
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    LRU cache of complete answers with TTL expiry and a size cap in bytes.
+
+    Args:
+        max_bytes: Total size of the cached answers
+        ttl_seconds: Lifetime of an entry
+        max_entry_bytes: Answers larger than this are not cached
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 24 * 3600,
+        max_entry_bytes: int = 256 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self.clock = clock
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # Does not count as a lookup nor refresh the entry
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > self.clock()
+
+    def _remove(self, key: str, reason: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        CACHE_EVICTIONS.inc(reason=reason)
+
+    def get(self, key: str) -> str | None:
+        """
+        Looks up a cached answer.
+
+        Args:
+            key: Cache key from ``make_cache_key``
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= self.clock():
+            self._remove(key, "expired")
+            CACHE_BYTES.set(self.size)
+            entry = None
+
+        if entry is None:
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(result="hit")
+        return entry.text
+
+    def put(self, key: str, text: str) -> None:
+        """
+        Stores an answer, evicting the least recently used entries if needed.
+
+        Args:
+            key: Cache key from ``make_cache_key``
+            text: Complete answer
+        """
+        size = len(text.encode("utf-8"))
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key, "replaced")
+        self._entries[key] = _CacheEntry(text, size, self.clock() + self.ttl_seconds)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest, "size")
+        CACHE_BYTES.set(self.size)
+
+
+async def replay(text: str) -> AsyncIterator[str]:
+    """
+    Streams a cached answer in word-sized chunks, like a live generation.
+
+    Args:
+        text: Cached answer
+
+    Returns:
+        Async iterator over chunks of the answer
+    """
+    for match in _REPLAY_CHUNK.finditer(text):
+        yield match.group(0)
@@ -0,0 +1,126 @@
+"""
+Incremental re-review of resubmitted code.
+Compares a submission with the previous one of its conversation, so that a
+resubmission is reviewed from its changed hunks and a digest of the previous
+review instead of the whole code.
+"""
+
+import difflib
+import re
+from dataclasses import dataclass
+
+_CODE_FENCE = re.compile(r"^\s*```")
+_HEADING = re.compile(r"^\s*#{1,6}\s")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+@dataclass
+class Resubmission:
+    """
+    A submission that changes the previous one of its conversation.
+
+    Attributes:
+        diff: Unified diff of the changed hunks (empty if the code is unchanged)
+        previous_review: Digest of the review of the previous version
+        changed_lines: Lines added or removed
+    """
+
+    diff: str
+    previous_review: str
+    changed_lines: int
+
+
+def diff_code(previous: str, code: str, context_lines: int = 3) -> tuple[str, int]:
+    """
+    Computes the changed hunks between two versions of a submission.
+
+    Args:
+        previous: Previously reviewed code
+        code: New code
+        context_lines: Unchanged lines kept around each change
+
+    Returns:
+        The unified diff, and the number of lines added or removed
+    """
+    lines = difflib.unified_diff(
+        previous.splitlines(),
+        code.splitlines(),
+        fromfile="previous",
+        tofile="current",
+        n=context_lines,
+        lineterm="",
+    )
+    hunks = list(lines)[2:]  # Without the ---/+++ file header
+    changed = sum(1 for line in hunks if line[:1] in ("+", "-"))
+    return "\n".join(hunks), changed
+
+
+def digest_review(review: str, max_chars: int = 1500) -> str:
+    """
+    Shortens a review to its outline: headings, and the first sentence of each
+    paragraph and list item (code blocks are left out).
+
+    Args:
+        review: Answer of the sensei
+        max_chars: Length limit of the digest
+
+    Returns:
+        The digest
+    """
+    kept = []
+    size = 0
+    in_code = False
+    paragraph_start = True
+    for line in review.splitlines():
+        if _CODE_FENCE.match(line):
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+        if not line.strip():
+            paragraph_start = True
+            continue
+        marker = _HEADING.match(line) or _LIST_ITEM.match(line)
+        if marker is not None or paragraph_start:
+            # The list marker ("1.") is not the end of the first sentence
+            start = marker.end() if marker is not None else 0
+            text = (
+                line[:start] + _SENTENCE_END.split(line[start:].rstrip(), maxsplit=1)[0]
+            )
+            if size + len(text) > max_chars:
+                break
+            kept.append(text)
+            size += len(text) + 1
+        paragraph_start = False
+    return "\n".join(kept)
+
+
+def find_resubmission(
+    previous: str,
+    previous_review: str,
+    code: str,
+    max_changed_ratio: float = 0.5,
+    context_lines: int = 3,
+    review_chars: int = 1500,
+) -> Resubmission | None:
+    """
+    Tells whether a submission is a revision of the previous one.
+
+    Args:
+        previous: Previously reviewed code of the conversation
+        previous_review: Review of the previous code
+        code: New submission
+        max_changed_ratio: Largest share of changed lines for a revision
+        context_lines: Unchanged lines kept around each change
+        review_chars: Length limit of the digest of the previous review
+
+    Returns:
+        The resubmission, or None if the code is new (or its diff is not
+        shorter than the code itself)
+    """
+    diff, changed = diff_code(previous, code, context_lines)
+    total = max(len(previous.splitlines()), len(code.splitlines()), 1)
+    if changed > max_changed_ratio * total or len(diff) >= len(code):
+        return None
+    return Resubmission(diff, digest_review(previous_review, review_chars), changed)
@@ -0,0 +1,764 @@
+"""
+Code review orchestration: turns a review request into a token-budgeted prompt
+and streams the sensei's answer from the inference engine or the response cache.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from functools import partial
+
+from backend.core.config import Settings
+from backend.core.exceptions import ContextTooLargeError
+from backend.core.metrics import REGISTRY
+from backend.db.batch_writer import BatchWriter
+from backend.db.reviews import ReviewRecord
+from backend.db.usage_logs import UsageRecord
+from backend.prompts.registry import UNKNOWN_LANGUAGE
+from backend.schemas.review import ReviewRequest
+from backend.services.admission import (
+    AdmissionController,
+    QueuePosition,
+    RequestClass,
+    Ticket,
+)
+from backend.services.cancellation import CancellationRegistry, close_iterator
+from backend.services.chunker import AnswerMerger, split_submission
+from backend.services.code_analyzer import CodeAnalyzer
+from backend.services.context_builder import ContextBuilder
+from backend.services.conversation_memory import ConversationMemory, Submission
+from backend.services.language_detector import (
+    AUTO_LANGUAGE,
+    Detection,
+    detect_language,
+    fenced_code,
+)
+from backend.services.llm_service import GenerationRequest, LLMEngine, Usage
+from backend.services.near_duplicate import NearDuplicateIndex, NearDuplicatePolicy
+from backend.services.prefix_cache import PrefixCacheTracker
+from backend.services.quota import QuotaService
+from backend.services.response_cache import (
+    PROMPT_VERSION,
+    ResponseCache,
+    make_cache_key,
+    replay,
+)
+from backend.services.resubmission import Resubmission, find_resubmission
+from backend.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_ABORTED = REGISTRY.counter(
+    "sensai_generations_aborted_total",
+    "Engine generations stopped before completion (client gone or cancelled)",
+)
+LANGUAGE_DETECTIONS = REGISTRY.counter(
+    "sensai_language_detections_total",
+    "Submissions whose language was detected, by language and kind (code or prose)",
+    ["language", "kind"],
+)
+QUICK_ANSWERS = REGISTRY.counter(
+    "sensai_quick_answers_total",
+    "Reviews answered from the static analysis, without the engine",
+)
+RESUBMISSIONS = REGISTRY.counter(
+    "sensai_resubmissions_total",
+    "Code submitted again in a conversation, by review kind (diff or full)",
+    ["kind"],
+)
+REVIEW_CHUNKS = REGISTRY.histogram(
+    "sensai_review_chunks",
+    "Chunks per submission reviewed in chunks",
+    buckets=(2, 3, 4, 6, 8, 12, 16, 24, 32),
+)
+
+SIMILAR_REVIEW_CONTEXT = (
+    "A very similar submission was reviewed before. Use this earlier review as a "
+    "reference, but adapt it to the code above:\n\n{review}"
+)
+CHUNK_CONTEXT = (
+    "This is part {index} of {count} of a larger submission ({location}). The other "
+    "parts are reviewed separately: focus on this part, and keep general advice about "
+    "the whole submission short."
+)
+CHUNKED_INTRO = "This submission is long, so I reviewed it in {count} parts.\n\n"
+CHUNK_HEADING = "### {location}\n\n"
+
+
+@dataclass
+class ChunkReview:
+    """
+    The review of one chunk of a large submission.
+
+    Attributes:
+        location: Where the chunk is in the submission (file and lines)
+        generation: Generation reviewing the chunk
+    """
+
+    location: str
+    generation: GenerationRequest
+
+
+@dataclass
+class PreparedReview:
+    """
+    A review ready to be streamed.
+
+    Attributes:
+        generation: Generation to submit to the engine on a cache miss
+        code: Submitted code
+        cache_key: Identity of the answer, used by the response cache and to
+            coalesce identical requests (None if the answer must not be shared)
+        similarity_scope: Near-duplicate index scope of the submission
+        reuse_key: Cache key of a near-duplicate review to answer with, if any
+        request_class: Admission class (follow-ups are served before reviews)
+        estimated_tokens: Prompt plus expected completion tokens, charged upfront
+        request: The review request, stored with the answer in the history
+        quick_answer: Answer found by static analysis, streamed instead of
+            running a generation
+        chunks: Reviews of the chunks of a large submission, run instead of
+            ``generation`` (which then only collects their usage)
+        is_code: Whether the submission is code rather than a question in prose
+        resubmission: Changes since the code last reviewed in the conversation,
+            if the review only covers them
+    """
+
+    generation: GenerationRequest
+    code: str = ""
+    cache_key: str | None = None
+    similarity_scope: str = ""
+    reuse_key: str | None = None
+    request_class: RequestClass = RequestClass.REVIEW
+    estimated_tokens: int = 0
+    request: ReviewRequest | None = None
+    quick_answer: str | None = None
+    chunks: list[ChunkReview] = field(default_factory=list)
+    is_code: bool = True
+    resubmission: Resubmission | None = None
+
+
+class _ChunkSlots:
+    """
+    Generation slots of the chunks of one submission.
+
+    The review's admission ticket covers one generation: the first chunk runs
+    on it, and further chunks only run at the same time on slots that are free
+    right now (taken without queueing, and given back as soon as their chunk
+    ends). Otherwise they wait for a chunk of the same submission to end.
+
+    Args:
+        admission: Admission controller of the service
+        request_class: Scheduling class of the review
+        limit: Most chunks generated at once
+    """
+
+    def __init__(
+        self, admission: AdmissionController, request_class: RequestClass, limit: int
+    ) -> None:
+        self.admission = admission
+        self.request_class = request_class
+        self.limit = max(1, limit)
+        self._running = 0
+        self._own_free = True
+        self._changed = asyncio.Event()
+
+    async def acquire(self) -> Ticket | None:
+        """Waits for a slot: None for the review's own, else an extra ticket."""
+        while True:
+            changed = self._changed
+            if self._running < self.limit:
+                if self._own_free:
+                    self._own_free = False
+                    self._running += 1
+                    return None
+                ticket = self.admission.try_reserve(self.request_class)
+                if ticket is not None:
+                    self._running += 1
+                    return ticket
+            await changed.wait()
+
+    def release(self, ticket: Ticket | None) -> None:
+        """Gives a slot from ``acquire`` back."""
+        self._running -= 1
+        if ticket is None:
+            self._own_free = True
+        else:
+            self.admission.release(ticket)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class ReviewService:
+    """
+    Streams code reviews from a shared inference engine.
+
+    Args:
+        engine: Started inference engine
+        settings: Backend settings (context window, sampling, caching)
+        usage_log: Background writer of usage records, if any
+        review_log: Background writer of the review history, if any
+    """
+
+    def __init__(
+        self,
+        engine: LLMEngine,
+        settings: Settings,
+        usage_log: BatchWriter[UsageRecord] | None = None,
+        review_log: BatchWriter[ReviewRecord] | None = None,
+    ) -> None:
+        self.engine = engine
+        self.settings = settings
+        self.review_log = review_log
+        self.context_builder = ContextBuilder(
+            max_model_len=settings.max_model_len,
+            max_tokens=settings.max_tokens,
+            count_tokens=engine.count_tokens,
+        )
+        self.prefix_tracker = PrefixCacheTracker()
+        self.analyzer = (
+            CodeAnalyzer(
+                capacity=settings.analyzer_cache_size,
+                max_chars=settings.analyzer_max_chars,
+            )
+            if settings.analyzer_enabled
+            else None
+        )
+        self.memory = (
+            ConversationMemory(
+                engine,
+                recent_turns=settings.memory_recent_turns,
+                summary_max_tokens=settings.memory_summary_max_tokens,
+                max_conversations=settings.memory_max_conversations,
+                max_concurrent_summaries=settings.memory_max_concurrent_summaries,
+            )
+            if settings.memory_enabled
+            else None
+        )
+        self.response_cache = (
+            ResponseCache(
+                max_bytes=settings.response_cache_max_bytes,
+                ttl_seconds=settings.response_cache_ttl_s,
+            )
+            if settings.response_cache_enabled
+            else None
+        )
+        self.single_flight = SingleFlight()
+        self.admission = AdmissionController(
+            max_in_flight=settings.max_in_flight,
+            max_queue=settings.max_queue,
+            retry_after_s=settings.retry_after_s,
+        )
+        self.quota = QuotaService(settings, usage_log)
+        self.cancellations = CancellationRegistry()
+        self.near_duplicate_policy = NearDuplicatePolicy(settings.near_duplicate_policy)
+        self.near_duplicates = (
+            NearDuplicateIndex(
+                max_distance=settings.near_duplicate_max_distance,
+                capacity=settings.near_duplicate_capacity,
+            )
+            if self.near_duplicate_policy is not NearDuplicatePolicy.OFF
+            else None
+        )
+
+    def _cached(self, key: str | None) -> str | None:
+        if key is None or self.response_cache is None:
+            return None
+        return self.response_cache.get(key)
+
+    def _detect(self, request: ReviewRequest) -> Detection:
+        detection = detect_language(request.code)
+        if detection.language == UNKNOWN_LANGUAGE:
+            # A follow-up question keeps the language of the conversation
+            for turn in reversed(request.history):
+                if turn.role != "user":
+                    continue
+                earlier = detect_language(turn.content)
+                if earlier.language != UNKNOWN_LANGUAGE:
+                    detection = Detection(earlier.language, detection.is_code)
+                    break
+        LANGUAGE_DETECTIONS.inc(
+            language=detection.language, kind="code" if detection.is_code else "prose"
+        )
+        return detection
+
+    def prepare(self, request: ReviewRequest) -> PreparedReview:
+        """
+        Builds the generation for a review request.
+
+        Runs before the response starts streaming, so that invalid or oversize
+        requests are rejected with a proper HTTP error instead of being queued.
+
+        Args:
+            request: The validated review request
+
+        Returns:
+            The prepared review
+
+        Raises:
+            ContextTooLargeError: If the submission does not fit in the context window
+            InvalidRequestError: If the language, mode or level is unknown
+        """
+        is_code = True
+        if request.language == AUTO_LANGUAGE:
+            detection = self._detect(request)
+            is_code = detection.is_code
+            request = request.model_copy(update={"language": detection.language})
+
+        prefix = self.context_builder.resolve_prefix(request)
+        prompt_version = f"{PROMPT_VERSION}:{prefix.fingerprint}:{self.settings.model}"
+        question = " ".join((request.question or "").split())
+        memory = None
+        if self.memory is not None and request.conversation_id:
+            memory = self.memory.get(request.conversation_id)
+        followup = bool(request.history) or memory is not None
+        resubmission = None
+        if memory is not None and memory.submission is not None and is_code:
+            resubmission = self._resubmission(request, memory.submission)
+
+        # Follow-ups depend on the conversation, only first turns are shared
+        cache_key = similar_key = None
+        scope = ""
+        if not followup:
+            cache_key = make_cache_key(
+                request.code, request.language, question, prompt_version
+            )
+            scope = f"{request.language}\x00{question}\x00{prompt_version}"
+            if self.near_duplicates is not None:
+                similar_key = self.near_duplicates.find(request.code, scope)
+
+        retrieval_context = ""
+        if self.near_duplicate_policy is NearDuplicatePolicy.CONTEXT:
+            similar_review = self._cached(similar_key)
+            if similar_review:
+                retrieval_context = SIMILAR_REVIEW_CONTEXT.format(review=similar_review)
+
+        # The analyzer and the chunker read the code, not the fences around it
+        code = fenced_code(request.code) if is_code else request.code
+        analysis = None
+        if self.analyzer is not None and is_code and resubmission is None:
+            analysis = self.analyzer.analyze(code, request.language)
+        quick_answer = None
+        if (
+            analysis is not None
+            and not followup
+            and self.settings.analyzer_quick_answers
+        ):
+            quick_answer = analysis.quick_answer()
+
+        chunks: list[ChunkReview] = []
+        if (
+            quick_answer is None
+            and is_code
+            and resubmission is None
+            and self._needs_chunks(code)
+        ):
+            chunks, estimated_tokens = self._prepare_chunks(
+                request.model_copy(update={"code": code})
+            )
+            generation = GenerationRequest(
+                request_id=uuid.uuid4().hex,
+                messages=[],
+                max_tokens=sum(chunk.generation.max_tokens for chunk in chunks),
+                prefix_fingerprint=prefix.fingerprint,
+                affinity_key=request.conversation_id or "",
+            )
+        else:
+            context = self.context_builder.build(
+                request,
+                retrieval_context,
+                memory,
+                analysis.facts() if analysis else "",
+                is_code,
+                resubmission,
+            )
+            self.prefix_tracker.record(context.prefix_fingerprint)
+            generation = GenerationRequest(
+                request_id=uuid.uuid4().hex,
+                messages=context.messages,
+                max_tokens=context.max_tokens,
+                temperature=self.settings.temperature,
+                top_p=self.settings.top_p,
+                prefix_fingerprint=context.prefix_fingerprint,
+                affinity_key=request.conversation_id or "",
+            )
+            estimated_tokens = self.quota.estimate(
+                context.prompt_tokens, context.max_tokens
+            )
+        return PreparedReview(
+            generation,
+            code=request.code,
+            cache_key=cache_key,
+            similarity_scope=scope,
+            reuse_key=(
+                similar_key
+                if self.near_duplicate_policy is NearDuplicatePolicy.REUSE
+                else None
+            ),
+            request_class=RequestClass.FOLLOWUP if followup else RequestClass.REVIEW,
+            estimated_tokens=estimated_tokens,
+            request=request,
+            quick_answer=quick_answer,
+            chunks=chunks,
+            is_code=is_code,
+            resubmission=resubmission,
+        )
+
+    def _resubmission(
+        self, request: ReviewRequest, previous: Submission
+    ) -> Resubmission | None:
+        if not self.settings.resubmission_enabled:
+            return None
+        languages = {request.language, previous.language} - {UNKNOWN_LANGUAGE}
+        if len(languages) > 1:
+            return None
+        resubmission = find_resubmission(
+            previous.code,
+            previous.review,
+            request.code,
+            max_changed_ratio=self.settings.resubmission_max_changed_ratio,
+            context_lines=self.settings.resubmission_context_lines,
+            review_chars=self.settings.resubmission_review_chars,
+        )
+        RESUBMISSIONS.inc(kind="full" if resubmission is None else "diff")
+        return resubmission
+
+    def _needs_chunks(self, code: str) -> bool:
+        return (
+            self.settings.chunking_enabled
+            and self.engine.count_tokens(code) > self.settings.chunk_threshold_tokens
+        )
+
+    def _prepare_chunks(self, request: ReviewRequest) -> tuple[list[ChunkReview], int]:
+        """
+        Builds one generation per chunk of a large submission.
+
+        Each chunk has its own bounded prompt and answer, so the cost of a
+        submission grows with its number of chunks only; the chunks get distinct
+        affinity keys, so that a router spreads them over the replicas.
+
+        Args:
+            request: The review request, with its language resolved
+
+        Returns:
+            The chunk reviews, and the tokens to charge for them
+
+        Raises:
+            ContextTooLargeError: If the submission has too many chunks
+        """
+        pieces = split_submission(
+            request.code,
+            request.language,
+            self.settings.chunk_max_tokens,
+            self.engine.count_tokens,
+        )
+        if len(pieces) > self.settings.chunk_max_chunks:
+            raise ContextTooLargeError(
+                "The submission is too large to be reviewed, even in parts.",
+                details={
+                    "chunks": len(pieces),
+                    "max_chunks": self.settings.chunk_max_chunks,
+                },
+            )
+        affinity = request.conversation_id or uuid.uuid4().hex
+        chunks = []
+        estimated_tokens = 0
+        for index, piece in enumerate(pieces, start=1):
+            # Each part is reviewed on its own, without the conversation
+            part = request.model_copy(
+                update={"code": piece.code, "language": piece.language, "history": []}
+            )
+            note = CHUNK_CONTEXT.format(
+                index=index, count=len(pieces), location=piece.location
+            )
+            context = self.context_builder.build(part, note)
+            self.prefix_tracker.record(context.prefix_fingerprint)
+            max_tokens = min(context.max_tokens, self.settings.chunk_answer_tokens)
+            generation = GenerationRequest(
+                request_id=uuid.uuid4().hex,
+                messages=context.messages,
+                max_tokens=max_tokens,
+                temperature=self.settings.temperature,
+                top_p=self.settings.top_p,
+                prefix_fingerprint=context.prefix_fingerprint,
+                affinity_key=f"{affinity}:{index}",
+            )
+            chunks.append(ChunkReview(piece.location, generation))
+            estimated_tokens += self.quota.estimate(context.prompt_tokens, max_tokens)
+        REVIEW_CHUNKS.observe(len(chunks))
+        return chunks, estimated_tokens
+
+    def admit(self, review: PreparedReview) -> Ticket | None:
+        """
+        Reserves a generation slot for a review, unless it needs none.
+
+        Answers replayed from the cache or found by static analysis do not take
+        a slot. Whether the review starts a generation or joins an identical
+        one in flight is only decided when its answer starts (see ``stream``),
+        so a review that ends up joining one gives its slot back then.
+
+        Args:
+            review: Review built by ``prepare``
+
+        Returns:
+            The admission ticket (possibly still waiting), or None
+
+        Raises:
+            QueueFullError: If no slot is free and the wait queue is full
+        """
+        if review.quick_answer is not None:
+            return None
+        if self.response_cache is not None and any(
+            key is not None and key in self.response_cache
+            for key in (review.cache_key, review.reuse_key)
+        ):
+            return None
+        return self.admission.reserve(review.request_class)
+
+    async def stream(
+        self, review: PreparedReview, ticket: Ticket | None = None
+    ) -> AsyncIterator[str | QueuePosition]:
+        """
+        Yields the answer of a review as it is produced.
+
+        Cached answers (exact, or near-duplicate with the "reuse" policy) are
+        replayed through the same stream. Identical requests arriving while a
+        generation is running attach to it instead of starting their own; fresh
+        answers are cached once the generation completes. Completed answers are
+        queued for the review history and added to the conversation memory; the
+        stream never waits on the database or on the summaries.
+
+        A review starting a generation first waits for its slot, and its queue
+        position is yielded each time it changes. A review admitted without a
+        slot whose cached answer is gone by then reserves one itself.
+
+        Args:
+            review: Review built by ``prepare``
+            ticket: Ticket returned by ``admit``; released early if the review
+                needs no generation after all, and handed over to the shared
+                generation if the review starts one (which then frees the slot
+                when it ends, whoever still follows it)
+
+        Returns:
+            Async iterator over the queue positions, then text deltas of the answer
+
+        Raises:
+            QueueFullError: If a slot has to be reserved and the queue is full
+        """
+        chunks = []
+        answer = self._answer(review, ticket)
+        try:
+            async for chunk in answer:
+                if isinstance(chunk, str):
+                    chunks.append(chunk)
+                yield chunk
+        finally:
+            await close_iterator(answer)
+        # Only reached when the answer completed (not on error or cancellation)
+        response = "".join(chunks)
+        self._record(review, response)
+        self._remember(review, response)
+
+    def _remember(self, review: PreparedReview, response: str) -> None:
+        request = review.request
+        if self.memory is None or request is None or not request.conversation_id:
+            return
+        # A resubmission is remembered by its changes, which keeps later prompts small
+        user = request.code
+        if review.resubmission is not None:
+            user = f"```diff\n{review.resubmission.diff}\n```"
+        if request.question:
+            user = f"{request.question}\n\n{user}"
+        history = [
+            {"role": turn.role, "content": turn.content} for turn in request.history
+        ]
+        submission = None
+        if review.is_code:
+            submission = Submission(request.code, request.language, response)
+        self.memory.append(request.conversation_id, user, response, history, submission)
+
+    def _record(self, review: PreparedReview, response: str) -> None:
+        request = review.request
+        if self.review_log is None or request is None:
+            return
+        self.review_log.submit(
+            ReviewRecord(
+                review_id=review.generation.request_id,
+                conversation_id=request.conversation_id or "",
+                session_id=request.session_id or "",
+                timestamp=time.time(),
+                kind=review.request_class.value,
+                language=request.language,
+                mode=request.mode or "",
+                question=request.question or "",
+                code=request.code,
+                response=response,
+            )
+        )
+
+    async def close(self) -> None:
+        """Stops the background work of the service (conversation summaries)."""
+        if self.memory is not None:
+            await self.memory.close()
+
+    def _in_flight(self, review: PreparedReview) -> bool:
+        return review.cache_key is not None and review.cache_key in self.single_flight
+
+    async def _answer(
+        self, review: PreparedReview, ticket: Ticket | None
+    ) -> AsyncIterator[str | QueuePosition]:
+        if review.quick_answer is not None:
+            QUICK_ANSWERS.inc()
+            async for chunk in replay(review.quick_answer):
+                yield chunk
+            return
+
+        # Leading or following is decided here, with no await between the last
+        # check and the start of the answer: what ``admit`` saw may be outdated
+        reserved = None
+        try:
+            cached = self._cached(review.cache_key) or self._cached(review.reuse_key)
+            if cached is None and not self._in_flight(review):
+                if ticket is None:
+                    ticket = reserved = self.admission.reserve(review.request_class)
+                async for position in self.admission.wait(ticket):
+                    yield QueuePosition(position)
+                cached = self._cached(review.cache_key) or self._cached(
+                    review.reuse_key
+                )
+            if ticket is not None and (cached is not None or self._in_flight(review)):
+                # Replaying or following: the slot goes to the next request
+                self.admission.release(ticket)
+
+            if cached is not None:
+                async for chunk in replay(cached):
+                    yield chunk
+            elif review.cache_key is None:
+                async for token in self._generate(review):
+                    yield token
+            else:
+                on_done = None
+                if ticket is not None and not ticket.released:
+                    # Leading: the flight holds the slot until its generation
+                    # ends, even if this client leaves before its followers
+                    slot = self.admission.transfer(ticket)
+                    on_done = partial(self.admission.release, slot)
+                async for token in self.single_flight.stream(
+                    review.cache_key, lambda: self._generate_and_cache(review), on_done
+                ):
+                    yield token
+        finally:
+            if reserved is not None:
+                self.admission.release(reserved)
+
+    async def _engine_stream(self, generation: GenerationRequest) -> AsyncIterator[str]:
+        # Closed early when the client disconnects or cancels: abort the engine
+        # request right away so that it frees its batch slot and KV cache
+        completed = False
+        tokens = self.engine.stream(generation)
+        try:
+            async for token in tokens:
+                yield token
+            completed = True
+        finally:
+            await close_iterator(tokens)
+            if not completed:
+                logger.debug("Aborting generation %s", generation.request_id)
+                GENERATIONS_ABORTED.inc()
+                await self.engine.abort(generation.request_id)
+
+    def _generate(self, review: PreparedReview) -> AsyncIterator[str]:
+        if review.chunks:
+            return self._chunked_stream(review)
+        return self._engine_stream(review.generation)
+
+    async def _chunked_stream(self, review: PreparedReview) -> AsyncIterator[str]:
+        """
+        Reviews the chunks of a submission concurrently, and yields the merged answer.
+
+        At most ``chunk_max_concurrency`` chunks of a submission are generated
+        at once, each on an admission slot (see ``_ChunkSlots``), so that a
+        large submission does not crowd out the others. The
+        answers are streamed in the order of the chunks, each under a heading,
+        without the paragraphs already given for an earlier chunk; later chunks
+        are buffered while earlier ones stream.
+        """
+        slots = _ChunkSlots(
+            self.admission, review.request_class, self.settings.chunk_max_concurrency
+        )
+        queues: list[asyncio.Queue[str | Exception | None]] = []
+        tasks = []
+        for chunk in review.chunks:
+            queue: asyncio.Queue[str | Exception | None] = asyncio.Queue()
+            queues.append(queue)
+            tasks.append(
+                asyncio.create_task(
+                    self._review_chunk(
+                        chunk.generation, queue, slots, review.generation.usage
+                    )
+                )
+            )
+        merger = AnswerMerger()
+        try:
+            yield CHUNKED_INTRO.format(count=len(review.chunks))
+            for chunk, queue in zip(review.chunks, queues):
+                # The heading goes with the first text: a chunk whose answer only
+                # repeats earlier ones is left out
+                heading = CHUNK_HEADING.format(location=chunk.location)
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    text = merger.feed(item)
+                    if text:
+                        yield heading + text
+                        heading = ""
+                text = merger.flush()
+                if text:
+                    yield heading + text
+        finally:
+            # Cancelling a chunk aborts its generation
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _review_chunk(
+        self,
+        generation: GenerationRequest,
+        queue: asyncio.Queue[str | Exception | None],
+        slots: _ChunkSlots,
+        usage: Usage,
+    ) -> None:
+        try:
+            ticket = await slots.acquire()
+            tokens = self._engine_stream(generation)
+            try:
+                async for token in tokens:
+                    queue.put_nowait(token)
+            finally:
+                await close_iterator(tokens)
+                slots.release(ticket)
+                # Read after the stream: a hedging router replaces the usage
+                usage.prompt_tokens += generation.usage.prompt_tokens
+                usage.completion_tokens += generation.usage.completion_tokens
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(None)
+
+    async def _generate_and_cache(self, review: PreparedReview) -> AsyncIterator[str]:
+        chunks = []
+        async for token in self._generate(review):
+            chunks.append(token)
+            yield token
+
+        # Only reached when the generation completed (not on error or cancellation)
+        if review.cache_key is None:
+            return
+        if self.response_cache is not None:
+            self.response_cache.put(review.cache_key, "".join(chunks))
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(
+                review.code, review.similarity_scope, review.cache_key
+            )
@@ -0,0 +1,473 @@
+"""
+Routing across several inference replicas.
+Each generation goes to the replica with the fewest outstanding tokens, except
+that a conversation sticks to the replica already holding its prefix in KV
+cache. Failing replicas are ejected until their health check passes again, and
+generations slow to produce their first token can be hedged on another replica.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+
+from backend.core.metrics import REGISTRY
+from backend.services.cancellation import close_iterator
+from backend.services.llm_service import (
+    EngineError,
+    GenerationRequest,
+    LLMEngine,
+    Usage,
+)
+
+logger = logging.getLogger(__name__)
+
+ROUTER_REQUESTS = REGISTRY.counter(
+    "sensai_router_requests_total",
+    "Generations sent to each upstream, by outcome",
+    ["upstream", "outcome"],
+)
+ROUTER_OUTSTANDING = REGISTRY.gauge(
+    "sensai_router_outstanding_tokens",
+    "Tokens still to be processed by each upstream (prompt plus remaining completion)",
+    ["upstream"],
+)
+ROUTER_HEALTHY = REGISTRY.gauge(
+    "sensai_router_upstream_healthy",
+    "Whether each upstream receives traffic (1) or is ejected (0)",
+    ["upstream"],
+)
+ROUTER_AFFINITY = REGISTRY.counter(
+    "sensai_router_affinity_total",
+    "Routing decisions for conversations, by result (hit, moved or new)",
+    ["result"],
+)
+ROUTER_TTFT = REGISTRY.histogram(
+    "sensai_router_ttft_seconds",
+    "Time to first token of the generations, by upstream that answered",
+    ["upstream"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+ROUTER_HEDGES = REGISTRY.counter(
+    "sensai_router_hedges_total",
+    "Hedged generations, by outcome (won, lost, or denied by the hedge budget)",
+    ["outcome"],
+)
+
+
+@dataclass(eq=False)
+class _Upstream:
+    engine: LLMEngine
+    name: str
+    healthy: bool = True
+    outstanding: int = 0
+    failures: int = 0
+
+    def add_outstanding(self, tokens: int) -> None:
+        self.outstanding += tokens
+        ROUTER_OUTSTANDING.set(self.outstanding, upstream=self.name)
+
+
+class _Attempt:
+    """One generation sent to one upstream."""
+
+    def __init__(
+        self,
+        upstream: _Upstream,
+        request: GenerationRequest,
+        root_id: str,
+        count_tokens: Callable[[str], int],
+    ) -> None:
+        self.upstream = upstream
+        self.request = request
+        self.root_id = root_id
+        self.started_at = time.monotonic()
+        self.tokens = upstream.engine.stream(request)
+        self._next: asyncio.Future[str] | None = None
+        self._prompt_tokens = sum(count_tokens(m["content"]) for m in request.messages)
+        # Prompt plus the whole completion budget, paid back as tokens arrive
+        self.outstanding = self._prompt_tokens + request.max_tokens
+        upstream.add_outstanding(self.outstanding)
+
+    def next(self) -> asyncio.Future[str]:
+        """Starts waiting for the first token."""
+        self._next = asyncio.ensure_future(self.tokens.__anext__())
+        return self._next
+
+    def on_token(self) -> None:
+        """Pays back the outstanding tokens of a received token."""
+        paid = 1 + self._prompt_tokens
+        self._prompt_tokens = 0
+        paid = min(paid, self.outstanding)
+        self.outstanding -= paid
+        self.upstream.add_outstanding(-paid)
+
+    async def close(self, abort: bool) -> None:
+        """Stops the stream (aborting the upstream request if asked)."""
+        if self._next is not None and not self._next.done():
+            self._next.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await self._next
+        await close_iterator(self.tokens)
+        if abort:
+            await self.upstream.engine.abort(self.request.request_id)
+        self.upstream.add_outstanding(-self.outstanding)
+        self.outstanding = 0
+
+
+class TtftTracker:
+    """
+    Rolling window of recent times to first token.
+
+    Args:
+        window: Number of recent observations kept
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self._values: deque[float] = deque(maxlen=window)
+        self._sorted: list[float] | None = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def observe(self, seconds: float) -> None:
+        """Records a time to first token."""
+        self._values.append(seconds)
+        self._sorted = None
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Returns a percentile of the recent times to first token.
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            The percentile, in seconds (0 without observations)
+        """
+        if not self._values:
+            return 0.0
+        if self._sorted is None:
+            self._sorted = sorted(self._values)
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * percentile / 100))
+        return self._sorted[index]
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests to a fraction of all requests.
+
+    Every request earns ``ratio`` credit, up to ``burst``; a hedge spends one.
+    Under overload most requests are slow, the credit runs out, and hedging
+    stops instead of doubling the load.
+
+    Args:
+        ratio: Maximum fraction of requests that may be hedged
+        burst: Hedges allowed in a row after a quiet period
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0) -> None:
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = 0.0
+
+    def credit(self) -> None:
+        """Earns the credit of one request."""
+        self._credit = min(self.burst, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Spends the credit of one hedge, if available."""
+        if self._credit < 1.0:
+            return False
+        self._credit -= 1.0
+        return True
+
+
+def affinity_key(request: GenerationRequest) -> str:
+    """
+    Identifies the conversation of a generation.
+
+    Uses the explicit key if any, otherwise the system prompt and first user
+    message, which every turn of a conversation shares as its prompt prefix.
+
+    Args:
+        request: The generation
+
+    Returns:
+        Affinity key of the conversation
+    """
+    if request.affinity_key:
+        return request.affinity_key
+    prefix = "\x00".join(message["content"] for message in request.messages[:2])
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:32]
+
+
+class UpstreamRouter(LLMEngine):
+    """
+    Load-balances generations across several engines.
+
+    Args:
+        upstreams: Engines of the replicas (usually OpenAI-compatible)
+        affinity_slack_tokens: A pinned conversation stays on its replica unless
+            it has that many more outstanding tokens than the least loaded one
+        health_interval_s: Period of the health checks
+        max_failures: Consecutive failed generations that eject a replica
+        max_affinities: Conversations remembered (least recently used dropped)
+        hedge_enabled: Send a duplicate to another replica when the first token
+            is late, keep the first stream to answer and cancel the other
+        hedge_percentile: Percentile of recent TTFT after which a request is hedged
+        hedge_min_delay_ms: Never hedge earlier than this
+        ttft_slo_ms: Time-to-first-token objective; never hedge later than this
+        hedge_max_ratio: Maximum fraction of requests that may be hedged
+        hedge_min_samples: TTFT observations needed before hedging starts
+    """
+
+    name = "router"
+
+    def __init__(
+        self,
+        upstreams: list[LLMEngine],
+        affinity_slack_tokens: int = 8192,
+        health_interval_s: float = 5.0,
+        max_failures: int = 3,
+        max_affinities: int = 100_000,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay_ms: float = 100.0,
+        ttft_slo_ms: float = 2000.0,
+        hedge_max_ratio: float = 0.05,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        if not upstreams:
+            raise ValueError("UpstreamRouter needs at least one upstream")
+        self.upstreams = [
+            _Upstream(engine, getattr(engine, "base_url", f"{engine.name}-{index}"))
+            for index, engine in enumerate(upstreams)
+        ]
+        self.affinity_slack_tokens = affinity_slack_tokens
+        self.health_interval_s = health_interval_s
+        self.max_failures = max_failures
+        self.max_affinities = max_affinities
+        self.hedge_enabled = hedge_enabled and len(upstreams) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay_s = hedge_min_delay_ms / 1000
+        self.ttft_slo_s = ttft_slo_ms / 1000
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = HedgeBudget(hedge_max_ratio)
+        self.ttft = TtftTracker()
+        self._affinities: OrderedDict[str, _Upstream] = OrderedDict()
+        self._running: dict[str, list[_Attempt]] = {}
+        self._health_task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        await asyncio.gather(*(upstream.engine.start() for upstream in self.upstreams))
+        await self._check_health()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await asyncio.gather(*(upstream.engine.close() for upstream in self.upstreams))
+
+    async def health(self) -> bool:
+        return any(upstream.healthy for upstream in self.upstreams)
+
+    async def _check_health(self) -> None:
+        results = await asyncio.gather(
+            *(upstream.engine.health() for upstream in self.upstreams),
+            return_exceptions=True,
+        )
+        for upstream, result in zip(self.upstreams, results):
+            healthy = result is True
+            if healthy != upstream.healthy:
+                logger.warning(
+                    "Upstream %s is %s", upstream.name, "back" if healthy else "ejected"
+                )
+            upstream.healthy = healthy
+            if healthy:
+                upstream.failures = 0
+            ROUTER_HEALTHY.set(int(healthy), upstream=upstream.name)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval_s)
+            await self._check_health()
+
+    def _pick(
+        self, key: str, exclude: set[_Upstream], pin: bool = True
+    ) -> _Upstream | None:
+        candidates = [u for u in self.upstreams if u.healthy and u not in exclude]
+        if not candidates:
+            return None
+        least_loaded = min(candidates, key=lambda upstream: upstream.outstanding)
+        if not pin:
+            return least_loaded
+
+        pinned = self._affinities.get(key)
+        if (
+            pinned in candidates
+            and pinned is not None
+            and pinned.outstanding
+            <= least_loaded.outstanding + self.affinity_slack_tokens
+        ):
+            self._affinities.move_to_end(key)
+            ROUTER_AFFINITY.inc(result="hit")
+            return pinned
+        # A conversation moves when its replica is ejected or overloaded
+        ROUTER_AFFINITY.inc(result="new" if pinned is None else "moved")
+
+        self._affinities[key] = least_loaded
+        self._affinities.move_to_end(key)
+        while len(self._affinities) > self.max_affinities:
+            self._affinities.popitem(last=False)
+        return least_loaded
+
+    def _record_failure(self, upstream: _Upstream) -> None:
+        upstream.failures += 1
+        if upstream.healthy and upstream.failures >= self.max_failures:
+            logger.warning(
+                "Upstream %s is ejected after %d failures",
+                upstream.name,
+                upstream.failures,
+            )
+            upstream.healthy = False
+            ROUTER_HEALTHY.set(0, upstream=upstream.name)
+
+    def _hedge_delay(self) -> float | None:
+        if not self.hedge_enabled or len(self.ttft) < self.hedge_min_samples:
+            return None
+        delay = self.ttft.percentile(self.hedge_percentile)
+        return min(max(delay, self.hedge_min_delay_s), self.ttft_slo_s)
+
+    def _open(
+        self,
+        key: str,
+        request: GenerationRequest,
+        exclude: set[_Upstream],
+        hedge: bool = False,
+    ) -> _Attempt | None:
+        upstream = self._pick(key, exclude, pin=not hedge)
+        if upstream is None:
+            return None
+        exclude.add(upstream)
+        root_id = request.request_id
+        if hedge:
+            # Own id and usage, so that the loser can be aborted and is not billed
+            request = dataclasses.replace(
+                request, request_id=f"{request.request_id}-hedge", usage=Usage()
+            )
+        attempt = _Attempt(upstream, request, root_id, self.count_tokens)
+        self._running.setdefault(root_id, []).append(attempt)
+        return attempt
+
+    async def _first_token(
+        self, key: str, request: GenerationRequest, tried: set[_Upstream]
+    ) -> tuple[_Attempt, str | None] | None:
+        """Starts the generation, hedging it if needed; returns the winning attempt."""
+        primary = self._open(key, request, tried)
+        if primary is None:
+            raise EngineError("No healthy inference upstream available")
+        attempts = {primary.next(): primary}
+        hedge_delay = self._hedge_delay()
+        try:
+            while attempts:
+                timeout = None
+                if hedge_delay is not None:
+                    timeout = max(
+                        0.0, primary.started_at + hedge_delay - time.monotonic()
+                    )
+                done, _ = await asyncio.wait(
+                    attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Only one hedge per request
+                    hedge_delay = None
+                    if not self.hedge_budget.try_spend():
+                        ROUTER_HEDGES.inc(outcome="denied")
+                        continue
+                    hedge = self._open(key, request, tried, hedge=True)
+                    if hedge is not None:
+                        logger.debug(
+                            "Hedging %s on %s", request.request_id, hedge.upstream.name
+                        )
+                        attempts[hedge.next()] = hedge
+                    continue
+
+                for task in done:
+                    attempt = attempts.pop(task)
+                    error = task.exception()
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        self._won(attempt, primary, request)
+                        return attempt, None if error is not None else task.result()
+                    ROUTER_REQUESTS.inc(
+                        upstream=attempt.upstream.name, outcome="failed"
+                    )
+                    self._record_failure(attempt.upstream)
+                    logger.warning(
+                        "Upstream %s failed (%s)", attempt.upstream.name, error
+                    )
+                    await self._close(attempt)
+            return None
+        finally:
+            # Cancels the losers (or every attempt if the client went away)
+            for attempt in attempts.values():
+                await self._close(attempt, abort=True)
+
+    def _won(
+        self, winner: _Attempt, primary: _Attempt, request: GenerationRequest
+    ) -> None:
+        ttft = time.monotonic() - winner.started_at
+        self.ttft.observe(ttft)
+        ROUTER_TTFT.observe(ttft, upstream=winner.upstream.name)
+        if winner is not primary:
+            ROUTER_HEDGES.inc(outcome="won")
+            # The client is billed for the hedge's tokens
+            request.usage = winner.request.usage
+        elif len(self._running.get(request.request_id, ())) > 1:
+            ROUTER_HEDGES.inc(outcome="lost")
+
+    async def _close(self, attempt: _Attempt, abort: bool = False) -> None:
+        await attempt.close(abort)
+        running = self._running.get(attempt.root_id)
+        if running is not None:
+            running.remove(attempt)
+            if not running:
+                del self._running[attempt.root_id]
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        key = affinity_key(request)
+        self.hedge_budget.credit()
+        tried: set[_Upstream] = set()
+        winner = None
+        while winner is None:
+            # Nothing was sent to the client yet: fail over to another replica
+            winner = await self._first_token(key, request, tried)
+        attempt, first = winner
+
+        completed = False
+        try:
+            if first is not None:
+                attempt.on_token()
+                yield first
+                async for token in attempt.tokens:
+                    attempt.on_token()
+                    yield token
+            completed = True
+        except Exception:
+            ROUTER_REQUESTS.inc(upstream=attempt.upstream.name, outcome="failed")
+            self._record_failure(attempt.upstream)
+            raise
+        finally:
+            await self._close(attempt, abort=not completed)
+
+        attempt.upstream.failures = 0
+        ROUTER_REQUESTS.inc(upstream=attempt.upstream.name, outcome="completed")
+
+    async def abort(self, request_id: str) -> None:
+        for attempt in list(self._running.get(request_id, ())):
+            await attempt.upstream.engine.abort(attempt.request.request_id)
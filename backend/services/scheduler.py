@@ -0,0 +1,180 @@
+"""
+Continuous micro-batching in front of the inference engine.
+Requests are collected over a short window, up to a maximum batch size or
+token budget, and submitted to the engine together so that they join the same
+engine step instead of trickling in one by one.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import cast
+
+from backend.core.metrics import REGISTRY
+from backend.services.llm_service import GenerationRequest, LLMEngine
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "sensai_scheduler_queue_depth",
+    "Requests waiting to be submitted to the inference engine",
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "sensai_scheduler_batch_size",
+    "Number of requests submitted to the engine together",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+BATCH_TOKENS = REGISTRY.histogram(
+    "sensai_scheduler_batch_prompt_tokens",
+    "Prompt tokens submitted to the engine together",
+    buckets=(512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "sensai_scheduler_queue_wait_seconds",
+    "Time spent by requests in the scheduler queue",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# Marks the end of a request's token stream
+_END = object()
+
+
+@dataclass
+class _Pending:
+    request: GenerationRequest
+    prompt_tokens: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    tokens: asyncio.Queue[object] = field(default_factory=asyncio.Queue)
+    task: asyncio.Task[None] | None = None
+    cancelled: bool = False
+
+
+class MicroBatchScheduler(LLMEngine):
+    """
+    Engine wrapper that submits requests in micro-batches.
+
+    It behaves like the wrapped engine: ``stream`` yields the same tokens, and
+    closing the stream aborts the request, whether it is still queued or
+    already running.
+
+    Args:
+        engine: Engine receiving the batches (in-process or HTTP)
+        window_ms: How long to wait for more requests after the first one
+        max_batch_size: Maximum number of requests per batch
+        max_batch_tokens: Maximum prompt tokens per batch
+    """
+
+    def __init__(
+        self,
+        engine: LLMEngine,
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 32768,
+    ) -> None:
+        self.engine = engine
+        self.name = engine.name
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self._queue: deque[_Pending] = deque()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        await self.engine.start()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        await self.engine.close()
+
+    async def health(self) -> bool:
+        return await self.engine.health()
+
+    def count_tokens(self, text: str) -> int:
+        return self.engine.count_tokens(text)
+
+    async def abort(self, request_id: str) -> None:
+        await self.engine.abort(request_id)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting to be submitted."""
+        return len(self._queue)
+
+    def _take_batch(self) -> list[_Pending]:
+        batch: list[_Pending] = []
+        tokens = 0
+        while self._queue and len(batch) < self.max_batch_size:
+            pending = self._queue[0]
+            if pending.cancelled:
+                self._queue.popleft()
+                continue
+            # A request larger than the budget still goes out, alone
+            if batch and tokens + pending.prompt_tokens > self.max_batch_tokens:
+                break
+            batch.append(self._queue.popleft())
+            tokens += pending.prompt_tokens
+        QUEUE_DEPTH.set(len(self._queue))
+        return batch
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Collect more requests for a short window, unless the batch is full
+            if self.window and len(self._queue) < self.max_batch_size:
+                await asyncio.sleep(self.window)
+
+            batch = self._take_batch()
+            if batch:
+                self._submit(batch)
+
+    def _submit(self, batch: list[_Pending]) -> None:
+        now = time.monotonic()
+        BATCH_SIZE.observe(len(batch))
+        BATCH_TOKENS.observe(sum(pending.prompt_tokens for pending in batch))
+        # Every request of the batch starts in the same event loop iteration,
+        # so the engine schedules them in the same step
+        for pending in batch:
+            QUEUE_WAIT.observe(now - pending.enqueued_at)
+            pending.task = asyncio.create_task(self._pump(pending))
+
+    async def _pump(self, pending: _Pending) -> None:
+        try:
+            async for token in self.engine.stream(pending.request):
+                pending.tokens.put_nowait(token)
+        except Exception as e:
+            pending.tokens.put_nowait(e)
+        finally:
+            pending.tokens.put_nowait(_END)
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        prompt_tokens = sum(self.count_tokens(m["content"]) for m in request.messages)
+        pending = _Pending(request, prompt_tokens)
+        self._queue.append(pending)
+        QUEUE_DEPTH.set(len(self._queue))
+        self._wakeup.set()
+
+        try:
+            while True:
+                item = await pending.tokens.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield cast(str, item)
+        finally:
+            pending.cancelled = True
+            if pending.task is None:
+                # Still queued: drop it so it never reaches the engine
+                self._queue.remove(pending)
+                QUEUE_DEPTH.set(len(self._queue))
+            elif not pending.task.done():
+                pending.task.cancel()
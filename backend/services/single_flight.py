@@ -0,0 +1,146 @@
+"""
+In-flight request coalescing (single-flight).
+Concurrent requests with the same key share one generation: the first request
+starts it and every request, including late joiners, receives the full token
+stream from the beginning.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Callable
+
+from backend.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_REQUESTS = REGISTRY.counter(
+    "sensai_single_flight_requests_total",
+    "Requests entering the single-flight layer, by role (leader starts a generation)",
+    ["role"],
+)
+SINGLE_FLIGHT_ACTIVE = REGISTRY.gauge(
+    "sensai_single_flight_active",
+    "Generations currently shared through the single-flight layer",
+)
+
+
+class FlightCancelledError(RuntimeError):
+    """Raised to the subscribers of a generation cancelled before its end."""
+
+
+class _Flight:
+    """One shared generation and the tokens it produced so far."""
+
+    def __init__(self) -> None:
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task[None] | None = None
+        self._update = asyncio.Event()
+
+    def publish(self, chunk: str | None = None) -> None:
+        """Appends a chunk (if any) and wakes up every subscriber."""
+        if chunk is not None:
+            self.chunks.append(chunk)
+        update, self._update = self._update, asyncio.Event()
+        update.set()
+
+    async def wait(self) -> None:
+        """Waits for the next chunk or the end of the generation."""
+        await self._update.wait()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical generations."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    async def _run(self, key: str, flight: _Flight, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                flight.publish(chunk)
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.publish()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            SINGLE_FLIGHT_ACTIVE.set(len(self._flights))
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]],
+        on_done: Callable[[], None] | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streams the generation for a key, starting it if none is in flight.
+
+        The generation runs in its own task so that it survives the disconnect
+        of the request that started it; it is cancelled once every subscriber
+        has left.
+
+        Args:
+            key: Identity of the generation (e.g. the response cache key)
+            factory: Starts the generation; only called by the first request
+            on_done: Called once the generation ends, however it ends (e.g. to
+                free the resources it holds); right away if one was in flight
+
+        Returns:
+            Async iterator over every chunk of the generation, from the start
+
+        Raises:
+            FlightCancelledError: If the generation is cancelled (on shutdown)
+                while this request still follows it
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, factory()))
+            if on_done is not None:
+                # A done callback also runs for a task cancelled before it started
+                flight.task.add_done_callback(lambda _: on_done())
+            SINGLE_FLIGHT_REQUESTS.inc(role="leader")
+            SINGLE_FLIGHT_ACTIVE.set(len(self._flights))
+        else:
+            SINGLE_FLIGHT_REQUESTS.inc(role="follower")
+            if on_done is not None:
+                on_done()
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                # Late joiners first catch up on the chunks already emitted
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if isinstance(flight.error, asyncio.CancelledError):
+                        # The answer is incomplete: it must not pass for one
+                        raise FlightCancelledError("The generation was cancelled")
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                logger.debug("Cancelling generation %s: no subscriber left", key[:12])
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                    SINGLE_FLIGHT_ACTIVE.set(len(self._flights))
@@ -0,0 +1,46 @@
+"""
+Token counting helpers.
+Used to budget prompts against the model's context window when no real
+tokenizer is available (e.g. with the fake engine).
+"""
+
+import math
+from collections.abc import Callable
+
+# Mistral's tokenizer averages ~3.5 characters per token on prose and closer to
+# 3 on code; under-estimating would let oversize prompts through, so round down.
+CHARS_PER_TOKEN = 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Conservative (rounded up) token estimate
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def model_token_counter(model: str) -> Callable[[str], int]:
+    """
+    Loads the tokenizer of a model, for processes without the engine.
+
+    Args:
+        model: Model name or path, as given to vLLM
+
+    Returns:
+        A token counter agreeing with the engine's
+    """
+    # Imported lazily, like the engine: the fake engine runs without vLLM
+    from vllm.transformers_utils.tokenizer import get_tokenizer
+
+    tokenizer = get_tokenizer(model)
+
+    def count_tokens(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return count_tokens
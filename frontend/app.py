@@ -1,9 +1,11 @@
+import uuid
+
 import streamlit as st
 from htbuilder import div
 from htbuilder.units import rem
 from htbuilder import styles
-from services.api_client import review_code, get_response_text
-from utils.helpers import format_response
+from services.api_client import cancel_conversation, review_code, stream_response_text
+from utils.helpers import format_response, get_session_id
 from datetime import datetime
 
 st.set_page_config(page_title="sensAI", page_icon="🧘‍♂️")
@@ -26,42 +28,25 @@ SUGGESTIONS = {
     ),
 }
 
-INSTRUCTIONS = """
-You are a helpful AI coding sensei. You help students learn programming through Socratic questioning.
-
-Key principles:
-- Ask guiding questions rather than giving direct answers
-- Help students discover solutions themselves
-- Explain concepts clearly with examples
-- Identify what's wrong and why, with clear reasoning
-- Encourage good coding practices
-- Be encouraging and supportive
-- Adapt explanations to student level
-
-Remember: Your goal is to help students become better programmers, not just fix their code.
-"""
-
 # -----------------------------------------------------------------------------
 # Helper Functions
 
-def history_to_text(chat_history):
-    """Convert chat history into a string."""
-    return "\n".join(f"[{h['role']}]: {h['content']}" for h in chat_history)
 
-def build_prompt(question, recent_messages=None):
-    """Build a prompt string with context."""
-    prompt_parts = [f"<instructions>\n{INSTRUCTIONS}\n</instructions>"]
-    
-    if recent_messages:
-        prompt_parts.append(f"<recent_messages>\n{recent_messages}\n</recent_messages>")
-    
-    prompt_parts.append(f"<question>\n{question}\n</question>")
-    
-    return "\n".join(prompt_parts)
+def recent_history(messages, length=HISTORY_LENGTH):
+    """Return the last turns of the conversation as role/content pairs."""
+    return [{"role": m["role"], "content": m["content"]} for m in messages[-length:]]
+
 
 # -----------------------------------------------------------------------------
 # UI
 
+# Identifies this browser session to the backend's rate limiter and history
+get_session_id()
+
+# Identifies the current conversation, so that Restart can stop its answers
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = uuid.uuid4().hex
+
 st.html(div(style=styles(font_size=rem(4), line_height=1))["❉"])
 
 title_row = st.container(horizontal=True, vertical_alignment="bottom")
@@ -111,10 +96,13 @@ if not user_message:
 
 with title_row:
     def clear_conversation():
+        # Stop any answer still being generated for the abandoned conversation
+        cancel_conversation(st.session_state.conversation_id, API_URL)
+        st.session_state.conversation_id = uuid.uuid4().hex
         st.session_state.messages = []
         st.session_state.initial_question = None
         st.session_state.selected_suggestion = None
-    
+
     st.button(
         "Restart",
         icon=":material/refresh:",
@@ -133,37 +121,86 @@ if user_message:
     # Display user message
     with st.chat_message("user"):
         st.markdown(user_message)
-    
+
     # Display assistant response
     with st.chat_message("assistant"):
         with st.container():
-            # Get recent history
-            recent_messages = None
-            if len(st.session_state.messages) >= 2:
-                recent_messages = history_to_text(st.session_state.messages[-HISTORY_LENGTH:])
-            
-            with st.spinner("Analyzing your code..."):
-                # Build prompt
-                full_prompt = build_prompt(user_message, recent_messages)
-                
-                # Get response from API
-                try:
-                    response = review_code(user_message, "python", None, API_URL)
-                    
-                    if response and response.status_code == 200:
-                        response_text = get_response_text(response)
-                        formatted_text = format_response(response_text)
-                        
-                        st.markdown(formatted_text)
-                        
-                        # Add to history
-                        st.session_state.messages.append({"role": "user", "content": user_message})
-                        st.session_state.messages.append({"role": "assistant", "content": formatted_text})
-                    else:
-                        st.error("❌ Failed to get response from API. Make sure the backend is running.")
-                        st.session_state.messages.append({"role": "user", "content": user_message})
-                        st.session_state.messages.append({"role": "assistant", "content": "I apologize, but I'm having trouble connecting to the backend service. Please make sure the backend is running."})
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
-                    st.session_state.messages.append({"role": "user", "content": user_message})
-                    st.session_state.messages.append({"role": "assistant", "content": f"I encountered an error: {str(e)}. Please check the backend connection."})
\ No newline at end of file
+            # Recent turns are sent as structured history; the backend fits them
+            # into the model's context window, dropping the oldest first
+            history = recent_history(st.session_state.messages)
+
+            # Get response from API
+            try:
+                with st.spinner("Analyzing your code..."):
+                    response = review_code(
+                        user_message,
+                        "auto",
+                        None,
+                        API_URL,
+                        history=history,
+                        session_id=st.session_state.session_id,
+                        conversation_id=st.session_state.conversation_id,
+                    )
+
+                if response and response.status_code == 200:
+                    # Show the queue position while the backend is saturated
+                    queue_status = st.empty()
+
+                    def show_queue_position(position):
+                        queue_status.info(
+                            f"⏳ The sensei is busy, you are number {position} "
+                            "in the queue..."
+                        )
+
+                    def answer_chunks():
+                        chunks = stream_response_text(
+                            response, on_queue=show_queue_position
+                        )
+                        for index, chunk in enumerate(chunks):
+                            if index == 0:
+                                queue_status.empty()
+                            yield chunk
+
+                    # Render tokens as they arrive instead of waiting for the answer
+                    response_text = st.write_stream(answer_chunks())
+                    formatted_text = format_response(response_text)
+
+                    # Add to history
+                    st.session_state.messages.append(
+                        {"role": "user", "content": user_message}
+                    )
+                    st.session_state.messages.append(
+                        {"role": "assistant", "content": formatted_text}
+                    )
+                else:
+                    st.error(
+                        "❌ Failed to get response from API. "
+                        "Make sure the backend is running."
+                    )
+                    st.session_state.messages.append(
+                        {"role": "user", "content": user_message}
+                    )
+                    st.session_state.messages.append(
+                        {
+                            "role": "assistant",
+                            "content": (
+                                "I apologize, but I'm having trouble connecting to "
+                                "the backend service. Please make sure the backend "
+                                "is running."
+                            ),
+                        }
+                    )
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
+                st.session_state.messages.append(
+                    {"role": "user", "content": user_message}
+                )
+                st.session_state.messages.append(
+                    {
+                        "role": "assistant",
+                        "content": (
+                            f"I encountered an error: {str(e)}. "
+                            "Please check the backend connection."
+                        ),
+                    }
+                )
@@ -1,6 +1,12 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import pandas as pd
+from services.api_client import get_stats, list_history
+from utils.helpers import get_session_id
+
+API_URL = "http://localhost:8000"
+RECENT_REVIEWS = 5
+WINDOWS = {"Last 7 days": 7, "Last 30 days": 30, "All time": None}
 
 st.set_page_config(
     page_title="Dashboard - sensAI",
@@ -30,56 +36,74 @@ st.markdown("""
 
 st.markdown('<div class="dashboard-header"><h1>📊 Dashboard</h1><p>Your coding journey insights</p></div>', unsafe_allow_html=True)
 
-# Initialize session state
-if "responses" not in st.session_state:
-    st.session_state.responses = []
+# Time window and scope; the figures come precomputed from the backend
+col1, col2 = st.columns([1, 1])
+with col1:
+    window = st.selectbox("📅 Period", options=list(WINDOWS), index=1)
+with col2:
+    whole_class = st.toggle(
+        "👩‍🏫 Whole class", value=False, help="Statistics of every student"
+    )
+
+session_id = None if whole_class else get_session_id()
+stats = get_stats(API_URL, session_id=session_id, days=WINDOWS[window])
+totals = stats["totals"] if stats else {"total": 0, "reviews": 0, "avg_code_length": 0}
+languages = stats["languages"] if stats else []
 
 # Stats Overview
 col1, col2, col3, col4 = st.columns(4)
 
-total_reviews = len(st.session_state.responses)
-languages_used = len(set([r.get('language', 'unknown') for r in st.session_state.responses]))
-unique_sessions = len(st.session_state.responses)
-avg_length = sum([len(r.get('code', '')) for r in st.session_state.responses]) / max(total_reviews, 1)
-
 with col1:
-    st.metric("Total Reviews", total_reviews, "📈")
+    st.metric("Total Reviews", totals["total"], "📈")
 with col2:
-    st.metric("Languages Used", languages_used, "🌐")
+    st.metric("Languages Used", len(languages), "🌐")
 with col3:
-    st.metric("Unique Sessions", unique_sessions, "🔥")
+    st.metric("Conversations", totals["reviews"], "🔥")
 with col4:
-    st.metric("Avg Code Length", f"{avg_length:.0f} chars", "📏")
+    st.metric("Avg Code Length", f"{totals['avg_code_length']:.0f} chars", "📏")
+
+if stats and stats.get("active_sessions") is not None:
+    st.caption(
+        f"👥 {stats['active_sessions']} active student session(s) in this period"
+    )
 
 # Language Distribution
-if st.session_state.responses:
+if totals["total"]:
     st.markdown("---")
     st.subheader("📊 Language Distribution")
-    
-    language_dist = {}
-    for review in st.session_state.responses:
-        lang = review.get('language', 'unknown')
-        language_dist[lang] = language_dist.get(lang, 0) + 1
-    
-    df_langs = pd.DataFrame(list(language_dist.items()), columns=['Language', 'Count'])
-    
+
+    df_langs = pd.DataFrame(
+        [(entry["language"], entry["total"]) for entry in languages],
+        columns=["Language", "Count"],
+    )
+
     col1, col2 = st.columns([2, 1])
     with col1:
         st.bar_chart(df_langs.set_index('Language'))
     with col2:
         st.dataframe(df_langs, use_container_width=True)
+
+    st.subheader("📈 Daily Activity")
+    df_daily = pd.DataFrame(
+        [(entry["day"], entry["total"]) for entry in stats["daily"]],
+        columns=["Day", "Reviews"],
+    )
+    st.line_chart(df_daily.set_index("Day"))
 else:
     st.info("📊 Start reviewing code to see your dashboard analytics!")
 
 # Recent Activity
-if st.session_state.responses:
+page = list_history(API_URL, session_id=get_session_id(), limit=RECENT_REVIEWS)
+recent = page["items"] if page else []
+if recent:
     st.markdown("---")
     st.subheader("🎯 Recent Activity")
-    
-    for idx, review in enumerate(reversed(st.session_state.responses[-5:])):
-        with st.expander(f"{review['language']} - {review.get('timestamp', 'N/A')[:10]}"):
+
+    for review in recent:
+        day = datetime.fromtimestamp(review["timestamp"]).strftime("%Y-%m-%d")
+        with st.expander(f"{review['language']} - {day}"):
             col1, col2 = st.columns([3, 1])
             with col1:
-                st.code(review['code'], language=review['language'])
+                st.code(review["code_preview"], language=review["language"])
             with col2:
-                st.metric("Code Length", f"{len(review['code'])} chars")
+                st.metric("Code Length", f"{review['code_length']} chars")
@@ -1,5 +1,11 @@
 import streamlit as st
 from datetime import datetime
+from services.api_client import get_review, list_history, search_history
+from utils.helpers import get_session_id
+
+API_URL = "http://localhost:8000"
+PAGE_SIZE = 20
+MAX_CACHED_PAGES = 50
 
 st.set_page_config(
     page_title="History - sensAI",
@@ -30,15 +36,14 @@ st.markdown("""
 
 st.markdown('<div class="history-header"><h1>📜 History</h1><p>Your previous code reviews</p></div>', unsafe_allow_html=True)
 
-# Initialize session state
-if "responses" not in st.session_state:
-    st.session_state.responses = []
-
 # Search and Filter
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    search_term = st.text_input("🔍 Search history", placeholder="Search by language, question, or code...")
+    search_term = st.text_input(
+        "🔍 Search history",
+        placeholder="Search code, questions and answers (e.g. get_user, parseArgs)...",
+    )
 
 with col2:
     languages_filter = st.multiselect(
@@ -47,61 +52,121 @@ with col2:
         default=[]
     )
 
-# History Items
-filtered_responses = st.session_state.responses
+only_mine = st.toggle("Only my reviews", value=True)
+
+# Pages already fetched, by filters and page token, and reviews already opened
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = {}
+if "review_details" not in st.session_state:
+    st.session_state.review_details = {}
+
+filters = (search_term.strip(), tuple(languages_filter), only_mine)
+# Tokens of the pages walked through so far (cursor, or offset when searching);
+# changing a filter starts over from the first page
+if st.session_state.get("history_filters") != filters:
+    st.session_state.history_filters = filters
+    st.session_state.history_tokens = [None]
+
+
+def fetch_page(token):
+    """Return a page of summaries, from the client-side cache when possible."""
+    key = (filters, token)
+    cache = st.session_state.history_pages
+    if key not in cache:
+        params = dict(
+            session_id=get_session_id() if only_mine else None,
+            languages=languages_filter,
+            limit=PAGE_SIZE,
+        )
+        if filters[0]:
+            page = search_history(filters[0], API_URL, offset=token or 0, **params)
+        else:
+            page = list_history(API_URL, cursor=token, **params)
+        if page is None:
+            return None
+        if len(cache) >= MAX_CACHED_PAGES:
+            cache.pop(next(iter(cache)))
+        cache[key] = page
+    return cache[key]
+
+
+def fetch_review(item_id):
+    """Return a review in full; reviews never change, so they are cached for good."""
+    details = st.session_state.review_details
+    if item_id not in details:
+        review = get_review(item_id, API_URL)
+        if review is None:
+            return None
+        details[item_id] = review
+    return details[item_id]
+
 
-# Apply language filter
-if languages_filter:
-    filtered_responses = [r for r in filtered_responses if r.get('language') in languages_filter]
+def refresh():
+    st.session_state.history_pages = {}
+    st.session_state.history_tokens = [None]
 
-# Apply search filter
-if search_term:
-    search_term = search_term.lower()
-    filtered_responses = [
-        r for r in filtered_responses
-        if search_term in r.get('code', '').lower()
-        or search_term in r.get('question', '').lower()
-        or search_term in r.get('language', '').lower()
-    ]
+
+page = fetch_page(st.session_state.history_tokens[-1])
+summaries = page["items"] if page else []
+next_token = page.get("next_cursor", page.get("next_offset")) if page else None
 
 # Display history
-if filtered_responses:
-    st.markdown(f"### Found {len(filtered_responses)} review(s)")
-    
-    for idx, review in enumerate(reversed(filtered_responses)):
+if summaries:
+    page_number = len(st.session_state.history_tokens)
+    st.markdown(f"### Page {page_number} — {len(summaries)} review(s)")
+
+    for review in summaries:
         with st.container():
             st.markdown('<div class="history-item">', unsafe_allow_html=True)
-            
+
             col1, col2 = st.columns([3, 1])
-            
+
             with col1:
-                st.markdown(f"#### Review #{len(filtered_responses) - idx} - {review['language'].upper()}")
+                st.markdown(
+                    f"#### Review #{review['id']} - {review['language'].upper()}"
+                )
                 if review.get('question'):
                     st.info(f"💡 **Question:** {review['question']}")
-            
+
             with col2:
                 if review.get('timestamp'):
-                    try:
-                        dt = datetime.fromisoformat(review['timestamp'])
-                        st.caption(f"📅 {dt.strftime('%Y-%m-%d %H:%M')}")
-                    except:
-                        pass
-            
-            # Code preview
-            st.code(review['code'], language=review['language'])
-            
-            # Response
-            with st.expander("🧘‍♂️ View Sensei's Response"):
-                st.markdown(review['response'])
-            
+                    dt = datetime.fromtimestamp(review["timestamp"])
+                    st.caption(f"📅 {dt.strftime('%Y-%m-%d %H:%M')}")
+
+            # The full code and answer are only fetched once the review is opened
+            if st.toggle(
+                "🧘‍♂️ View Sensei's Response", key=f"open_review_{review['id']}"
+            ):
+                details = fetch_review(review["id"])
+                if details:
+                    st.code(details["code"], language=details["language"])
+                    st.markdown(details["response"])
+            else:
+                preview = review["code_preview"]
+                if review["code_length"] > len(preview):
+                    preview += "\n…"
+                st.code(preview, language=review["language"])
+
             st.markdown('</div>', unsafe_allow_html=True)
             st.markdown("---")
-            
-elif st.session_state.responses:
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("← Newer", disabled=page_number == 1, use_container_width=True):
+            st.session_state.history_tokens.pop()
+            st.rerun()
+    with col2:
+        st.button("🔄 Refresh", on_click=refresh, use_container_width=True)
+    with col3:
+        if st.button("Older →", disabled=next_token is None, use_container_width=True):
+            st.session_state.history_tokens.append(next_token)
+            st.rerun()
+
+elif search_term.strip() or languages_filter:
     st.warning("🔍 No reviews match your search criteria")
 else:
     st.info("📚 No history yet. Start reviewing code to build your history!")
-    
+
     # Sample code suggestions
     st.markdown("### 💡 Get Started")
     st.code("""
@@ -1,22 +1,130 @@
+import os
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connection pool and retry tuning, overridable from the environment
+HTTP_POOL_SIZE = int(os.getenv("SENSAI_HTTP_POOL_SIZE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("SENSAI_HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("SENSAI_HTTP_BACKOFF_FACTOR", "0.3"))
+HTTP_TIMEOUT = float(os.getenv("SENSAI_HTTP_TIMEOUT", "60"))
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class StreamError(Exception):
+    """Raised when the backend reports an error in the middle of a stream."""
+
+
+@st.cache_resource
+def get_http_session(
+    pool_size=HTTP_POOL_SIZE,
+    max_retries=HTTP_MAX_RETRIES,
+    backoff_factor=HTTP_BACKOFF_FACTOR,
+):
+    """Process-wide HTTP session shared by every Streamlit rerun and user.
+
+    Connections to the backend are pooled and kept alive, so reruns do not pay
+    a TCP handshake per request. Failed connection attempts are retried with
+    exponential backoff for every method (nothing was sent yet); read errors
+    and 502/503/504 answers are only retried for idempotent methods.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_async_client(pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES):
+    """Pooled, keep-alive async client (requires `httpx`).
+
+    httpx transports only retry failed connection attempts, which is always
+    safe. Use it from a single long-lived event loop, since its connections
+    are bound to the loop that opened them.
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        ),
+        transport=httpx.AsyncHTTPTransport(retries=max_retries),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+    )
+
+
+def _review_payload(code, language, question, history, session_id, conversation_id):
+    return {
+        "code": code,
+        "language": language,
+        "question": question,
+        "history": history or [],
+        "session_id": session_id,
+        "conversation_id": conversation_id,
+    }
+
+
+def _show_api_error(response):
+    """Display the backend's standardized error message, if any."""
+    try:
+        message = response.json().get("message")
+    except ValueError:
+        message = None
+    finally:
+        response.close()
+    retry_after = response.headers.get("Retry-After")
+    if message and retry_after:
+        st.warning(f"{message} (retry in {retry_after}s)")
+    elif message:
+        st.error(message)
+
 
-def review_code(code, language, question=None, api_url="http://localhost:8000"):
+def review_code(
+    code,
+    language,
+    question=None,
+    api_url="http://localhost:8000",
+    history=None,
+    session_id=None,
+    conversation_id=None,
+):
+    """Start a streamed review; `history` is a list of {"role", "content"} turns.
+
+    `session_id` identifies the browser session, whose token budget the
+    backend charges; `conversation_id` lets `cancel_conversation` stop it.
+    """
     try:
-        response = requests.post(
+        response = get_http_session().post(
             f"{api_url}/api/review",
-            json={
-                "code": code,
-                "language": language,
-                "question": question
-            },
+            json=_review_payload(
+                code, language, question, history, session_id, conversation_id
+            ),
             stream=True,
-            timeout=60
+            timeout=HTTP_TIMEOUT,
         )
-        
+
         if response.status_code == 200:
             return response
         else:
+            _show_api_error(response)
             return None
     except requests.exceptions.ConnectionError:
         st.error("Cannot connect to API. Make sure the backend is running.")
@@ -28,13 +136,237 @@ def review_code(code, language, question=None, api_url="http://localhost:8000"):
         st.error(f"An error occurred: {str(e)}")
         return None
 
+
+async def review_code_async(
+    code,
+    language,
+    question=None,
+    api_url="http://localhost:8000",
+    history=None,
+    session_id=None,
+    conversation_id=None,
+):
+    """Async variant of `review_code`: an open streaming httpx response, or None."""
+    client = get_async_client()
+    request = client.build_request(
+        "POST",
+        f"{api_url}/api/review",
+        json=_review_payload(
+            code, language, question, history, session_id, conversation_id
+        ),
+    )
+    response = await client.send(request, stream=True)
+    if response.status_code == 200:
+        return response
+    await response.aclose()
+    return None
+
+
+def cancel_conversation(conversation_id, api_url="http://localhost:8000"):
+    """Ask the backend to stop generating answers for a conversation.
+
+    Best effort: a failure only means the backend keeps generating until the
+    client disconnect is noticed.
+    """
+    try:
+        get_http_session().post(
+            f"{api_url}/api/conversations/{conversation_id}/cancel", timeout=5
+        )
+    except requests.exceptions.RequestException:
+        pass
+
+
+def _get_json(url, params):
+    """GET a JSON document from the backend; None (with the error shown) on failure."""
+    try:
+        response = get_http_session().get(url, params=params, timeout=HTTP_TIMEOUT)
+    except requests.exceptions.RequestException:
+        st.error("Cannot connect to API. Make sure the backend is running.")
+        return None
+    if response.status_code != 200:
+        _show_api_error(response)
+        return None
+    return response.json()
+
+
+def list_history(
+    api_url="http://localhost:8000",
+    session_id=None,
+    languages=None,
+    cursor=None,
+    limit=20,
+):
+    """Fetch one page of stored reviews, newest first.
+
+    Returns {"items": [...], "next_cursor": ...}, where `next_cursor` is passed
+    back as `cursor` to get the following page (None on the last one), or None
+    if the backend could not answer (the error is shown).
+    """
+    params = {
+        "session_id": session_id,
+        "language": languages or [],
+        "cursor": cursor,
+        "limit": limit,
+    }
+    return _get_json(f"{api_url}/api/history", params)
+
+
+def get_review(item_id, api_url="http://localhost:8000"):
+    """Fetch one stored review in full (code and answer), by the `id` of its summary."""
+    return _get_json(f"{api_url}/api/history/{item_id}", None)
+
+
+def get_stats(api_url="http://localhost:8000", session_id=None, days=None):
+    """Fetch review statistics of a session (or of the whole class if None).
+
+    `days` limits them to the last days, today included (all time if None).
+    Returns the statistics, or None if the backend could not answer.
+    """
+    return _get_json(f"{api_url}/api/stats", {"session_id": session_id, "days": days})
+
+
+def search_history(
+    query,
+    api_url="http://localhost:8000",
+    session_id=None,
+    languages=None,
+    offset=0,
+    limit=20,
+):
+    """Full-text search of the stored reviews, most relevant first.
+
+    Returns {"items": [...], "next_offset": ...}, or None if the backend could
+    not answer (the error is shown).
+    """
+    params = {
+        "q": query,
+        "session_id": session_id,
+        "language": languages or [],
+        "offset": offset,
+        "limit": limit,
+    }
+    return _get_json(f"{api_url}/api/history/search", params)
+
+
+class SSEParser:
+    """Incremental Server-Sent Events parser, fed one line at a time.
+
+    Multi-line events (several `data:` lines) are joined with newlines, as
+    specified by the SSE format.
+    """
+
+    def __init__(self):
+        self.event = "message"
+        self.data_lines = []
+
+    def feed(self, line):
+        """Consume a line; return an (event, data) pair when one is complete."""
+        line = line.rstrip("\r")
+
+        if not line:
+            # A blank line dispatches the event
+            return self.flush()
+
+        if line.startswith(":"):
+            return None  # Comment / keep-alive
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "data":
+            self.data_lines.append(value)
+        elif field == "event":
+            self.event = value
+        return None
+
+    def flush(self):
+        """Return the pending event, if any, and reset the parser."""
+        dispatched = (
+            (self.event, "\n".join(self.data_lines)) if self.data_lines else None
+        )
+        self.event = "message"
+        self.data_lines = []
+        return dispatched
+
+
+def iter_sse_events(response):
+    """Parse a streaming `requests` response into (event, data) pairs."""
+    parser = SSEParser()
+    for raw_line in response.iter_lines(delimiter=b"\n"):
+        dispatched = parser.feed(raw_line.decode("utf-8"))
+        if dispatched:
+            yield dispatched
+
+    dispatched = parser.flush()
+    if dispatched:
+        yield dispatched
+
+
+async def aiter_sse_events(response):
+    """Parse a streaming httpx response into (event, data) pairs."""
+    parser = SSEParser()
+    async for line in response.aiter_lines():
+        dispatched = parser.feed(line)
+        if dispatched:
+            yield dispatched
+
+    dispatched = parser.flush()
+    if dispatched:
+        yield dispatched
+
+
+def _message_data(event, data):
+    """Return the text carried by an event, or None for non-message events."""
+    if event == "error":
+        raise StreamError(data)
+    if event != "message":
+        return None
+    return data
+
+
+def _report_queue(event, data, on_queue):
+    """Forward a queue position event to `on_queue`; return True if it was one."""
+    if event != "queue":
+        return False
+    if on_queue is not None and data.isdigit():
+        on_queue(int(data))
+    return True
+
+
+def stream_response_text(response, on_queue=None):
+    """Yield the answer chunk by chunk as the backend streams it.
+
+    Suitable for `st.write_stream`. Stops at the `[DONE]` marker. While the
+    request waits for a free slot, `on_queue` is called with its position.
+    """
+    try:
+        for event, data in iter_sse_events(response):
+            if _report_queue(event, data, on_queue):
+                continue
+            text = _message_data(event, data)
+            if text == "[DONE]":
+                return
+            if text is not None:
+                yield text
+    finally:
+        response.close()
+
+
+async def astream_response_text(response, on_queue=None):
+    """Async variant of `stream_response_text` for httpx responses."""
+    try:
+        async for event, data in aiter_sse_events(response):
+            if _report_queue(event, data, on_queue):
+                continue
+            text = _message_data(event, data)
+            if text == "[DONE]":
+                return
+            if text is not None:
+                yield text
+    finally:
+        await response.aclose()
+
+
 def get_response_text(response):
-    full_response = ""
-    for line in response.iter_lines():
-        if line:
-            line_text = line.decode('utf-8')
-            if line_text.startswith('data: '):
-                data = line_text[6:]
-                if data != '[DONE]' and data:
-                    full_response += data
-    return full_response
+    return "".join(stream_response_text(response))
@@ -1,5 +1,20 @@
+import uuid
+
 import streamlit as st
 
+
+def get_session_id():
+    """Identifier of this browser session.
+
+    It is mirrored in the URL, so that a reload keeps the same session (and
+    the same review history).
+    """
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.query_params["session"] = st.session_state.session_id
+    return st.session_state.session_id
+
+
 def validate_code(code):
     if not code or not code.strip():
         return False, "Please enter some code to review"
@@ -0,0 +1,125 @@
+"""Tests of the offline review of a directory of submissions."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from backend import batch_review
+from backend.batch_review import BatchOptions, PreparedItem, review_batch
+from backend.core.config import Settings
+
+SETTINGS = Settings(
+    engine="fake",
+    fake_ttft_ms=0,
+    fake_token_latency_ms=0,
+    fake_response_tokens=5,
+    batch_window_ms=0,
+)
+
+
+class ThreadPool(ThreadPoolExecutor):
+    """Runs the workers in threads, so that tests can patch what they run."""
+
+    def __init__(
+        self, workers: int | None, mp_context: Any = None, **kwargs: Any
+    ) -> None:
+        super().__init__(workers, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def thread_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(batch_review, "ProcessPoolExecutor", ThreadPool)
+
+
+def records(output: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in output.read_text().splitlines()]
+
+
+async def run(
+    source: Path, output: Path, settings: Settings = SETTINGS
+) -> batch_review.BatchSummary:
+    return await review_batch(source, output, settings, workers=2, progress=False)
+
+
+async def test_rerun_only_reviews_new_and_edited_files(tmp_path: Path) -> None:
+    source = tmp_path / "submissions"
+    source.mkdir()
+    (source / "a.py").write_text("def a():\n    return 1\n")
+    (source / "b.py").write_text("def b():\n    return 2\n")
+    output = tmp_path / "reviews.jsonl"
+
+    first = await run(source, output)
+    assert (first.reviewed, first.resumed) == (2, 0)
+
+    (source / "b.py").write_text("def b():\n    return 3\n")
+    (source / "c.py").write_text("def c():\n    return 4\n")
+    # A line cut short by an interrupted run is dropped
+    with output.open("a") as out:
+        out.write('{"id": "c.py", "sta')
+    second = await run(source, output)
+
+    assert (second.reviewed, second.resumed) == (2, 1)
+    lines = records(output)
+    assert sorted(record["id"] for record in lines) == ["a.py", "b.py", "b.py", "c.py"]
+    assert {record["status"] for record in lines} == {"ok"}
+
+
+async def test_file_failing_to_prepare_fails_alone(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    prepare_item = batch_review.prepare_item
+
+    def prepare(item_id: str, code: str, options: BatchOptions) -> PreparedItem:
+        if item_id == "bad.py":
+            raise RecursionError("maximum recursion depth exceeded")
+        return prepare_item(item_id, code, options)
+
+    monkeypatch.setattr(batch_review, "prepare_item", prepare)
+    source = tmp_path / "submissions"
+    source.mkdir()
+    (source / "bad.py").write_text("x = 1\n")
+    (source / "good.py").write_text("def good():\n    return 1\n")
+    output = tmp_path / "reviews.jsonl"
+
+    summary = await run(source, output)
+
+    assert (summary.reviewed, summary.failed) == (1, 1)
+    statuses = {record["id"]: record["status"] for record in records(output)}
+    assert statuses == {"bad.py": "failed", "good.py": "ok"}
+
+    # Failed files are retried by the next run
+    monkeypatch.setattr(batch_review, "prepare_item", prepare_item)
+    assert (await run(source, output)).reviewed == 1
+
+
+async def test_large_file_is_reviewed_in_parts(tmp_path: Path) -> None:
+    settings = replace(
+        SETTINGS, chunk_threshold_tokens=40, chunk_max_tokens=25, chunk_max_chunks=4
+    )
+    source = tmp_path / "submissions"
+    source.mkdir()
+    steps = [
+        f"def step_{n}(values):\n    return [value * {n} for value in values]\n"
+        for n in range(4)
+    ]
+    (source / "large.py").write_text("\n\n".join(steps))
+    (source / "huge.py").write_text("\n\n".join(steps * 2))
+    output = tmp_path / "reviews.jsonl"
+
+    summary = await run(source, output, settings)
+
+    assert (summary.reviewed, summary.failed) == (1, 1)
+    lines = {record["id"]: record for record in records(output)}
+    assert lines["large.py"]["status"] == "ok"
+    assert lines["large.py"]["review"].startswith(
+        "This submission is long, so I reviewed it in 4 parts."
+    )
+    assert "### lines 1-2" in lines["large.py"]["review"]
+    # Too large even in parts: retried by the next run, as with larger settings
+    assert lines["huge.py"]["status"] == "failed"
+    bigger = replace(settings, chunk_max_chunks=8)
+    assert (await run(source, output, bigger)).reviewed == 1
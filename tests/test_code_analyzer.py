@@ -0,0 +1,17 @@
+"""Tests of the static analysis of submissions."""
+
+import pytest
+
+from backend.services.code_analyzer import CodeAnalyzer
+
+
+@pytest.mark.parametrize("depth", [1_500, 5_000])
+def test_code_too_deeply_nested_is_left_to_the_model(depth: int) -> None:
+    # 1 500 parses but overflows the visitor, 5 000 overflows the parser
+    code = "def f():\n    x = " + "-" * depth + "1\n    return x\n"
+    analyzer = CodeAnalyzer()
+
+    assert analyzer.analyze(code, "python") is None
+    # Cached like any other result
+    assert len(analyzer) == 1
+    assert analyzer.analyze("def f():\n    return 1\n", "python") is not None
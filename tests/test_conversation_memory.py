@@ -0,0 +1,46 @@
+"""Tests of the rolling memory of conversations."""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from backend.services.conversation_memory import ConversationMemory
+from backend.services.llm_service import GenerationRequest, LLMEngine
+
+
+class SummaryEngine(LLMEngine):
+    """Engine summarizing once its gate opens, recording the prompts it got."""
+
+    name = "summary"
+
+    def __init__(self) -> None:
+        self.gate = asyncio.Event()
+        self.prompts: list[str] = []
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        self.prompts.append(request.messages[-1]["content"])
+        await self.gate.wait()
+        yield f"summary {len(self.prompts)}"
+
+
+async def test_turns_trimmed_during_a_summary_are_not_removed_twice() -> None:
+    engine = SummaryEngine()
+    memory = ConversationMemory(engine, recent_turns=2)
+    for turn in (1, 2):
+        memory.append("c", f"question {turn}", f"answer {turn}")
+    task = memory._conversations["c"].task
+    assert task is not None
+    await asyncio.sleep(0)
+    assert "question 1" in engine.prompts[0]
+
+    # While turn 1 is being folded, new turns push it out of the memory
+    for turn in (3, 4, 5):
+        memory.append("c", f"question {turn}", f"answer {turn}")
+    engine.gate.set()
+    await task
+
+    # Turn 2 was never summarized: the next round folds it
+    assert "question 2" in engine.prompts[1]
+    snapshot = memory.get("c")
+    assert snapshot is not None
+    assert snapshot.summary == "summary 2"
+    assert [turn["content"] for turn in snapshot.turns] == ["question 5", "answer 5"]
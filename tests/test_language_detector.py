@@ -0,0 +1,49 @@
+"""Tests of the detection of the submission language."""
+
+from collections.abc import AsyncIterator
+
+import pytest
+
+from backend.core.config import Settings
+from backend.schemas.review import ReviewRequest
+from backend.services.language_detector import detect_language
+from backend.services.llm_service import GenerationRequest, LLMEngine
+from backend.services.review_service import ReviewService
+
+
+class SilentEngine(LLMEngine):
+    """Engine that is never reached: the tests only prepare reviews."""
+
+    name = "silent"
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        yield ""
+
+
+FENCED = "```python\ndef add(a, b):\n    return a + b\n\nprint(add(1, 2))\n```\n"
+
+
+@pytest.mark.parametrize(
+    ("question", "language"),
+    [
+        ("How do I go about sorting a list?", "unknown"),
+        ("Go through my loop, why is it so slow?", "unknown"),
+        ("How do goroutines work in Go?", "go"),
+        ("What is a slice in golang?", "go"),
+        ("Should I learn C++ or java first?", "cpp"),
+    ],
+)
+def test_question_gets_the_language_it_mentions(question: str, language: str) -> None:
+    detection = detect_language(question)
+
+    assert not detection.is_code
+    assert detection.language == language
+
+
+def test_fenced_code_is_analyzed_without_its_fences() -> None:
+    service = ReviewService(SilentEngine(), Settings(rate_limit_enabled=False))
+    review = service.prepare(ReviewRequest(code=FENCED))
+
+    assert review.request is not None and review.request.language == "python"
+    assert review.quick_answer is None
+    assert "functions: add" in review.generation.messages[-1]["content"]
@@ -0,0 +1,57 @@
+"""Tests of the near-duplicate index."""
+
+import pytest
+
+from backend.services import near_duplicate
+from backend.services.near_duplicate import NearDuplicateIndex
+
+CODE = "def total(items):\n    s = 0\n    for x in items:\n        s += x\n    return s"
+RENAMED = CODE.replace("items", "values").replace("x", "v")
+
+
+def key(n: int) -> str:
+    return f"{n:064x}"
+
+
+def test_finds_renamed_submission_in_the_same_scope() -> None:
+    index = NearDuplicateIndex()
+    index.add(CODE, "python", key(1))
+
+    assert index.find(RENAMED, "python") == key(1)
+    assert index.find(RENAMED, "java") is None
+
+
+def test_exact_copy_is_not_indexed_twice() -> None:
+    index = NearDuplicateIndex()
+    index.add(CODE, "python", key(1))
+    index.add(RENAMED, "python", key(2))
+
+    assert len(index) == 1
+    assert index.find(CODE, "python") == key(1)
+
+
+def test_lookup_scans_at_most_max_candidates(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Variants sharing the first band of the submission, newer than it
+    fingerprints = {f"v{n}": n << 16 | n << 32 | n << 48 for n in range(1, 5)}
+    fingerprints[CODE] = 0
+    monkeypatch.setattr(near_duplicate, "simhash", fingerprints.__getitem__)
+    index = NearDuplicateIndex(max_distance=0, max_candidates=2)
+    index.add(CODE, "python", key(0))
+    for n in range(1, 5):
+        index.add(f"v{n}", "python", key(n))
+
+    assert index.find(CODE, "python") is None
+    index.max_candidates = 5
+    assert index.find(CODE, "python") == key(0)
+
+
+def test_least_recently_used_scope_is_forgotten() -> None:
+    index = NearDuplicateIndex(max_scopes=2)
+    index.add(CODE, "a", key(1))
+    index.add(CODE, "b", key(2))
+    index.find(CODE, "a")
+    index.add(CODE, "c", key(3))
+
+    assert index.find(CODE, "a") == key(1)
+    assert index.find(CODE, "b") is None
+    assert index.find(CODE, "c") == key(3)
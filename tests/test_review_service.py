@@ -0,0 +1,206 @@
+"""Tests of the admission of reviews sharing a generation."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+from backend.core.config import Settings
+from backend.schemas.review import ReviewRequest
+from backend.services.admission import QueuePosition
+from backend.services.cancellation import close_iterator
+from backend.services.llm_service import GenerationRequest, LLMEngine
+from backend.services.review_service import PreparedReview, ReviewService
+from backend.services.single_flight import FlightCancelledError
+
+CODE = "def add(a, b):\n    return a + b\n"
+
+
+class GatedEngine(LLMEngine):
+    """Engine answering "ok" once its gate opens, counting its generations."""
+
+    name = "gated"
+
+    def __init__(self) -> None:
+        self.gate = asyncio.Event()
+        self.generations = 0
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        self.generations += 1
+        await self.gate.wait()
+        yield "ok"
+
+
+def make_service(engine: LLMEngine, **overrides: Any) -> ReviewService:
+    options: dict[str, Any] = {
+        "max_in_flight": 1,
+        "response_cache_enabled": False,
+        "analyzer_enabled": False,
+        "memory_enabled": False,
+        "near_duplicate_policy": "off",
+        "rate_limit_enabled": False,
+    }
+    return ReviewService(engine, Settings(**{**options, **overrides}))
+
+
+def prepare(service: ReviewService) -> PreparedReview:
+    return service.prepare(ReviewRequest(code=CODE, language="python"))
+
+
+async def answer(service: ReviewService, review: PreparedReview, ticket: Any) -> str:
+    text = ""
+    async for chunk in service.stream(review, ticket):
+        if not isinstance(chunk, QueuePosition):
+            text += chunk
+    return text
+
+
+async def test_follower_gives_its_slot_back() -> None:
+    engine = GatedEngine()
+    service = make_service(engine)
+    leader_review = prepare(service)
+    leader_ticket = service.admit(leader_review)
+    leader = asyncio.create_task(answer(service, leader_review, leader_ticket))
+    await asyncio.sleep(0.01)
+
+    follower_review = prepare(service)
+    follower_ticket = service.admit(follower_review)
+    assert follower_ticket is not None and not follower_ticket.granted
+    follower = asyncio.create_task(answer(service, follower_review, follower_ticket))
+    await asyncio.sleep(0.01)
+    assert follower_ticket.released
+    assert service.admission.queue_depth == 0
+
+    engine.gate.set()
+    assert list(await asyncio.gather(leader, follower)) == ["ok", "ok"]
+    assert engine.generations == 1
+
+
+async def test_generation_ended_after_admission_is_run_under_the_ticket() -> None:
+    engine = GatedEngine()
+    service = make_service(engine)
+    first_review = prepare(service)
+    first_ticket = service.admit(first_review)
+    first = asyncio.create_task(answer(service, first_review, first_ticket))
+    await asyncio.sleep(0.01)
+
+    # Admitted while the identical generation runs, which ends (uncached) before
+    # this answer starts: it must lead, and wait for a slot to do so
+    second_review = prepare(service)
+    second_ticket = service.admit(second_review)
+    assert second_ticket is not None and not second_ticket.granted
+    engine.gate.set()
+    assert await first == "ok"
+    await asyncio.sleep(0)
+    # The flight gave its slot back when its generation ended
+    assert service.admission.position(second_ticket) == 0
+
+    assert await answer(service, second_review, second_ticket) == "ok"
+    assert engine.generations == 2
+    await asyncio.sleep(0)
+    # The caller's releases do not free the slots a second time
+    assert first_ticket is not None
+    service.admission.release(first_ticket)
+    service.admission.release(second_ticket)
+    assert service.admission.in_flight == 0
+
+
+async def test_cached_review_reserves_a_slot_if_it_must_generate() -> None:
+    engine = GatedEngine()
+    engine.gate.set()
+    service = make_service(engine, response_cache_enabled=True)
+    review = prepare(service)
+    assert service.response_cache is not None and review.cache_key is not None
+    service.response_cache.put(review.cache_key, "cached")
+    assert service.admit(review) is None
+
+    # Evicted between the admission and the start of the answer
+    service.response_cache = None
+    stream = service.stream(review, None)
+    assert await anext(stream) == "ok"
+    assert service.admission.in_flight == 1
+    await close_iterator(stream)
+    await asyncio.sleep(0)
+    assert service.admission.in_flight == 0
+
+
+async def test_chunks_run_concurrently_only_on_free_slots() -> None:
+    engine = GatedEngine()
+    service = make_service(
+        engine,
+        max_in_flight=2,
+        chunk_threshold_tokens=40,
+        chunk_max_tokens=25,
+        chunk_max_concurrency=4,
+    )
+    code = "\n\n".join(
+        f"def step_{n}(values):\n    return [value * {n} for value in values]\n"
+        for n in range(4)
+    )
+    review = service.prepare(ReviewRequest(code=code, language="python"))
+    assert len(review.chunks) == 4
+    ticket = service.admit(review)
+    task = asyncio.create_task(answer(service, review, ticket))
+    await asyncio.sleep(0.01)
+
+    # The review's own slot and the one free slot, not four generations
+    assert engine.generations == 2
+    assert service.admission.in_flight == 2
+    other = service.admission.reserve(review.request_class)
+    assert service.admission.position(other) == 1
+
+    engine.gate.set()
+    await task
+    assert engine.generations == 4
+    await asyncio.sleep(0)
+    # The extra slot went to the waiting request, the review's own slot was
+    # freed with its flight
+    assert service.admission.position(other) == 0
+    assert service.admission.in_flight == 1
+
+
+async def test_flight_keeps_its_slot_after_its_leader_left() -> None:
+    engine = GatedEngine()
+    service = make_service(engine)
+    leader_review = prepare(service)
+    leader_ticket = service.admit(leader_review)
+    leader = asyncio.create_task(answer(service, leader_review, leader_ticket))
+    await asyncio.sleep(0.01)
+
+    follower_review = prepare(service)
+    follower_ticket = service.admit(follower_review)
+    follower = asyncio.create_task(answer(service, follower_review, follower_ticket))
+    await asyncio.sleep(0.01)
+
+    # The leader's client disconnects: the route releases its ticket
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    assert leader_ticket is not None
+    service.admission.release(leader_ticket)
+    assert service.admission.in_flight == 1
+    other = service.admission.reserve(leader_review.request_class)
+    assert service.admission.position(other) == 1
+
+    engine.gate.set()
+    assert await follower == "ok"
+    await asyncio.sleep(0)
+    assert engine.generations == 1
+    assert service.admission.position(other) == 0
+
+
+async def test_subscribers_of_a_cancelled_generation_get_an_error() -> None:
+    engine = GatedEngine()
+    service = make_service(engine, max_in_flight=2)
+    reviews = [prepare(service), prepare(service)]
+    answers = [
+        asyncio.create_task(answer(service, review, service.admit(review)))
+        for review in reviews
+    ]
+    await asyncio.sleep(0.01)
+
+    # Shutdown cancels the shared generation: the answer is incomplete
+    assert reviews[0].cache_key is not None
+    task = service.single_flight._flights[reviews[0].cache_key].task
+    assert task is not None
+    task.cancel()
+    for result in await asyncio.gather(*answers, return_exceptions=True):
+        assert isinstance(result, FlightCancelledError)
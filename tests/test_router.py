@@ -0,0 +1,253 @@
+"""Tests of the routing of generations across several replicas."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+
+from backend.services.cancellation import close_iterator
+from backend.services.llm_service import EngineError, GenerationRequest, LLMEngine
+from backend.services.router import UpstreamRouter
+
+
+class Replica(LLMEngine):
+    """
+    Fake upstream answering "ok!", recording the generations it received.
+
+    Generations whose id starts with "held" stop after their first token until
+    ``release`` is set, so that they stay outstanding. A slow replica waits
+    ``first_token_delay`` seconds before its first token. A failing replica also
+    fails its health checks.
+    """
+
+    name = "replica"
+
+    def __init__(self, name: str) -> None:
+        self.base_url = name
+        self.received: list[str] = []
+        self.aborted: list[str] = []
+        self.failing = False
+        self.first_token_delay = 0.0
+        self.fails_after_first_token = False
+        self.release = asyncio.Event()
+
+    async def health(self) -> bool:
+        return not self.failing
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        self.received.append(request.request_id)
+        if self.failing:
+            raise EngineError(f"{self.base_url} is down")
+        request.usage.prompt_tokens = 10
+        await asyncio.sleep(self.first_token_delay)
+        request.usage.completion_tokens += 1
+        yield "ok"
+        if self.fails_after_first_token:
+            raise EngineError("connection lost")
+        if request.request_id.startswith("held"):
+            await self.release.wait()
+        request.usage.completion_tokens += 1
+        yield "!"
+
+    async def abort(self, request_id: str) -> None:
+        self.aborted.append(request_id)
+
+
+def generation(request_id: str, key: str, max_tokens: int = 100) -> GenerationRequest:
+    return GenerationRequest(
+        request_id,
+        [{"role": "user", "content": "def f(): pass"}],
+        max_tokens=max_tokens,
+        affinity_key=key,
+    )
+
+
+async def answer(router: UpstreamRouter, request: GenerationRequest) -> str:
+    return "".join([token async for token in router.stream(request)])
+
+
+async def hold(
+    router: UpstreamRouter, request: GenerationRequest
+) -> AsyncIterator[str]:
+    """Starts a generation and leaves it running after its first token."""
+    stream = router.stream(request)
+    assert await anext(stream) == "ok"
+    return stream
+
+
+async def start_router(replicas: list[Replica], **options: Any) -> UpstreamRouter:
+    options.setdefault("health_interval_s", 60)
+    router = UpstreamRouter(list(replicas), **options)
+    await router.start()
+    return router
+
+
+async def test_generation_goes_to_the_replica_with_fewest_outstanding_tokens() -> None:
+    replicas = [Replica(f"r{index}") for index in range(3)]
+    router = await start_router(replicas)
+    held = [
+        await hold(router, generation("held-a", "a", max_tokens=1000)),
+        await hold(router, generation("held-b", "b", max_tokens=100)),
+        await hold(router, generation("held-c", "c", max_tokens=500)),
+    ]
+    try:
+        assert await answer(router, generation("d", "d")) == "ok!"
+        assert [replica.received for replica in replicas] == [
+            ["held-a"],
+            ["held-b", "d"],
+            ["held-c"],
+        ]
+    finally:
+        for stream in held:
+            await close_iterator(stream)
+        await router.close()
+
+    assert [upstream.outstanding for upstream in router.upstreams] == [0, 0, 0]
+
+
+async def test_conversation_sticks_to_its_replica_until_it_is_overloaded() -> None:
+    replicas = [Replica("r0"), Replica("r1")]
+    router = await start_router(replicas, affinity_slack_tokens=1000)
+    held = []
+    try:
+        assert await answer(router, generation("turn-1", "conversation")) == "ok!"
+        # Within the slack: the conversation stays where its prefix is cached
+        held.append(await hold(router, generation("held-1", "other", max_tokens=500)))
+        assert await answer(router, generation("turn-2", "conversation")) == "ok!"
+        # Beyond the slack: it moves to the least loaded replica
+        held.append(await hold(router, generation("held-2", "other", max_tokens=2000)))
+        assert await answer(router, generation("turn-3", "conversation")) == "ok!"
+        assert await answer(router, generation("turn-4", "conversation")) == "ok!"
+    finally:
+        for stream in held:
+            await close_iterator(stream)
+        await router.close()
+
+    assert replicas[0].received == ["turn-1", "held-1", "turn-2", "held-2"]
+    assert replicas[1].received == ["turn-3", "turn-4"]
+
+
+async def test_failing_replica_is_ejected_until_its_health_check_passes() -> None:
+    replicas = [Replica("r0"), Replica("r1")]
+    router = await start_router(replicas, max_failures=2, health_interval_s=0.05)
+    replicas[0].failing = True
+    try:
+        for index in range(3):
+            assert await answer(router, generation(f"g{index}", f"k{index}")) == "ok!"
+        assert replicas[0].received == ["g0", "g1"]
+        assert replicas[1].received == ["g0", "g1", "g2"]
+        assert [upstream.healthy for upstream in router.upstreams] == [False, True]
+
+        replicas[0].failing = False
+        await asyncio.sleep(0.1)
+        assert [upstream.healthy for upstream in router.upstreams] == [True, True]
+        assert await answer(router, generation("g3", "k3")) == "ok!"
+        assert replicas[0].received[-1] == "g3"
+    finally:
+        await router.close()
+
+
+async def test_generation_fails_over_only_before_its_first_token() -> None:
+    replicas = [Replica("r0"), Replica("r1")]
+    router = await start_router(replicas)
+    replicas[0].failing = True
+    try:
+        assert await answer(router, generation("before", "a")) == "ok!"
+        assert replicas[0].received == ["before"]
+        assert replicas[1].received == ["before"]
+
+        # Once the client got a token, the failure is reported instead
+        replicas[0].failing = False
+        replicas[0].fails_after_first_token = True
+        with pytest.raises(EngineError, match="connection lost"):
+            await answer(router, generation("after", "b"))
+        assert replicas[0].received[-1] == "after"
+        assert replicas[1].received == ["before"]
+
+        replicas[0].failing = replicas[1].failing = True
+        with pytest.raises(EngineError, match="No healthy inference upstream"):
+            await answer(router, generation("none", "c"))
+    finally:
+        await router.close()
+
+
+async def test_late_generation_is_answered_by_its_hedge() -> None:
+    replicas = [Replica("r0"), Replica("r1")]
+    replicas[0].first_token_delay = 1.0
+    router = await start_router(
+        replicas,
+        hedge_enabled=True,
+        hedge_min_samples=0,
+        hedge_min_delay_ms=10,
+        ttft_slo_ms=20,
+        hedge_max_ratio=1.0,
+    )
+    request = generation("g", "k")
+    primary_usage = request.usage
+    try:
+        assert await answer(router, request) == "ok!"
+    finally:
+        await router.close()
+
+    assert replicas[0].received == ["g"]
+    assert replicas[1].received == ["g-hedge"]
+    # The late primary is cancelled and aborted on its upstream
+    assert replicas[0].aborted == ["g"]
+    assert replicas[1].aborted == []
+    # The client is billed for the hedge that answered, not for the primary
+    assert request.usage is not primary_usage
+    assert (request.usage.prompt_tokens, request.usage.completion_tokens) == (10, 2)
+    assert primary_usage.completion_tokens == 0
+    assert [upstream.outstanding for upstream in router.upstreams] == [0, 0]
+    assert router._running == {}
+
+
+async def test_hedge_is_refused_once_the_budget_is_spent() -> None:
+    replicas = [Replica("r0"), Replica("r1")]
+    replicas[0].first_token_delay = 0.1
+    router = await start_router(
+        replicas,
+        hedge_enabled=True,
+        hedge_min_samples=0,
+        hedge_min_delay_ms=10,
+        ttft_slo_ms=20,
+        hedge_max_ratio=0.5,
+    )
+    try:
+        # Each generation earns half a hedge: only every other one is hedged
+        for request_id in ["a", "b", "c"]:
+            assert await answer(router, generation(request_id, request_id)) == "ok!"
+    finally:
+        await router.close()
+
+    assert replicas[0].received == ["a", "b", "c"]
+    assert replicas[1].received == ["b-hedge"]
+    assert replicas[0].aborted == ["b"]
+
+
+@pytest.mark.parametrize(
+    ("samples", "ttft", "delay"),
+    [
+        # No hedging until enough times to first token are known
+        (0, 0.0, None),
+        (19, 0.5, None),
+        (20, 0.01, 0.1),
+        (20, 0.5, 0.5),
+        (1000, 5.0, 2.0),
+    ],
+)
+def test_hedge_delay_is_the_ttft_percentile_within_bounds(
+    samples: int, ttft: float, delay: float | None
+) -> None:
+    router = UpstreamRouter(
+        [Replica("r0"), Replica("r1")],
+        hedge_enabled=True,
+        hedge_min_delay_ms=100,
+        ttft_slo_ms=2000,
+        hedge_min_samples=20,
+    )
+    for _ in range(samples):
+        router.ttft.observe(ttft)
+
+    assert router._hedge_delay() == delay
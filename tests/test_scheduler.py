@@ -0,0 +1,116 @@
+"""Tests of the micro-batching scheduler."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+from backend.services.llm_service import GenerationRequest, LLMEngine
+from backend.services.scheduler import MicroBatchScheduler, _Pending
+
+
+class RecordingEngine(LLMEngine):
+    """Engine answering "ok" and recording the generations it started."""
+
+    name = "recording"
+
+    def __init__(self) -> None:
+        self.started: list[str] = []
+
+    async def stream(self, request: GenerationRequest) -> AsyncIterator[str]:
+        self.started.append(request.request_id)
+        yield "ok"
+
+
+class RecordingScheduler(MicroBatchScheduler):
+    """Scheduler recording the request ids of every batch it submits."""
+
+    def __init__(self, engine: LLMEngine, **kwargs: Any) -> None:
+        super().__init__(engine, **kwargs)
+        self.batches: list[list[str]] = []
+
+    def _submit(self, batch: list[_Pending]) -> None:
+        self.batches.append([pending.request.request_id for pending in batch])
+        super()._submit(batch)
+
+
+def request(request_id: str, content: str = "def f(): pass") -> GenerationRequest:
+    return GenerationRequest(request_id, [{"role": "user", "content": content}])
+
+
+async def generate(scheduler: MicroBatchScheduler, req: GenerationRequest) -> str:
+    return "".join([token async for token in scheduler.stream(req)])
+
+
+async def test_batch_is_submitted_when_the_window_expires() -> None:
+    engine = RecordingEngine()
+    scheduler = RecordingScheduler(engine, window_ms=50, max_batch_size=8)
+    await scheduler.start()
+    try:
+        started = time.monotonic()
+        answers = await asyncio.gather(
+            *(generate(scheduler, request(f"r{n}")) for n in range(3))
+        )
+        elapsed = time.monotonic() - started
+    finally:
+        await scheduler.close()
+
+    assert answers == ["ok"] * 3
+    assert scheduler.batches == [["r0", "r1", "r2"]]
+    assert elapsed >= 0.05
+
+
+async def test_full_batch_is_submitted_without_waiting() -> None:
+    engine = RecordingEngine()
+    scheduler = RecordingScheduler(engine, window_ms=10_000, max_batch_size=2)
+    await scheduler.start()
+    try:
+        answers = await asyncio.wait_for(
+            asyncio.gather(
+                generate(scheduler, request("a")), generate(scheduler, request("b"))
+            ),
+            timeout=1,
+        )
+    finally:
+        await scheduler.close()
+
+    assert list(answers) == ["ok", "ok"]
+    assert scheduler.batches == [["a", "b"]]
+
+
+async def test_batch_stops_at_the_token_budget() -> None:
+    engine = RecordingEngine()
+    content = "x = 1\n" * 50
+    budget = 2 * engine.count_tokens(content)
+    scheduler = RecordingScheduler(
+        engine, window_ms=20, max_batch_size=8, max_batch_tokens=budget
+    )
+    await scheduler.start()
+    try:
+        await asyncio.gather(
+            *(generate(scheduler, request(f"r{n}", content)) for n in range(3))
+        )
+    finally:
+        await scheduler.close()
+
+    assert scheduler.batches == [["r0", "r1"], ["r2"]]
+
+
+async def test_cancelled_request_never_reaches_the_engine() -> None:
+    engine = RecordingEngine()
+    scheduler = RecordingScheduler(engine, window_ms=50)
+    await scheduler.start()
+    try:
+        cancelled = asyncio.create_task(generate(scheduler, request("cancelled")))
+        await asyncio.sleep(0.01)
+        assert scheduler.queue_depth == 1
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert scheduler.queue_depth == 0
+
+        assert await generate(scheduler, request("kept")) == "ok"
+    finally:
+        await scheduler.close()
+
+    assert engine.started == ["kept"]
+    assert scheduler.batches == [["kept"]]
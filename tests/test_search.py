@@ -0,0 +1,66 @@
+"""Tests of the full-text search over the review history."""
+
+from collections.abc import Iterator
+
+import pytest
+
+from backend.db.database import Database
+from backend.db.reviews import ReviewRecord, ReviewStore
+from backend.db.search import ReviewSearchIndex
+
+
+def record(review_id: str, code: str) -> ReviewRecord:
+    return ReviewRecord(
+        review_id=review_id,
+        conversation_id="",
+        session_id="",
+        timestamp=0.0,
+        kind="review",
+        language="javascript",
+        mode="",
+        question="",
+        code=code,
+        response="Looks good.",
+    )
+
+
+@pytest.fixture
+def index() -> Iterator[ReviewSearchIndex]:
+    database = Database("sqlite:///:memory:")
+    search_index = ReviewSearchIndex(database)
+    reviews = ReviewStore(database, indexers=[search_index.index])
+    reviews.create_tables()
+    search_index.create_tables()
+    reviews.insert_many(
+        [
+            record("camel", "function getUserName(user) { return user.name; }"),
+            record("other", "function setPassword(value) { secret = value; }"),
+        ]
+    )
+    yield search_index
+    database.close()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "getusername",
+        "getUserName",
+        "user",
+        "user_name",
+        "getUser",
+        "get_user",
+        "getUserNa",
+    ],
+)
+def test_identifier_is_found_by_its_words(index: ReviewSearchIndex, query: str) -> None:
+    page = index.search(query)
+
+    assert [item.id for item in page.items] == [1]
+
+
+@pytest.mark.parametrize("query", ["get_password", "user_password", "getEmail"])
+def test_every_word_of_an_identifier_must_match(
+    index: ReviewSearchIndex, query: str
+) -> None:
+    assert index.search(query).items == []